@@ -14,16 +14,35 @@ bl_info = {
 
 import lpy
 from lindenmaker import turtle_interpretation
+from lindenmaker import command_stream
+from lindenmaker import production
+from lindenmaker import batch_production
+from lindenmaker import derivation_cache
+from lindenmaker import profiling
+from lindenmaker import lstring_storage
+from lindenmaker import environment
+from lindenmaker import cleanup
+from lindenmaker import growth_animation
 from lindenmaker.turtle_interpretation_error import TurtleInterpretationError
 # reload scripts even if already imported, in case they have changed.
 # this allows use of operator "Reload Scripts" (key F8)
 import imp
 imp.reload(lpy)
-imp.reload(turtle_interpretation)
+imp.reload(turtle_interpretation) # also reloads turtle and command_stream
+imp.reload(production)
+imp.reload(batch_production)
+imp.reload(derivation_cache)
+imp.reload(profiling)
+imp.reload(lstring_storage)
+imp.reload(environment)
+imp.reload(cleanup)
+imp.reload(growth_animation)
 
 import bpy
 import os.path
-import re
+import tempfile
+import time
+from bpy.app.handlers import persistent
 from math import radians
 from mathutils import Vector, Matrix
 
@@ -56,6 +75,9 @@ class LindenmakerPanel(bpy.types.Panel):
         if context.scene.section_internode_expanded is True:
             boxcol = box.column()
             boxcol.prop_search(context.scene, "internode_mesh_name", bpy.data, "meshes")
+            boxcolcol = boxcol.column()
+            boxcolcol.enabled = context.scene.bool_no_hierarchy or context.scene.bool_merge_branches
+            boxcolcol.prop(context.scene, "bool_internode_tubes")
             boxcol.prop(context.scene, "turtle_line_width")
             boxcol.prop(context.scene, "turtle_width_growth_factor")
             boxcol.prop(context.scene, "internode_length_scale")
@@ -72,10 +94,63 @@ class LindenmakerPanel(bpy.types.Panel):
             boxcolcol.prop(context.scene, "default_internode_cylinder_vertices")
             boxcolcol.prop(context.scene, "default_node_icosphere_subdivisions")
         
+        box = layout.box()
+        boxlabelcol = box.column()
+        boxlabelcol.scale_y = 1.2
+        boxlabelrow = boxlabelcol.row()
+        boxlabelrow.scale_y = 0.5
+        boxlabelrow.prop(context.scene, "section_lod_expanded",
+            icon="TRIA_DOWN" if context.scene.section_lod_expanded else "TRIA_RIGHT",
+            icon_only=True, emboss=False)
+        boxlabelrow.label(text="Level of Detail")
+        if context.scene.section_lod_expanded is True:
+            boxcol = box.column()
+            boxcol.enabled = context.scene.bool_no_hierarchy
+            boxcol.prop(context.scene, "bool_lod")
+            boxcolcol = boxcol.column()
+            boxcolcol.enabled = context.scene.bool_lod
+            boxcolcol.prop(context.scene, "lod_full_detail_width")
+            boxcolcol.prop(context.scene, "lod_min_node_width")
+            boxcolcol.prop(context.scene, "lod_min_internode_width")
+            boxcolcol.prop(context.scene, "lod_thin_internodes", expand=True)
+            boxcolcol.prop(context.scene, "lod_level_count")
+        
         col = layout.column()
         col.prop(context.scene, "bool_force_shade_flat")
         col.prop(context.scene, "bool_no_hierarchy")
+        colcol = col.column()
+        colcol.enabled = not context.scene.bool_no_hierarchy
+        colcol.prop(context.scene, "bool_merge_branches")
+        colcol = col.column()
+        colcol.enabled = context.scene.bool_no_hierarchy or context.scene.bool_merge_branches
+        colcol.prop(context.scene, "bool_reuse_branch_meshes")
         col.prop(context.scene, "bool_remove_last_interpretation_result")
+        col.prop(context.scene, "bool_batch_queries")
+        colsplit = col.split(1/2)
+        colsplitcol1 = colsplit.column()
+        colsplitcol1.prop(context.scene, "bool_profile")
+        colsplitcol2 = colsplit.column()
+        colsplitcol2.enabled = context.scene.bool_profile
+        colsplitcol2.prop(context.scene, "profile_trace_path", text="")
+        if context.scene.bool_profile and context.scene.name in profiling_summaries:
+            profilebox = col.box()
+            profileboxcol = profilebox.column(align=True)
+            for line in profiling_summaries[context.scene.name]:
+                profileboxcol.label(line)
+        colsplit = col.split(1/2)
+        colsplitcol1 = colsplit.column()
+        colsplitcol1.prop(context.scene, "bool_use_derivation_cache")
+        colsplitrow2 = colsplit.row(align=True)
+        colsplitrow2.enabled = context.scene.bool_use_derivation_cache
+        colsplitrow2.prop(context.scene, "derivation_cache_size", text="MB")
+        colsplitrow2.operator(LindenmakerClearDerivationCache.bl_idname, text="", icon='X')
+        
+        colsplit = col.split(1/2)
+        colsplitcol1 = colsplit.column()
+        colsplitcol1.prop(context.scene, "bool_run_modal")
+        colsplitcol2 = colsplit.column()
+        colsplitcol2.enabled = context.scene.bool_run_modal
+        colsplitcol2.prop(context.scene, "modal_time_budget", text="s")
         
         op_lindenmaker = layout.operator(Lindenmaker.bl_idname, icon='OUTLINER_OB_MESH')
         op_lindenmaker.lstring_production_mode = 'PRODUCE_FULL'
@@ -110,15 +185,30 @@ class LindenmakerPanel(bpy.types.Panel):
             op_produce_step.bool_clear_lstring = False
             op_produce_step.bool_interpret_lstring = False
             
+            # jump back to a previously produced step and continue production from there
+            boxcol.prop(context.scene, "production_snapshot_limit")
+            boxrow = boxcol.row(align=True)
+            boxrow.prop(context.scene, "production_seek_step")
+            op_seek = boxrow.operator(LindenmakerSeekStep.bl_idname, text="", icon='FRAME_PREV')
+            op_seek.bool_interpret_lstring = context.scene.bool_interpret_on_seek
+            boxrow.prop(context.scene, "bool_interpret_on_seek", text="", icon='OUTLINER_OB_MESH')
+            
+            # L-strings can be kept in sidecar files instead of the .blend file
+            boxcol.prop(context.scene, "bool_external_lstrings")
+            boxcolcol = boxcol.column()
+            boxcolcol.enabled = context.scene.bool_external_lstrings
+            boxcolcol.prop(context.scene, "lstring_storage_dir")
+            boxcolcol.prop(context.scene, "bool_compress_lstrings")
+            
             # text field to inspect and edit lstring used for production via copy/paste.
             # this L-string is not used for interpretation (no homomorphism rules applied).
             boxcol.label("L-string for Production (after " + str(context.scene.number_production_steps_done) + " steps):")
-            boxcol.prop(context.scene, "lstring_for_production", text="")
+            draw_lstring(context.scene, boxcol, "lstring_for_production")
             
             # text field to inspect and edit final lstring via copy/paste.
             # this L-string is used for interpretation and has homomorphism rules applied (if any).
             boxcol.label("Homomorphism (for Interpretation):")
-            boxcol.prop(context.scene, "lstring_for_interpretation", text="")
+            draw_lstring(context.scene, boxcol, "lstring_for_interpretation")
             
             # button to do interpretation only (no production)
             op_interpret = boxcol.operator(Lindenmaker.bl_idname,
@@ -135,8 +225,177 @@ class LindenmakerPanel(bpy.types.Panel):
             op_interpret_step.lstring_production_mode = 'PRODUCE_ONE_STEP'
             op_interpret_step.bool_clear_lstring = False
             op_interpret_step.bool_interpret_lstring = True
+        
+        box = layout.box()
+        boxlabelcol = box.column()
+        boxlabelcol.scale_y = 1.2
+        boxlabelrow = boxlabelcol.row()
+        boxlabelrow.scale_y = 0.5
+        boxlabelrow.prop(context.scene, "section_forest_expanded",
+            icon="TRIA_DOWN" if context.scene.section_forest_expanded else "TRIA_RIGHT",
+            icon_only=True, emboss=False)
+        boxlabelrow.label(text="Batch Production (Forest)")
+        if context.scene.section_forest_expanded is True:
+            boxcol = box.column()
+            boxcol.prop(context.scene, "forest_instance_count")
+            boxcol.prop(context.scene, "forest_seed")
+            boxcol.prop(context.scene, "forest_spacing")
+            boxcol.operator(LindenmakerForest.bl_idname, icon='OUTLINER_OB_MESH')
+        
+        box = layout.box()
+        boxlabelcol = box.column()
+        boxlabelcol.scale_y = 1.2
+        boxlabelrow = boxlabelcol.row()
+        boxlabelrow.scale_y = 0.5
+        boxlabelrow.prop(context.scene, "section_growth_expanded",
+            icon="TRIA_DOWN" if context.scene.section_growth_expanded else "TRIA_RIGHT",
+            icon_only=True, emboss=False)
+        boxlabelrow.label(text="Growth Animation")
+        if context.scene.section_growth_expanded is True:
+            boxcol = box.column()
+            boxcol.prop(context.scene, "bool_growth_animation")
+            boxcol.prop_search(context.scene, "growth_object_name", bpy.data, "objects")
+            boxcol.prop(context.scene, "growth_start_frame")
+            boxcol.prop(context.scene, "growth_frames_per_step")
+            boxcol.prop(context.scene, "bool_growth_cache_file")
+            boxcol.operator(LindenmakerBuildGrowth.bl_idname, icon='RENDER_ANIMATION')
+
+def draw_lstring(scene, layout, name):
+    """
+    Draw text field of L-string scene property, or if stored externally a truncated preview with its size.
+    External L-strings can be edited via load / save to a text datablock.
+    """
+    row = layout.row(align=True)
+    if scene.bool_external_lstrings:
+        # read only, L-strings are moved to changed storage settings by the property updates and after saving
+        preview, size = lstring_storage.preview_store(bpy.path.clean_name(scene.name),
+                                                      lstring_storage_directory(scene),
+                                                      scene.bool_compress_lstrings).preview(name)
+        row.label("{}{} ({:.1f} KB)".format(preview, "..." if size > len(preview) else "", size/1024))
+    else:
+        row.prop(scene, name, text="")
+    op_load = row.operator(LindenmakerEditLString.bl_idname, text="", icon='TEXT')
+    op_load.lstring_name = name
+    op_load.action = 'LOAD'
+    op_save = row.operator(LindenmakerEditLString.bl_idname, text="", icon='FILE_TICK')
+    op_save.lstring_name = name
+    op_save.action = 'SAVE'
+
+def lstring_storage_directory(scene):
+    """Return directory for external L-strings: as set in the scene, else next to the .blend file, else temporary directory"""
+    if scene.lstring_storage_dir:
+        return bpy.path.abspath(scene.lstring_storage_dir)
+    if bpy.data.filepath:
+        return bpy.path.abspath("//lindenmaker_lstrings")
+    return os.path.join(tempfile.gettempdir(), "lindenmaker_lstrings")
+
+def lstring_store(scene):
+    return lstring_storage.get_store(bpy.path.clean_name(scene.name),
+                                     lstring_storage_directory(scene),
+                                     scene.bool_compress_lstrings)
+
+def get_lstring(scene, name):
+    """Return L-string ('lstring_for_production' or 'lstring_for_interpretation') from scene property or external store"""
+    if scene.bool_external_lstrings:
+        return lstring_store(scene).read(name)
+    return getattr(scene, name)
+
+def open_lstring(scene, name):
+    """Return L-string for streaming interpretation, memory-mapped or decompressed on the fly if stored externally"""
+    if scene.bool_external_lstrings:
+        return lstring_store(scene).open(name)
+    return getattr(scene, name)
 
-class Lindenmaker(bpy.types.Operator):
+def set_lstring(scene, name, lstring):
+    if scene.bool_external_lstrings:
+        lstring_store(scene).write(name, lstring)
+    else:
+        setattr(scene, name, lstring)
+
+def update_external_lstrings(self, context):
+    """Move L-strings between scene properties and external store when switching storage"""
+    scene = context.scene
+    store = lstring_store(scene)
+    for name in ("lstring_for_production", "lstring_for_interpretation"):
+        if scene.bool_external_lstrings:
+            store.write(name, getattr(scene, name))
+            setattr(scene, name, "")
+        else:
+            setattr(scene, name, store.read(name))
+
+def update_lstring_store(self, context):
+    """Move external L-strings to the changed directory or compression"""
+    if context.scene.bool_external_lstrings:
+        lstring_store(context.scene)
+
+@persistent
+def move_lstrings_after_save(dummy):
+    """Move external L-strings next to the .blend file, if the default directory changed by saving"""
+    for scene in bpy.data.scenes:
+        if scene.bool_external_lstrings:
+            lstring_store(scene)
+
+@persistent
+def forget_lstring_stores(dummy):
+    """Drop the stores of the previous .blend file, so that its L-strings are not moved into the loaded file's directory"""
+    lstring_storage.stores.clear()
+
+# lines of the profiling summary of the last operator call by scene name, shown in the panel
+profiling_summaries = {}
+
+class ModalSteps:
+    """
+    Mixin for operators whose work is done by a generator method steps(context), yielding
+    (progress label, fraction done or None) regularly and returning the operator result.
+    If enabled in the scene, the operator runs modal, so that blender stays responsive and the work can be cancelled via Esc.
+    """
+    
+    def invoke(self, context, event):
+        if not context.scene.bool_run_modal:
+            return self.execute(context)
+        # the work is continued on each timer event for a limited time
+        self.job = self.steps(context)
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.01, context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, 100)
+        return {'RUNNING_MODAL'}
+        
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.job.close()
+            self.end_modal(context)
+            self.report({'WARNING'}, "Lindenmaker cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        deadline = time.perf_counter() + context.scene.modal_time_budget
+        try:
+            while True:
+                label, fraction = next(self.job)
+                if time.perf_counter() >= deadline:
+                    break
+        except StopIteration as stop:
+            self.end_modal(context)
+            return stop.value
+        except Exception:
+            self.end_modal(context)
+            raise
+        if fraction is not None:
+            context.window_manager.progress_update(int(fraction*100))
+            label = "{} {:.0f}%".format(label, fraction*100)
+        if context.area is not None:
+            context.area.header_text_set("Lindenmaker: {} (Esc to cancel)".format(label))
+        return {'RUNNING_MODAL'}
+        
+    def end_modal(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        if context.area is not None:
+            context.area.header_text_set() # restore default header
+        
+class Lindenmaker(ModalSteps, bpy.types.Operator):
     bl_idname = "mesh.lindenmaker" # unique identifier for buttons and menu items to reference.
     bl_label = "Add Mesh via Lindenmayer System" # display name in the interface.
     bl_description = "Apply Operator" # tooltip
@@ -167,6 +426,53 @@ class Lindenmaker(bpy.types.Operator):
         return context.mode == 'OBJECT'
 
     def execute(self, context):
+        return turtle_interpretation.run_to_end(self.steps(context))
+        
+    def steps(self, context):
+        # if cancelled, production steps done so far are kept and a partial interpretation result is removed
+        scene = context.scene
+        if not scene.bool_profile:
+            return (yield from self.produce_and_interpret(context))
+        # in profiling mode the time of each phase is recorded (see profiling.phase), also if run modal.
+        # the profiler is only active while the work is done, not in between the time slices of the modal operator
+        profiler = profiling.Profiler()
+        job = self.produce_and_interpret(context)
+        start = time.perf_counter()
+        result = {'CANCELLED'}
+        try:
+            while True:
+                profiling.active = profiler
+                try:
+                    progress = next(job)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                finally:
+                    profiling.active = None
+                yield progress
+        finally:
+            profiling.active = profiler
+            try:
+                job.close() # if cancelled
+            finally:
+                profiling.active = None
+            profiler.record("execute", start, time.perf_counter() - start, {})
+            self.write_profile(scene, profiler)
+        return result
+        
+    def write_profile(self, scene, profiler):
+        """Show profiling summary in the panel and write Chrome trace"""
+        profiling_summaries[scene.name] = profiler.summary_lines()
+        trace_path = bpy.path.abspath(scene.profile_trace_path) or os.path.join(tempfile.gettempdir(), "lindenmaker_profile.json")
+        profiler.write_trace(trace_path)
+        self.report({'INFO'}, "Lindenmaker profile written to {}".format(trace_path))
+        
+    def produce_and_interpret(self, context):
+        """
+        Generator doing the actual work of the operator, yielding (progress label, fraction done or None) 
+        after each production step and regularly during interpretation and returning the operator result.
+        If closed early (cancelled), production steps done so far are kept and no partial result is left.
+        """
         scene = context.scene
         
         ##### PRE-OP CLEANUP CONTEXT #####
@@ -177,19 +483,22 @@ class Lindenmaker(bpy.types.Operator):
         if False: # delete all objects
             bpy.ops.object.select_all(action='SELECT')
             bpy.ops.object.delete()
-        if True: # remove unused meshes
-            for item in bpy.data.meshes:
-                if item.users is 0:
-                    bpy.data.meshes.remove(item)
         if False: # remove all materials (including ones currently used)
             for item in bpy.data.materials: 
                 item.user_clear()
                 bpy.data.materials.remove(item)
                 
         if self.bool_clear_lstring:
-            scene.lstring_for_production = ""
-            scene.lstring_for_interpretation = ""
+            set_lstring(scene, "lstring_for_production", "")
+            set_lstring(scene, "lstring_for_interpretation", "")
             scene.number_production_steps_done = 0
+        
+        # L-string for interpretation compiled to a command stream,
+        # shared between the last dryrun and the graphical interpretation
+        interpretation_stream = None
+        # whether the L-string for production was derived by the session in this call,
+        # its query results are then already written back to the session AxialTree
+        produced_by_session = False
             
         ##### LSTRING PRODUCTION #####
         
@@ -201,77 +510,151 @@ class Lindenmaker(bpy.types.Operator):
                 "Select a valid file path in the Lindenmaker options panel in the tool shelf.\n"
                 "File not found: {}".format(scene.lpyfile_path))
                 return {'CANCELLED'}
-            lsys = lpy.Lsystem(scene.lpyfile_path)
-            #print("LSYSTEM DEFINITION: {}".format(lsys.__str__()))
+            # the compiled L-system and current L-string (as AxialTree) are kept in memory
+            # between production steps and operator calls, the .lpy file is only reloaded if changed.
+            session = production.get_session(scene.name, scene.lpyfile_path, scene.production_snapshot_limit*1000)
+            lstring_for_production = get_lstring(scene, "lstring_for_production")
+            if lstring_for_production == "" and scene.bool_external_lstrings and scene.number_production_steps_done > 0:
+                # do not silently start over from the axiom if the external L-string file is missing
+                self.report({'ERROR_INVALID_INPUT'}, "External L-string for production not found in {}, "
+                "clear the current L-strings to start over.".format(lstring_storage_directory(scene)))
+                return {'CANCELLED'}
+            session.sync(lstring_for_production)
             
             # to allow for turtle state queries between L-Py production steps
-            # we always have to use derivationLength=1 for Lindenmaker to run the queries
+            # we always derive one step at a time for Lindenmaker to run the queries
             # before handing back over to L-Py.
-            derivationLengthBackup = lsys.derivationLength
             if self.lstring_production_mode == 'PRODUCE_ONE_STEP':
                 steps = 1
             else: # PRODUCE_FULL
-                steps = derivationLengthBackup
-            lsys.derivationLength = 1
+                steps = session.derivation_length
+            # do a dryrun interpretation without drawing any objects to perform the
+            # turtle state queries (via command '?') that will replace the placeholder values
+            # in the command arguments with the actual position/heading/up/left vector values.
+            # e.g. query ?('P',0,0,0) will become ?('P',Px,Py,Pz) for position vector P.
+            # ?(type,x,y,z) can then be used in a production rule.
+            # the query results are also passed to the environment queries (see environment.py),
+            # which can then evaluate e.g. distances to obstacles for all queries of a step at once.
+            def dryrun(stream):
+                query_results = turtle_interpretation.interpret(stream,
+                                                                scene.turtle_step_size, 
+                                                                scene.turtle_line_width,
+                                                                scene.turtle_width_growth_factor,
+                                                                scene.turtle_rotation_angle,
+                                                                dryrun_nodraw=True,
+                                                                collect_query_frames=(scene.bool_batch_queries and
+                                                                                      turtle_interpretation.query_batch is not None))
+                environment.begin_step(query_results)
+                return query_results
+            # scene objects used by environment queries may have changed since the last call
+            environment.begin_step()
+            if turtle_interpretation.query_batch is not None:
+                turtle_interpretation.query_batch.clear()
+            
+            lstring_for_interpretation = None # only read if no production step is done
+            # if production starts from the axiom, the derived L-strings may be loaded from the
+            # on-disk derivation cache instead of doing all production steps again.
+            cache = cached_lstrings = None
+            # derivations depending on scene objects (environment queries) are not cached
+            if (scene.bool_use_derivation_cache and lstring_for_production == ""
+                    and not derivation_cache.reads_scene(scene.lpyfile_path)):
+                cache = derivation_cache.DerivationCache(scene.derivation_cache_size * 1024 * 1024)
+                cache_key = derivation_cache.cache_key(scene.lpyfile_path,
+                                                       (scene.turtle_step_size,
+                                                        scene.turtle_rotation_angle,
+                                                        scene.turtle_line_width,
+                                                        scene.turtle_width_growth_factor),
+                                                       steps)
+                with profiling.phase("derivation cache load"):
+                    cached_lstrings = cache.load(cache_key)
+            if cached_lstrings is not None:
+                lstring_for_production, lstring_for_interpretation = cached_lstrings
+                session.sync(lstring_for_production)
+                scene.number_production_steps_done += steps
+                session.store_snapshot(scene.number_production_steps_done, lstring_for_interpretation)
+                steps = 0
+            cancelled = False # production steps done so far are kept if cancelled
+            total_steps = steps
             while (steps > 0):
-                # use current L-string as axiom unless empty
-                if (scene.lstring_for_production != ""):
-                    lsys.axiom = lpy.AxialTree(scene.lstring_for_production)
-                # derive lstring via production rules (stored as L-Py AxialTree datastructure)
-                derivedAxialTree = lsys.derive()
-                scene.lstring_for_production = str(derivedAxialTree)
-                # substitute occurrences of e.g. ~(Object,4) with ~("Object",4)
-                # or ?(P,0,0,0) with ?("P",0,0,0).
-                # L-Py strips the quotes, but without them production fails.
-                scene.lstring_for_production = re.sub(r'(?<=[~\?]\()(\w*)(?=[,\)])', r'"\1"',
-                                                      scene.lstring_for_production)
-                scene.number_production_steps_done += 1
-
-                # apply homomorphism substituation step and store result separately.
+                try:
+                    yield "Production step {}/{}".format(total_steps-steps+1, total_steps), (total_steps-steps) / total_steps
+                except GeneratorExit:
+                    cancelled = True
+                    break
+                # derive lstring via production rules (stored as L-Py AxialTree datastructure),
+                # then apply homomorphism substitution step and keep result separately.
                 # this is an L-Py feature intended as a postproduction step 
                 # to replace abstract module names by actual interpretation commands.
                 # in L-Py these rules are preceded by keywords "homomorphism:" or "interpretation:",
                 # however this should not be confused with the graphical turtle interpretation!
-                scene.lstring_for_interpretation = str(lsys.interpret(
-                                                       lpy.AxialTree(scene.lstring_for_production)))
-                # do a dryrun interpretation without drawing any objects to perform the
-                # turtle state queries (via command '?') that will replace the placeholder values
-                # in the command arguments with the actual position/heading/up/left vector values.
-                # e.g. query ?('P',0,0,0) will become ?('P',Px,Py,Pz) for position vector P.
-                # ?(type,x,y,z) can then be used in a production rule.
                 try:
-                    turtle_interpretation.interpret(scene.lstring_for_interpretation,
-                                                    scene.turtle_step_size, 
-                                                    scene.turtle_line_width,
-                                                    scene.turtle_width_growth_factor,
-                                                    scene.turtle_rotation_angle,
-                                                    dryrun_nodraw=True)
+                    with profiling.phase("production step", step=scene.number_production_steps_done+1):
+                        # the homomorphism is only applied in the last step or if queries need it
+                        lstring_for_interpretation, interpretation_stream = session.produce_step(dryrun, final=steps == 1)
                 except TurtleInterpretationError as e:
                     self.report({'ERROR_INVALID_INPUT'}, str(e))
                     return {'CANCELLED'}
+                scene.number_production_steps_done += 1
+                produced_by_session = True
+                # keep snapshot of each step to allow seeking back to it
+                session.store_snapshot(scene.number_production_steps_done, lstring_for_interpretation)
                 steps -= 1
-                
-            lsys.derivationLength = derivationLengthBackup
+            if cancelled and lstring_for_interpretation is None and steps < total_steps:
+                # the homomorphism was skipped for the steps done so far
+                lstring_for_interpretation = str(session.interpret())
+            
+            # L-strings are only converted to string form once all steps are done
+            lstring_for_production = session.production_lstring()
+            set_lstring(scene, "lstring_for_production", lstring_for_production)
+            if lstring_for_interpretation is not None:
+                set_lstring(scene, "lstring_for_interpretation", lstring_for_interpretation)
+            if cancelled:
+                return {'CANCELLED'}
+            if cache is not None and cached_lstrings is None and lstring_for_interpretation is not None:
+                cache.store(cache_key, lstring_for_production, lstring_for_interpretation)
             #print("LSTRING FOR PRODUCTION: {}".format(context.scene.lstring_for_production))
             #print("LSTRING FOR INTERPRETATION: {}".format(context.scene.lstring_for_interpretation))
         
         ##### GRAPHICAL TURTLE INTERPRETATION #####
         
         if self.bool_interpret_lstring:
-            if (scene.bool_remove_last_interpretation_result 
-                and scene.last_interpretation_result_objname in bpy.data.objects.keys()):
-                delete_hierarchy(bpy.data.objects[scene.last_interpretation_result_objname])
-            # interpret derived lstring via turtle graphics
+            # the last result is only removed once the new result is complete, so that it is kept if cancelled.
+            # its meshes are only removed if unused, since unchanged branch meshes may be reused
+            # (only meshes created by Lindenmaker are checked)
+            last_result = None
+            if scene.bool_remove_last_interpretation_result:
+                last_result = bpy.data.objects.get(scene.last_interpretation_result_objname)
+            # interpret derived lstring via turtle graphics.
+            # reuse the command stream compiled for the last dryrun, else stream the L-string directly
+            if interpretation_stream is None:
+                interpretation_stream = open_lstring(scene, "lstring_for_interpretation")
             try:
-                turtle_interpretation.interpret(scene.lstring_for_interpretation,
-                                                scene.turtle_step_size, 
-                                                scene.turtle_line_width,
-                                                scene.turtle_width_growth_factor,
-                                                scene.turtle_rotation_angle,
-                                                default_materialindex=0)
+                query_results = yield from turtle_interpretation.interpret_steps(interpretation_stream,
+                                                                                 scene.turtle_step_size, 
+                                                                                 scene.turtle_line_width,
+                                                                                 scene.turtle_width_growth_factor,
+                                                                                 scene.turtle_rotation_angle,
+                                                                                 default_materialindex=0)
             except TurtleInterpretationError as e:
                 self.report({'ERROR_INVALID_INPUT'}, str(e))
                 return {'CANCELLED'}
+            finally:
+                if hasattr(interpretation_stream, 'close'):
+                    interpretation_stream.close() # memory map or file of external L-string
+            if last_result is not None:
+                with profiling.phase("remove last result"):
+                    last_result_meshes = cleanup.remove_result(last_result)
+                with profiling.phase("cleanup", size=len(last_result_meshes)):
+                    cleanup.remove_unused_meshes(last_result_meshes)
+                # new result was named "Root.xxx" due to the last result
+                root = bpy.data.objects[scene.last_interpretation_result_objname]
+                root.name = "Root"
+                scene.last_interpretation_result_objname = root.name
+            if query_results and not produced_by_session:
+                # L-string not produced in this call (interpretation only or loaded from the derivation cache)
+                with profiling.phase("query write-back", size=len(query_results)):
+                    set_lstring(scene, "lstring_for_production", command_stream.substitute_queries(
+                                get_lstring(scene, "lstring_for_production"), query_results))
             
         ##### POST-OP CLEANUP #####
             
@@ -282,6 +665,168 @@ class Lindenmaker(bpy.types.Operator):
         
         return {'FINISHED'}
 
+class LindenmakerSeekStep(bpy.types.Operator):
+    bl_idname = "mesh.lindenmaker_seek_step"
+    bl_label = "Seek to Production Step"
+    bl_description = ("Restore the L-strings of a previously produced step, "
+                      "further production steps continue from there")
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    step = bpy.props.IntProperty(
+        name="Step",
+        description="Production step to restore, -1 to use the step chosen in the panel",
+        default=-1,
+        min=-1)
+    bool_interpret_lstring = bpy.props.BoolProperty(
+        name="Interpret L-string",
+        description="Interpret restored L-string via graphical turtle interpretation.",
+        default=False)
+    
+    @classmethod
+    def poll(cls, context):
+        # operator only available in object mode
+        return context.mode == 'OBJECT'
+    
+    def execute(self, context):
+        scene = context.scene
+        step = self.step if self.step >= 0 else scene.production_seek_step
+        session = production.sessions.get(scene.name)
+        lstrings = None
+        if session is not None and session.is_valid_for(scene.lpyfile_path):
+            lstrings = session.seek(step)
+        if lstrings is None:
+            self.report({'ERROR_INVALID_INPUT'}, "No snapshot of production step {} available. "
+            "Only the most recent steps are kept, up to the snapshot size limit of {}k modules.".format(
+                step, scene.production_snapshot_limit))
+            return {'CANCELLED'}
+        set_lstring(scene, "lstring_for_production", lstrings[0])
+        set_lstring(scene, "lstring_for_interpretation", lstrings[1])
+        scene.number_production_steps_done = step
+        if self.bool_interpret_lstring:
+            bpy.ops.mesh.lindenmaker(lstring_production_mode='PRODUCE_NONE',
+                                     bool_clear_lstring=False,
+                                     bool_interpret_lstring=True)
+        return {'FINISHED'}
+
+class LindenmakerEditLString(bpy.types.Operator):
+    bl_idname = "mesh.lindenmaker_edit_lstring"
+    bl_label = "Load / Save L-string via Text"
+    bl_description = ("Load L-string into a text datablock to view or edit it in the text editor, "
+                      "or save the edited text datablock back as L-string")
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    lstring_name = bpy.props.EnumProperty(
+        name="L-string",
+        items=(('lstring_for_production', "L-string for Production", ""),
+               ('lstring_for_interpretation', "L-string for Interpretation", "")))
+    action = bpy.props.EnumProperty(
+        name="Action",
+        items=(('LOAD', "Load", "Load L-string into text datablock"),
+               ('SAVE', "Save", "Save text datablock as L-string")))
+    
+    def execute(self, context):
+        scene = context.scene
+        textname = "Lindenmaker " + self.lstring_name
+        if self.action == 'LOAD':
+            text = bpy.data.texts.get(textname) or bpy.data.texts.new(textname)
+            text.from_string(get_lstring(scene, self.lstring_name))
+            self.report({'INFO'}, "L-string loaded into text '{}'".format(text.name))
+        else:
+            text = bpy.data.texts.get(textname)
+            if text is None:
+                self.report({'ERROR_INVALID_INPUT'}, "No text named '{}', load the L-string first.".format(textname))
+                return {'CANCELLED'}
+            set_lstring(scene, self.lstring_name, text.as_string().strip())
+        return {'FINISHED'}
+
+class LindenmakerForest(bpy.types.Operator):
+    bl_idname = "mesh.lindenmaker_forest"
+    bl_label = "Add Instances via Lindenmayer System"
+    bl_description = ("Produce and interpret several instances of the L-system with consecutive random seeds "
+                      "one after another, each as a single object")
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        # operator only available in object mode
+        return context.mode == 'OBJECT'
+    
+    def execute(self, context):
+        scene = context.scene
+        bpy.ops.object.select_all(action='DESELECT')
+        if not os.path.isfile(scene.lpyfile_path):
+            self.report({'ERROR_INVALID_INPUT'}, "Input file does not exist! "
+            "Select a valid file path in the Lindenmaker options panel in the tool shelf.\n"
+            "File not found: {}".format(scene.lpyfile_path))
+            return {'CANCELLED'}
+        try:
+            batch_production.produce_forest(scene,
+                                            scene.forest_instance_count,
+                                            scene.forest_seed,
+                                            scene.forest_spacing)
+        except TurtleInterpretationError as e:
+            self.report({'ERROR_INVALID_INPUT'}, str(e))
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+class LindenmakerBuildGrowth(ModalSteps, bpy.types.Operator):
+    bl_idname = "mesh.lindenmaker_build_growth"
+    bl_label = "Build Growth Animation"
+    bl_description = ("Derive the L-system from the axiom and store the geometry of each step, "
+                      "which is shown on the growth object at the frames of the step")
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        # operator only available in object mode
+        return context.mode == 'OBJECT'
+    
+    def execute(self, context):
+        return turtle_interpretation.run_to_end(self.steps(context))
+    
+    def steps(self, context):
+        """Generator building the geometry sequence, if cancelled the previous sequence is kept"""
+        scene = context.scene
+        if not os.path.isfile(scene.lpyfile_path):
+            self.report({'ERROR_INVALID_INPUT'}, "Input file does not exist! "
+            "Select a valid file path in the Lindenmaker options panel in the tool shelf.\n"
+            "File not found: {}".format(scene.lpyfile_path))
+            return {'CANCELLED'}
+        path = None
+        if scene.bool_growth_cache_file:
+            directory = lstring_storage_directory(scene)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, bpy.path.clean_name(scene.name) + "_growth.geometry")
+            # the memory map of a previous sequence in the same file is closed before the file is replaced,
+            # it is loaded again from the file if cancelled. other previous sequences are replaced once finished.
+            growth_animation.release_file(scene, path)
+        try:
+            sequence = yield from growth_animation.build_steps(scene, path)
+        except TurtleInterpretationError as e:
+            self.report({'ERROR_INVALID_INPUT'}, str(e))
+            return {'CANCELLED'}
+        growth_animation.set_sequence(scene, sequence)
+        scene.growth_cache_path = path or ""
+        
+        obj = bpy.data.objects.get(scene.growth_object_name)
+        if obj is None or obj.type != 'MESH':
+            obj = bpy.data.objects.new("Growth", bpy.data.meshes.new("Growth"))
+            obj.location = scene.cursor_location
+            scene.objects.link(obj)
+            scene.growth_object_name = obj.name
+        scene.bool_growth_animation = True
+        growth_animation.show_step(scene, obj, sequence, growth_animation.frame_step(scene, len(sequence)))
+        return {'FINISHED'}
+
+class LindenmakerClearDerivationCache(bpy.types.Operator):
+    bl_idname = "mesh.lindenmaker_clear_derivation_cache"
+    bl_label = "Clear Derivation Cache"
+    bl_description = "Remove all derived L-strings stored in the derivation cache"
+    
+    def execute(self, context):
+        derivation_cache.DerivationCache(context.scene.derivation_cache_size * 1024 * 1024).clear()
+        return {'FINISHED'}
+
 def menu_func(self, context):
     self.layout.operator(Lindenmaker.bl_idname, icon='PLUGIN')
 
@@ -299,6 +844,21 @@ def register():
     bpy.types.Scene.lstring_for_interpretation = bpy.props.StringProperty(
         name="L-string for Interpretation", 
         description="The L-string resulting from the L-system productions, with homomorphism rules applied (if any specified).\nUsed for graphical turtle interpretation.")
+    bpy.types.Scene.bool_external_lstrings = bpy.props.BoolProperty(
+        name="Store L-strings Externally",
+        description="Keep L-strings in sidecar files instead of the .blend file, only showing a preview in the panel.\nRecommended for large L-strings. Edit via loading into / saving from a text datablock.",
+        default=False,
+        update=update_external_lstrings)
+    bpy.types.Scene.lstring_storage_dir = bpy.props.StringProperty(
+        name="Directory",
+        description="Directory of external L-string files.\nDefault is 'lindenmaker_lstrings' next to the .blend file, or in the temporary directory if not saved.",
+        maxlen=1024, subtype='DIR_PATH',
+        update=update_lstring_store)
+    bpy.types.Scene.bool_compress_lstrings = bpy.props.BoolProperty(
+        name="Compress",
+        description="Store external L-strings gzip compressed instead of as memory-mapped text files.",
+        default=False,
+        update=update_lstring_store)
     bpy.types.Scene.last_interpretation_result_objname = bpy.props.StringProperty(
         name="Last Interpretation Result Object Name", 
         description="Name of the object resulting from the last graphical turtle interpretation.")
@@ -341,6 +901,10 @@ def register():
         description="Factor by which move step size is multiplied to yield internode length.\nUsed to allow internode length to deviate from step size.", 
         default=1.2,
         min=0.0)
+    bpy.types.Scene.bool_internode_tubes = bpy.props.BoolProperty(
+        name="Continuous Tubes",
+        description="Draw consecutive internodes as one continuous tube with shared rings instead of internode mesh copies.\nRing vertex count is the internode cylinder vertex count. Only used for a single object or one object per branch.",
+        default=False)
     bpy.types.Scene.bool_draw_nodes = bpy.props.BoolProperty(
         name="Nodes:", 
         description="Draw node objects at branching points.\nOtherwise uses Empty objects if hierarchy is used.",
@@ -366,6 +930,38 @@ def register():
         min=1, 
         max=5)
         
+    bpy.types.Scene.bool_lod = bpy.props.BoolProperty(
+        name="Level of Detail",
+        description="Reduce geometry of thin internodes and small nodes. Only used for a single object and for batch production.",
+        default=False)
+    bpy.types.Scene.lod_full_detail_width = bpy.props.FloatProperty(
+        name="Full Detail Width",
+        description="Line width from which internodes use all cylinder vertices, thinner internodes get proportionally fewer (at least 3).\nOnly used for the default internode mesh and for continuous tubes. 0 uses all vertices for all internodes.",
+        default=1.0,
+        min=0.0)
+    bpy.types.Scene.lod_min_node_width = bpy.props.FloatProperty(
+        name="Min. Node Size",
+        description="Nodes smaller than this size (line width at the branching point) are not drawn.",
+        default=0.0,
+        min=0.0)
+    bpy.types.Scene.lod_min_internode_width = bpy.props.FloatProperty(
+        name="Min. Internode Width",
+        description="Internodes thinner than this line width are drawn as lines (loose edges) or dropped.",
+        default=0.0,
+        min=0.0)
+    bpy.types.Scene.lod_thin_internodes = bpy.props.EnumProperty(
+        name="Thin Internodes",
+        description="How to draw internodes thinner than the minimum internode width.",
+        items=(('LINE', "Lines", "Draw as loose edges"),
+               ('DROP', "Drop", "Do not draw")),
+        default='DROP')
+    bpy.types.Scene.lod_level_count = bpy.props.IntProperty(
+        name="Levels",
+        description="Number of levels of detail produced in the same interpretation pass.\nEach further level halves the cylinder vertices, uses one icosphere subdivision less and doubles the width thresholds.\nFurther levels are added as hidden child objects of the result.",
+        default=1,
+        min=1,
+        max=4)
+        
     bpy.types.Scene.bool_force_shade_flat = bpy.props.BoolProperty(
         name="Force Flat Shading",
         description="Force flat shading for all parts of the generated structure.",
@@ -374,21 +970,134 @@ def register():
         name="Single Object (No Hierarchy, Faster)",
         description="Enable to generate a single object with a single joined mesh. Significantly faster.\nDisable to generate a branching hierarchy of objects (internode/node meshes are shared).",
         default=True)
+    bpy.types.Scene.bool_merge_branches = bpy.props.BoolProperty(
+        name="One Object per Branch",
+        description="If hierarchy is used, merge all internodes, nodes and custom objects of a branch into one object instead of one object per module.\nBranch transforms and parent indices are stored on the root object.",
+        default=False)
+    bpy.types.Scene.bool_reuse_branch_meshes = bpy.props.BoolProperty(
+        name="Reuse Unchanged Branches",
+        description="If a single object or one object per branch is used, reuse the geometry of branches that are unchanged since the previous interpretation instead of generating it again.\nFor a single object the reused branch geometry is still transformed and written to the new mesh.\nUseful for stepwise production and interpretation together with removing the last interpretation result.",
+        default=False)
+    bpy.types.Scene.bool_run_modal = bpy.props.BoolProperty(
+        name="Non-Blocking",
+        description="Run production and interpretation in time slices while blender stays responsive, showing the progress in the header.\nEsc cancels: production steps done so far are kept, a partial interpretation result is removed.",
+        default=False)
+    bpy.types.Scene.modal_time_budget = bpy.props.FloatProperty(
+        name="Time Slice",
+        description="Seconds of work per time slice when running non-blocking. A production step is never split.",
+        default=0.1,
+        min=0.01)
+    bpy.types.Scene.production_snapshot_limit = bpy.props.IntProperty(
+        name="Snapshot Size Limit (k)",
+        description="Total size of the most recent production steps kept in memory to allow seeking back to them, "
+                    "in thousands of L-string modules (stored interpretation L-strings count per character).\n"
+                    "The oldest steps are dropped first. 0 disables snapshots.",
+        default=5000,
+        min=0)
+    bpy.types.Scene.production_seek_step = bpy.props.IntProperty(
+        name="Seek Step",
+        description="Production step to restore via seeking. Step 0 is the axiom.",
+        default=0,
+        min=0)
+    bpy.types.Scene.bool_interpret_on_seek = bpy.props.BoolProperty(
+        name="Interpret on Seek",
+        description="Interpret the restored L-string when seeking to a production step.",
+        default=True)
+    bpy.types.Scene.bool_batch_queries = bpy.props.BoolProperty(
+        name="Batch Turtle Queries",
+        description="Collect the turtle frames at all turtle state queries of a production step into NumPy arrays P, H, L, U,\navailable to .lpy files as lindenmaker.query_batch.current, e.g. for vectorized environment logic.",
+        default=False)
+    bpy.types.Scene.bool_profile = bpy.props.BoolProperty(
+        name="Profile",
+        description="Record wall time, calls and L-string sizes of each phase of production and interpretation.\nShows a summary in the panel and writes a Chrome trace file (open via chrome://tracing or ui.perfetto.dev).",
+        default=False)
+    bpy.types.Scene.profile_trace_path = bpy.props.StringProperty(
+        name="Profile Trace File",
+        description="Path of Chrome trace JSON file written in profiling mode.\nDefault is lindenmaker_profile.json in the temporary directory.",
+        maxlen=1024, subtype='FILE_PATH')
+    bpy.types.Scene.bool_use_derivation_cache = bpy.props.BoolProperty(
+        name="Derivation Cache",
+        description="Store L-strings derived from the axiom on disk and load them instead of deriving again if the .lpy file contents, settings and number of steps are unchanged.\nNote that L-systems using random numbers will yield the cached result.\nL-systems accessing the scene (environment queries) are not cached.",
+        default=False)
+    bpy.types.Scene.derivation_cache_size = bpy.props.IntProperty(
+        name="Derivation Cache Size",
+        description="Maximum size of the derivation cache in megabytes. Least recently used L-strings are removed if exceeded.",
+        default=256,
+        min=1)
     bpy.types.Scene.bool_remove_last_interpretation_result = bpy.props.BoolProperty(
         name="Remove Last Interpretation Result",
         description="When running the graphical turtle interpretation, the result from the previous interpretation is removed.\nUseful for stepwise production and interpretation, to avoid cluttering the scene.",
         default=False)
         
+    bpy.types.Scene.forest_instance_count = bpy.props.IntProperty(
+        name="Instances", 
+        description="Number of instances produced from the L-system, each with a different random seed.",
+        default=10, 
+        min=1)
+    bpy.types.Scene.forest_seed = bpy.props.IntProperty(
+        name="Seed", 
+        description="Random seed of the first instance, subsequent instances use consecutive seeds.",
+        default=0)
+    bpy.types.Scene.forest_spacing = bpy.props.FloatProperty(
+        name="Spacing", 
+        description="Distance between instances, which are placed in a grid around the 3D cursor.",
+        default=10.0, 
+        min=0.0)
+        
+    bpy.types.Scene.bool_growth_animation = bpy.props.BoolProperty(
+        name="Animate Growth",
+        description="On frame change, show the geometry of the derivation step belonging to the frame on the growth object.",
+        default=False)
+    bpy.types.Scene.growth_object_name = bpy.props.StringProperty(
+        name="Object",
+        description="Object showing the growth animation, created at the 3D cursor when building if not found.")
+    bpy.types.Scene.growth_start_frame = bpy.props.IntProperty(
+        name="Start Frame",
+        description="Frame showing the axiom, followed by one derivation step after the other.",
+        default=1)
+    bpy.types.Scene.growth_frames_per_step = bpy.props.IntProperty(
+        name="Frames per Step",
+        description="Number of frames each derivation step is shown.",
+        default=10,
+        min=1)
+    bpy.types.Scene.bool_growth_cache_file = bpy.props.BoolProperty(
+        name="Cache in File",
+        description="Store the geometry of all steps in a memory-mapped sidecar file in the L-string directory instead of in memory.\nRecommended for many steps or large geometry, the file is reused when the .blend file is reopened.",
+        default=False)
+    bpy.types.Scene.growth_cache_path = bpy.props.StringProperty(
+        name="Growth Cache File",
+        description="Sidecar file of the geometry of the last built growth animation, empty if kept in memory.",
+        maxlen=1024, subtype='FILE_PATH')
+        
     bpy.types.Scene.section_internode_expanded = bpy.props.BoolProperty(default = False)
     bpy.types.Scene.section_lstring_expanded = bpy.props.BoolProperty(default = False)
+    bpy.types.Scene.section_forest_expanded = bpy.props.BoolProperty(default = False)
+    bpy.types.Scene.section_lod_expanded = bpy.props.BoolProperty(default = False)
+    bpy.types.Scene.section_growth_expanded = bpy.props.BoolProperty(default = False)
+    
+    if growth_animation.update_growth not in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.append(growth_animation.update_growth)
+    if move_lstrings_after_save not in bpy.app.handlers.save_post:
+        bpy.app.handlers.save_post.append(move_lstrings_after_save)
+    if forget_lstring_stores not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(forget_lstring_stores)
     
 def unregister():
     bpy.utils.unregister_module(__name__)
     bpy.types.INFO_MT_mesh_add.remove(menu_func)
+    if growth_animation.update_growth in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(growth_animation.update_growth)
+    if move_lstrings_after_save in bpy.app.handlers.save_post:
+        bpy.app.handlers.save_post.remove(move_lstrings_after_save)
+    if forget_lstring_stores in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(forget_lstring_stores)
     
     del bpy.types.Scene.lpyfile_path
     del bpy.types.Scene.lstring_for_production
     del bpy.types.Scene.lstring_for_interpretation
+    del bpy.types.Scene.bool_external_lstrings
+    del bpy.types.Scene.lstring_storage_dir
+    del bpy.types.Scene.bool_compress_lstrings
     del bpy.types.Scene.last_interpretation_result_objname
     del bpy.types.Scene.number_production_steps_done
     
@@ -399,34 +1108,55 @@ def unregister():
     del bpy.types.Scene.turtle_line_width
     del bpy.types.Scene.turtle_width_growth_factor
     del bpy.types.Scene.internode_length_scale
+    del bpy.types.Scene.bool_internode_tubes
     del bpy.types.Scene.bool_draw_nodes
     del bpy.types.Scene.node_mesh_name
     del bpy.types.Scene.bool_recreate_default_meshes
     del bpy.types.Scene.default_internode_cylinder_vertices
     del bpy.types.Scene.default_node_icosphere_subdivisions
     
+    del bpy.types.Scene.bool_lod
+    del bpy.types.Scene.lod_full_detail_width
+    del bpy.types.Scene.lod_min_node_width
+    del bpy.types.Scene.lod_min_internode_width
+    del bpy.types.Scene.lod_thin_internodes
+    del bpy.types.Scene.lod_level_count
+    
     del bpy.types.Scene.bool_force_shade_flat
     del bpy.types.Scene.bool_no_hierarchy
+    del bpy.types.Scene.bool_merge_branches
+    del bpy.types.Scene.bool_reuse_branch_meshes
     del bpy.types.Scene.bool_remove_last_interpretation_result
+    del bpy.types.Scene.bool_batch_queries
+    del bpy.types.Scene.bool_profile
+    del bpy.types.Scene.profile_trace_path
+    del bpy.types.Scene.bool_use_derivation_cache
+    del bpy.types.Scene.bool_run_modal
+    del bpy.types.Scene.modal_time_budget
+    del bpy.types.Scene.production_snapshot_limit
+    del bpy.types.Scene.production_seek_step
+    del bpy.types.Scene.bool_interpret_on_seek
+    del bpy.types.Scene.derivation_cache_size
+    
+    del bpy.types.Scene.forest_instance_count
+    del bpy.types.Scene.forest_seed
+    del bpy.types.Scene.forest_spacing
+    
+    del bpy.types.Scene.bool_growth_animation
+    del bpy.types.Scene.growth_object_name
+    del bpy.types.Scene.growth_start_frame
+    del bpy.types.Scene.growth_frames_per_step
+    del bpy.types.Scene.bool_growth_cache_file
+    del bpy.types.Scene.growth_cache_path
     
     del bpy.types.Scene.section_internode_expanded
     del bpy.types.Scene.section_lstring_expanded
+    del bpy.types.Scene.section_forest_expanded
+    del bpy.types.Scene.section_lod_expanded
+    del bpy.types.Scene.section_growth_expanded
 
 # This allows you to run the script directly from blenders text editor
 # to test the addon without having to install it.
 if __name__ == "__main__":
     register()
     
-def delete_hierarchy(obj):
-    """Delete an object and all its children"""
-    objnames = set([obj.name])
-
-    def get_children_names(obj):
-        for child in obj.children:
-            objnames.add(child.name)
-            if child.children:
-                get_children_names(child)
-
-    get_children_names(obj)
-    [setattr(bpy.data.objects[name], 'select', True) for name in objnames]
-    bpy.ops.object.delete()
@@ -0,0 +1,123 @@
+import bpy
+import random
+from collections import namedtuple
+from math import radians
+from mathutils import Vector
+
+from lindenmaker import production
+from lindenmaker import environment
+from lindenmaker import lod
+from lindenmaker import command_stream
+from lindenmaker import turtle
+from lindenmaker import turtle_interpretation
+from lindenmaker.turtle_interpretation_error import TurtleInterpretationError
+
+# scene settings needed to produce and interpret instances without accessing blender data
+InterpretationSettings = namedtuple("InterpretationSettings",
+    ["step_size", "line_width", "width_growth_factor", "rotation_angle",
+     "internode_length_scale", "smooth", "tube_vertices", "lod_levels"])
+
+def settings_from_scene(scene):
+    return InterpretationSettings(scene.turtle_step_size,
+                                  scene.turtle_line_width,
+                                  scene.turtle_width_growth_factor,
+                                  scene.turtle_rotation_angle,
+                                  scene.internode_length_scale,
+                                  not scene.bool_force_shade_flat,
+                                  scene.default_internode_cylinder_vertices if scene.bool_internode_tubes else 0,
+                                  lod.levels_from_scene(scene))
+
+def produce_instance(lpyfile_path, seed, settings, internode_template, node_templates=()):
+    """
+    Derive the L-system of the given .lpy file with the given random seed
+    and interpret the result into a GeometryBuffer per level of detail, without accessing blender data.
+    The internode template is None for cylinders by level of detail, nodes are drawn if node templates
+    (one per level) are given. Environment queries of the .lpy file see the current scene state.
+    Returns the GeometryBuffers and the custom object placements.
+    """
+    random.seed(seed)
+    session = production.ProductionSession(lpyfile_path)
+
+    def dryrun(stream):
+        query_results = turtle_interpretation.interpret(stream,
+                                                        settings.step_size,
+                                                        settings.line_width,
+                                                        settings.width_growth_factor,
+                                                        settings.rotation_angle,
+                                                        dryrun_nodraw=True)
+        environment.begin_step(query_results)
+        return query_results
+    # scene objects used by environment queries may have changed since the last production
+    environment.begin_step()
+
+    lstring_for_interpretation, stream = None, None
+    for step in range(session.derivation_length):
+        lstring_for_interpretation, stream = session.produce_step(dryrun, final=step == session.derivation_length-1)
+    if stream is None:
+        # not compiled during production if there are no queries
+        if lstring_for_interpretation is None:
+            lstring_for_interpretation = str(session.interpret())
+        stream = command_stream.compile_lstring(lstring_for_interpretation)
+
+    node_templates = list(node_templates) or [None]
+    t = turtle.GeometryTurtle(settings.line_width, 0, internode_template, node_templates[0],
+                              settings.internode_length_scale, settings.smooth, settings.tube_vertices,
+                              settings.lod_levels, node_templates[1:])
+    interpreter = turtle_interpretation.Interpreter(t, settings.step_size,
+                                                    settings.width_growth_factor,
+                                                    settings.rotation_angle)
+    interpreter.run(stream)
+    t.finish()
+    return t.geometry.buffers, t.custom_objects
+
+def produce_instances(lpyfile_path, seeds, settings, internode_template, node_templates=()):
+    """
+    Produce one instance per seed, one after another in the blender process.
+    Instances are not produced in worker processes, since blender cannot be forked safely
+    and environment queries need the scene.
+    """
+    return [produce_instance(lpyfile_path, seed, settings, internode_template, node_templates) for seed in seeds]
+
+def build_instance_object(scene, buffers, custom_objects, location, templates):
+    """
+    Create object with single mesh from instance geometry and custom object placements (main thread only).
+    Further levels of detail are added as hidden child objects.
+    """
+    add_custom_objects(buffers, custom_objects, templates)
+    mesh = bpy.data.meshes.new("Root")
+    mesh.use_auto_smooth = True
+    mesh.auto_smooth_angle = radians(85)
+    obj = bpy.data.objects.new("Root", mesh)
+    obj.location = location
+    scene.objects.link(obj)
+    turtle.write_lod_meshes(scene, obj, buffers)
+    return obj
+
+def add_custom_objects(buffers, custom_objects, templates):
+    """Add custom object placements (object name, matrix) to the geometry buffers, templates caches MeshTemplates by object name"""
+    for objname, matrix in custom_objects:
+        if objname not in bpy.data.objects.keys():
+            raise TurtleInterpretationError("Error using '~' draw custom object command: No object named '{}'. Example usage: ~(\"Object\")".format(objname))
+        template = templates.get(objname)
+        if template is None:
+            obj = bpy.data.objects[objname]
+            template = templates[objname] = turtle.mesh_template(obj.data, obj)
+        for buffer in buffers:
+            buffer.add_instance(template, matrix)
+
+def produce_forest(scene, count, seed, spacing):
+    """Produce count instances of the scene .lpy file with consecutive seeds, placed in a grid around the 3D cursor"""
+    internode_mesh, node_mesh = turtle.get_module_meshes()
+    settings = settings_from_scene(scene)
+    internode_template, node_templates = turtle.lod_templates(settings.lod_levels, internode_mesh, node_mesh)
+    results = produce_instances(scene.lpyfile_path, range(seed, seed+count), settings,
+                                internode_template, node_templates)
+
+    columns = max(int(count**0.5 + 0.5), 1)
+    templates = {} # custom object name -> MeshTemplate
+    objects = []
+    for i, (buffers, custom_objects) in enumerate(results):
+        offset = Vector(((i % columns)*spacing, (i // columns)*spacing, 0))
+        objects.append(build_instance_object(scene, buffers, custom_objects,
+                                             scene.cursor_location + offset, templates))
+    return objects
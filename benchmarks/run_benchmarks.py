@@ -0,0 +1,209 @@
+"""
+Headless benchmarks of Lindenmaker L-string production and turtle interpretation.
+
+Runs outside of blender using the stand-ins for bpy and mathutils from stand_ins.py
+(inside blender the real modules are used). Times tokenization, cuts, argument extraction,
+dry-run interpretation, query write-back and geometry emission on synthetic L-strings of growing size,
+and the production step loop on the shipped models/*.lpy files if L-Py is available.
+Results are written as JSON, so that runs before and after a change can be compared.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1000 10000 100000] [--repeat 5] [--output results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+from math import sin, cos, pi
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stand_ins
+bpy = stand_ins.install()
+
+from lindenmaker import command_stream
+from lindenmaker import turtle
+from lindenmaker import turtle_interpretation
+from lindenmaker.geometry_buffer import MeshTemplate
+
+try:
+    import lpy
+except ImportError:
+    lpy = None
+if lpy is not None:
+    from lindenmaker import production
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_GLOB = os.path.join(PACKAGE_DIR, "models", "*", "*.lpy")
+
+def synthetic_lstring(size, seed=0):
+    """
+    Return bracketed L-string with about size commands, using parameterized moves and rotations,
+    width and material changes, turtle state queries, custom objects and cuts.
+    """
+    rng = random.Random(seed)
+    parts = []
+    count = 0
+    depth = 0
+    while count < size:
+        r = rng.random()
+        if r < 0.25:
+            parts.append("F({:.3f})".format(rng.uniform(0.5, 2.0)))
+        elif r < 0.45:
+            parts.append("{}({:.1f})".format(rng.choice("+-&^/\\"), rng.uniform(10, 60)))
+        elif r < 0.55 and depth < 12:
+            parts.append("[")
+            depth += 1
+        elif r < 0.7 and depth > 0:
+            parts.append("]")
+            depth -= 1
+        elif r < 0.78:
+            parts.append(rng.choice(";,!_|f"))
+        elif r < 0.82:
+            parts.append('?("P",0,0,0)')
+        elif r < 0.84:
+            parts.append('~("Leaf",0.5)')
+        elif r < 0.85 and depth > 0:
+            parts.append("%F(1)")
+            count += 1
+        else:
+            parts.append(rng.choice("ABFX")) # unsupported modules are ignored, except F
+        count += 1
+    parts.append("]" * depth)
+    return "".join(parts)
+
+def cylinder_template(vertex_count=5):
+    """Return MeshTemplate of an open cylinder along x from 0 to 1 with radius 1, like the default internode"""
+    coords = []
+    for x in (0.0, 1.0):
+        for i in range(vertex_count):
+            angle = 2*pi*i/vertex_count
+            coords.extend((x, cos(angle), sin(angle)))
+    loop_vertices, loop_starts, loop_totals = [], [], []
+    for i in range(vertex_count):
+        j = (i+1) % vertex_count
+        loop_starts.append(len(loop_vertices))
+        loop_vertices.extend((i, j, vertex_count+j, vertex_count+i))
+        loop_totals.append(4)
+    return MeshTemplate(coords, loop_vertices, loop_starts, loop_totals)
+
+def measure(function, repeat):
+    """Call function repeat times, return dict of timings in seconds and the last result"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "mean": sum(times)/len(times), "runs": repeat}, result
+
+def dryrun(stream, scene):
+    return turtle_interpretation.interpret(stream,
+                                           scene.turtle_step_size,
+                                           scene.turtle_line_width,
+                                           scene.turtle_width_growth_factor,
+                                           scene.turtle_rotation_angle,
+                                           dryrun_nodraw=True)
+
+def interpret_with(t, stream, scene):
+    interpreter = turtle_interpretation.Interpreter(t, scene.turtle_step_size,
+                                                    scene.turtle_width_growth_factor,
+                                                    scene.turtle_rotation_angle)
+    interpreter.run(stream)
+    t.finish()
+    return interpreter.query_results
+
+def emit_geometry(stream, scene, template, tube_vertices=0):
+    t = turtle.GeometryTurtle(scene.turtle_line_width, 0, template, None, scene.internode_length_scale,
+                              tube_vertices=tube_vertices)
+    interpret_with(t, stream, scene)
+    return t.geometry.buffers[0]
+
+def benchmark_lstring(lstring, scene, template, repeat):
+    """Return dict of phase timings for interpretation of the given L-string"""
+    results = {"lstring_length": len(lstring)}
+    stripped = "".join(lstring.split())
+    results["apply_cuts"], cut = measure(lambda: command_stream.applyCuts(stripped), repeat)
+    commands = [m.group(0) for m in command_stream.TOKEN_PATTERN.finditer(cut)]
+    results["extract_args"], _ = measure(lambda: [command_stream.extractArgs(c) for c in commands], repeat)
+    results["tokenize"], stream = measure(lambda: command_stream.compile_lstring(lstring), repeat)
+    results["command_count"] = len(stream)
+    results["dryrun_interpretation"], query_results = measure(lambda: dryrun(stream, scene), repeat)
+    results["dryrun_interpretation_streamed"], _ = measure(lambda: dryrun(lstring, scene), repeat)
+    results["dryrun_interpretation_base_turtle"], _ = measure(
+        lambda: interpret_with(turtle.Turtle(scene.turtle_line_width, 0), stream, scene), repeat)
+    results["query_writeback"], _ = measure(
+        lambda: command_stream.substitute_queries(lstring, query_results), repeat)
+    results["query_count"] = len(query_results)
+    results["geometry_emission"], geometry = measure(lambda: emit_geometry(stream, scene, template), repeat)
+    results["vertex_count"] = geometry.vertex_count
+    results["tube_geometry_emission"], geometry = measure(
+        lambda: emit_geometry(stream, scene, template, scene.default_internode_cylinder_vertices), repeat)
+    results["tube_vertex_count"] = geometry.vertex_count
+    return results
+
+def benchmark_model(lpyfile_path, scene, template, repeat):
+    """Return dict of timings for the production step loop and interpretation of a .lpy model"""
+    def produce(snapshot_limit=0):
+        random.seed(0)
+        session = production.ProductionSession(lpyfile_path, snapshot_limit)
+        lstring_for_interpretation, stream = "", None
+        for step in range(session.derivation_length):
+            lstring_for_interpretation, stream = session.produce_step(lambda s: dryrun(s, scene),
+                                                                      final=step == session.derivation_length-1)
+            session.store_snapshot(step+1, lstring_for_interpretation)
+        return session, lstring_for_interpretation
+    results = {}
+    results["production"], (session, lstring_for_interpretation) = measure(produce, repeat)
+    # snapshots are taken after each step as in the operator, they should add little to the step loop
+    results["production_with_snapshots"], _ = measure(lambda: produce(5000000), repeat)
+    results["snapshot_overhead"] = results["production_with_snapshots"]["min"] / results["production"]["min"] - 1
+    results["steps"] = session.derivation_length
+    results["materialize_lstring"], lstring = measure(lambda: str(session.axialtree), repeat)
+    results["quote_string_args"], _ = measure(lambda: production.quote_string_args(lstring), repeat)
+    results.update(benchmark_lstring(lstring_for_interpretation, scene, template, repeat))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="number of commands of the synthetic L-strings")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the minimum is reported")
+    parser.add_argument("--models", default=MODELS_GLOB, help="glob pattern of .lpy files to benchmark")
+    parser.add_argument("--output", help="path of JSON result file (default: print to stdout)")
+    args = parser.parse_args(argv)
+
+    scene = bpy.context.scene
+    template = cylinder_template()
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "numpy_turtle": turtle_interpretation.numpy_turtle is not None,
+              "lpy": lpy is not None,
+              "synthetic": {},
+              "models": {}}
+    for size in args.sizes:
+        print("synthetic L-string, {} commands".format(size), file=sys.stderr)
+        report["synthetic"][str(size)] = benchmark_lstring(synthetic_lstring(size), scene, template, args.repeat)
+    for lpyfile_path in sorted(glob.glob(args.models)):
+        name = os.path.basename(lpyfile_path)
+        if lpy is None:
+            report["models"][name] = {"skipped": "L-Py (module lpy) not available"}
+            continue
+        print("model {}".format(name), file=sys.stderr)
+        try:
+            report["models"][name] = benchmark_model(lpyfile_path, scene, template, args.repeat)
+        except Exception as e: # e.g. models accessing blender scene objects
+            report["models"][name] = {"skipped": "{}: {}".format(type(e).__name__, e)}
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
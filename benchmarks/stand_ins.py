@@ -0,0 +1,223 @@
+"""
+Lightweight stand-ins for the blender modules bpy and mathutils,
+just enough to import and run the Lindenmaker production and interpretation code outside of blender.
+The stand-ins do not aim for speed or completeness, only for the behavior used by the addon.
+"""
+import os
+import sys
+import types
+from math import sin, cos, sqrt
+
+class Vector:
+    """Stand-in for mathutils.Vector"""
+
+    def __init__(self, values=(0, 0, 0)):
+        self.values = [float(v) for v in values]
+
+    def __len__(self):
+        return len(self.values)
+    def __iter__(self):
+        return iter(self.values)
+    def __getitem__(self, i):
+        return self.values[i]
+    def __setitem__(self, i, value):
+        self.values[i] = float(value)
+    def __repr__(self):
+        return "Vector({})".format(tuple(self.values))
+
+    x = property(lambda self: self.values[0])
+    y = property(lambda self: self.values[1])
+    z = property(lambda self: self.values[2])
+    xyz = property(lambda self: Vector(self.values[:3]))
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self.values, other))
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self.values, other))
+    def __neg__(self):
+        return Vector(-a for a in self.values)
+    def __mul__(self, factor):
+        return Vector(a * factor for a in self.values)
+    __rmul__ = __mul__
+
+    @property
+    def length(self):
+        return sqrt(sum(a * a for a in self.values))
+
+    def normalize(self):
+        length = self.length
+        if length > 0:
+            self.values = [a / length for a in self.values]
+
+    def normalized(self):
+        result = self.copy()
+        result.normalize()
+        return result
+
+    def resized(self, size):
+        return Vector((self.values + [0.0] * size)[:size])
+
+    def copy(self):
+        return Vector(self.values)
+
+    def cross(self, other):
+        a, b = self.values, list(other)
+        return Vector((a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0]))
+
+class MatrixColumns:
+    """Column access of a Matrix stand-in, e.g. mat.col[3] += vec"""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def __getitem__(self, j):
+        return Vector(row[j] for row in self.matrix.rows)
+
+    def __setitem__(self, j, vec):
+        for row, value in zip(self.matrix.rows, vec):
+            row[j] = float(value)
+
+class Matrix:
+    """Stand-in for mathutils.Matrix (4x4 only), multiplied via '*' as in blender 2.7x"""
+
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self.rows = [[float(v) for v in row] for row in rows]
+
+    @classmethod
+    def Identity(cls, size):
+        return cls()
+
+    @classmethod
+    def Translation(cls, vec):
+        result = cls()
+        for i, value in enumerate(vec):
+            result.rows[i][3] = value
+        return result
+
+    @classmethod
+    def Rotation(cls, angle, size, axis):
+        c, s = cos(angle), sin(angle)
+        result = cls()
+        m = result.rows
+        if axis == 'X':
+            m[1][1], m[1][2], m[2][1], m[2][2] = c, -s, s, c
+        elif axis == 'Y':
+            m[0][0], m[0][2], m[2][0], m[2][2] = c, s, -s, c
+        else:
+            m[0][0], m[0][1], m[1][0], m[1][1] = c, -s, s, c
+        return result
+
+    def __len__(self):
+        return 4
+    def __iter__(self):
+        return iter(self.rows)
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    @property
+    def col(self):
+        return MatrixColumns(self)
+
+    def copy(self):
+        return Matrix(self.rows)
+
+    def __mul__(self, other):
+        if isinstance(other, Matrix):
+            b = other.rows
+            return Matrix([[sum(row[k] * b[k][j] for k in range(4)) for j in range(4)] for row in self.rows])
+        vec = list(other)
+        if len(vec) == 3:
+            vec.append(1.0)
+            return Vector(sum(row[k] * vec[k] for k in range(4)) for row in self.rows[:3])
+        return Vector(sum(row[k] * vec[k] for k in range(4)) for row in self.rows)
+
+    def inverted(self):
+        """Gauss-Jordan elimination with partial pivoting"""
+        a = [row[:] + [1.0 if i == j else 0.0 for j in range(4)] for i, row in enumerate(self.rows)]
+        for col in range(4):
+            pivot = max(range(col, 4), key=lambda r: abs(a[r][col]))
+            a[col], a[pivot] = a[pivot], a[col]
+            p = a[col][col]
+            if p == 0:
+                raise ValueError("Matrix does not have an inverse")
+            a[col] = [v / p for v in a[col]]
+            for r in range(4):
+                if r != col and a[r][col] != 0:
+                    f = a[r][col]
+                    a[r] = [v - f * w for v, w in zip(a[r], a[col])]
+        return Matrix([row[4:] for row in a])
+
+class Scene(types.SimpleNamespace):
+    """Stand-in for bpy.types.Scene with the default values of the Lindenmaker scene properties"""
+
+    def __init__(self, **overrides):
+        defaults = dict(name="Scene",
+                        cursor_location=Vector((0, 0, 0)),
+                        turtle_step_size=2.0,
+                        turtle_rotation_angle=45.0,
+                        turtle_line_width=0.5,
+                        turtle_width_growth_factor=1.05,
+                        internode_length_scale=1.2,
+                        bool_draw_nodes=False,
+                        bool_force_shade_flat=False,
+                        bool_no_hierarchy=True,
+                        bool_merge_branches=False,
+                        bool_reuse_branch_meshes=False,
+                        bool_internode_tubes=False,
+                        default_internode_cylinder_vertices=5,
+                        default_node_icosphere_subdivisions=1,
+                        bool_lod=False,
+                        number_production_steps_done=0)
+        defaults.update(overrides)
+        super().__init__(**defaults)
+
+def create_bpy_module():
+    """Return bpy stand-in module with a scene and empty blender data collections"""
+    bpy = types.ModuleType("bpy")
+    bpy.context = types.SimpleNamespace(scene=Scene())
+    bpy.data = types.SimpleNamespace(objects={}, meshes={}, materials={})
+    bpy.types = types.SimpleNamespace(Scene=Scene)
+    bpy.ops = types.SimpleNamespace()
+    return bpy
+
+class BVHTree:
+    """Stand-in for mathutils.bvhtree.BVHTree, environment queries need blender objects and are not supported"""
+
+    @classmethod
+    def FromObject(cls, obj, scene):
+        raise NotImplementedError("BVHTree stand-in cannot index blender objects")
+
+def create_mathutils_module():
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = Vector
+    mathutils.Matrix = Matrix
+    mathutils.bvhtree = types.ModuleType("mathutils.bvhtree")
+    mathutils.bvhtree.BVHTree = BVHTree
+    return mathutils
+
+def install(package_dir=None):
+    """
+    Register the stand-ins as modules bpy and mathutils, and the addon directory as package lindenmaker,
+    so that the addon modules can be imported via 'from lindenmaker import ...'.
+    Modules that are actually installed (e.g. when running inside blender) are not replaced.
+    """
+    if package_dir is None:
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if "bpy" not in sys.modules:
+        try:
+            import bpy
+        except ImportError:
+            sys.modules["bpy"] = create_bpy_module()
+    if "mathutils" not in sys.modules:
+        try:
+            import mathutils
+        except ImportError:
+            sys.modules["mathutils"] = create_mathutils_module()
+            sys.modules["mathutils.bvhtree"] = sys.modules["mathutils"].bvhtree
+    if "lindenmaker" not in sys.modules:
+        package = types.ModuleType("lindenmaker")
+        package.__path__ = [package_dir]
+        sys.modules["lindenmaker"] = package
+    return sys.modules["bpy"]
@@ -0,0 +1,59 @@
+import bpy
+
+from lindenmaker import turtle
+
+# Removal of previous interpretation results via direct bpy.data access instead of operators.
+# Each result root stores the names of the meshes created for it (see store_result_meshes),
+# so that only those meshes are checked for removal, instead of all meshes of the blend file.
+# Mesh removal is done after the next interpretation, since branch meshes may be reused by it.
+
+def store_result_meshes(root, meshes):
+    """Record the given meshes as created for the interpretation result with the given root object"""
+    # stored as dict (name -> 1), since ID property arrays cannot hold strings.
+    # also branch meshes may be shared by several branches
+    root["lindenmaker_meshes"] = {mesh.name: 1 for mesh in meshes}
+
+def result_meshes(root):
+    """Return names of the meshes created for the interpretation result with the given root object"""
+    meshes = root.get("lindenmaker_meshes")
+    return list(meshes.keys()) if meshes is not None else []
+
+def get_hierarchy(root):
+    """Return root object and all its descendants, children before parents"""
+    # one pass over all objects, since obj.children iterates over all objects on each access
+    children = {}
+    for obj in bpy.data.objects:
+        if obj.parent is not None:
+            children.setdefault(obj.parent.name, []).append(obj)
+    hierarchy = [root]
+    for obj in hierarchy: # extended while iterating
+        hierarchy.extend(children.get(obj.name, ()))
+    hierarchy.reverse()
+    return hierarchy
+
+def remove_result(root):
+    """
+    Remove the objects of an interpretation result.
+    Returns the names of its meshes, which are to be passed to remove_unused_meshes after the next interpretation.
+    """
+    meshes = result_meshes(root)
+    for obj in get_hierarchy(root):
+        # unlinked first, since objects.remove has no do_unlink option before blender 2.78
+        for scene in obj.users_scene:
+            scene.objects.unlink(obj)
+        bpy.data.objects.remove(obj)
+    return meshes
+
+def remove_unused_meshes(names):
+    """Remove the named meshes if they are not used anymore, and forget them as reusable branch meshes"""
+    removed = set()
+    for name in names:
+        mesh = bpy.data.meshes.get(name)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+            removed.add(name)
+    if removed:
+        # names of removed meshes may be given to new meshes
+        for key, name in list(turtle.branch_mesh_cache.items()):
+            if name in removed:
+                del turtle.branch_mesh_cache[key]
@@ -0,0 +1,213 @@
+import codecs
+import re
+from array import array
+
+# symbols of all commands supported by the turtle interpretation.
+# the opcode of a command is the byte value of its symbol.
+COMMAND_SYMBOLS = "Ff[]+-&^\\/|_!;,~@?"
+OPCODES = frozenset(COMMAND_SYMBOLS.encode())
+
+# split into command symbols with optional parameters
+# e.g. "F(230,24)F[+(45)F]F" will yield F (230,24), F, [, +(45), F, ], F
+TOKEN_PATTERN = re.compile(r"([^()])(?:\(([^()]*)\))?")
+
+QUERY_PATTERN = re.compile(r"\?\([^()]*\)")
+
+CUT = ord('%')
+PUSH = ord('[')
+POP = ord(']')
+
+# L-strings given as file or buffer are read in chunks of this many characters (or bytes)
+CHUNK_SIZE = 1 << 20
+
+class CommandStream:
+    """
+    Compact pre-parsed form of an L-string used for turtle interpretation.
+    Stores one opcode byte per command and all numeric arguments in a flat array of doubles.
+    String arguments (e.g. object names) are kept in a separate dict by argument index.
+    Unsupported commands are dropped when compiling.
+    """
+
+    def __init__(self):
+        self.opcodes = bytearray()
+        self.arg_starts = array('L', [0]) # args of command i are args[arg_starts[i]:arg_starts[i+1]]
+        self.args = array('d')
+        self.string_args = {} # arg index -> string argument
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def append(self, opcode, args):
+        """Append command with given opcode and list of float or string arguments"""
+        self.opcodes.append(opcode)
+        for arg in args:
+            if isinstance(arg, str):
+                self.string_args[len(self.args)] = arg
+                self.args.append(0.0)
+            else:
+                self.args.append(arg)
+        self.arg_starts.append(len(self.args))
+
+    def get_args(self, i):
+        """Return list of arguments of the i-th command"""
+        start, end = self.arg_starts[i], self.arg_starts[i+1]
+        args = self.args[start:end].tolist()
+        if self.string_args:
+            for j in range(start, end):
+                if j in self.string_args:
+                    args[j-start] = self.string_args[j]
+        return args
+
+    def count(self, symbol):
+        """Return number of commands with given symbol"""
+        return self.opcodes.count(ord(symbol))
+
+    def last_index(self, symbol):
+        """Return index of the last command with given symbol, -1 if none"""
+        return self.opcodes.rfind(ord(symbol))
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """
+    Yield an L-string in text chunks. The source can be a string, a file object (text or binary)
+    or a bytes-like buffer (e.g. bytes or mmap). Binary data is decoded as UTF-8.
+    """
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start+chunk_size]
+        return
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    else:
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield decoder.decode(view[start:start+chunk_size])
+    yield decoder.decode(b'', final=True)
+
+def iter_tokens(source):
+    """
+    Yield (opcode, argument string or None) for each command symbol of the L-string,
+    reading the source chunk by chunk and removing all whitespace.
+    """
+    rest = ""
+    for chunk in iter_chunks(source):
+        text = rest + "".join(chunk.split())
+        # the last command may continue in the next chunk, i.e. its argument list.
+        # thus it is kept back, starting from its symbol.
+        open_paren, close_paren = text.rfind('('), text.rfind(')')
+        if open_paren > close_paren:
+            split = max(open_paren-1, 0) # argument list not closed yet
+        elif close_paren == len(text)-1:
+            split = len(text) # last command complete
+        else:
+            split = max(len(text)-1, 0) # argument list may follow
+        for match in TOKEN_PATTERN.finditer(text, 0, split):
+            yield ord(match.group(1)), match.group(2)
+        rest = text[split:]
+    for match in TOKEN_PATTERN.finditer(rest):
+        yield ord(match.group(1)), match.group(2)
+
+def iter_commands(source):
+    """
+    Yield (opcode, argument string or None) for each supported command of the L-string,
+    applying cuts ('%') on the fly. Apart from the current chunk, memory use is bounded.
+    """
+    # after a cut all tokens are skipped until the closing bracket
+    # of the current branch (not counting nested branches)
+    cut_bracket_balance = -1 # -1 if not within a cut segment
+    for opcode, argstring in iter_tokens(source):
+        if cut_bracket_balance >= 0:
+            if opcode == PUSH:
+                cut_bracket_balance += 1
+                continue
+            if opcode != POP:
+                continue
+            if cut_bracket_balance > 0:
+                cut_bracket_balance -= 1
+                continue
+            cut_bracket_balance = -1 # end of cut segment, closing bracket is kept
+        elif opcode == CUT:
+            cut_bracket_balance = 0
+            continue
+        if opcode not in OPCODES:
+            continue # unsupported commands are ignored
+        yield opcode, argstring
+
+def compile_lstring(lstring):
+    """
+    Parse L-string once into a CommandStream, removing whitespace and applying cuts ('%') in a single pass.
+    The L-string can also be given as file object or buffer (see iter_chunks).
+    """
+    stream = CommandStream()
+    for opcode, argstring in iter_commands(lstring):
+        stream.append(opcode, parseArgs(argstring))
+    return stream
+
+def substitute_queries(lstring, query_results):
+    """
+    Replace the n-th turtle state query command '?(...)' in the L-string by the n-th query result
+    (vector type, x, y, z) in a single pass. Queries without a result are left unchanged.
+    """
+    results = iter(query_results)
+    def replacement(match):
+        result = next(results, None)
+        if result is None:
+            return match.group(0)
+        return '?("{}",{},{},{})'.format(*result)
+    return QUERY_PATTERN.sub(replacement, lstring)
+
+def parseArgs(argstring):
+    """Return a list of arguments from comma separated argument string, cast to float where possible"""
+    if not argstring:
+        return []
+    result = []
+    for arg in argstring.split(','):
+        try:
+            result.append(float(arg)) # try to cast to float
+        except ValueError:
+            result.append(arg) # else just add string argument
+    return result
+
+##### REFERENCE IMPLEMENTATIONS #####
+# String based cuts and argument extraction as used by the interpretation before L-strings were compiled
+# into a CommandStream. Not used by production or interpretation anymore, only kept as reference
+# for the tests (tests/test_command_stream.py) and for timing the string based path in the benchmarks.
+
+BRACKET_PATTERN = re.compile(r"[\[\]]")
+
+def extractArgs(command):
+    """Return a list of the arguments of a command statement, e.g. A(arg1, arg2, .., argn) will return [arg1, arg2, .., argn]"""
+    argstring_list = re.findall(r"\((.+)\)", command)
+    if len(argstring_list) == 0:
+        return []
+    return parseArgs(argstring_list[0])
+
+def applyCuts(lstring):
+    """Remove branch segments following a cut command ('%') until the end of branch (i.e. until next unmatched closing bracket or end of string"""
+    # single pass: keep text up to each cut, then skip to the next unmatched closing bracket,
+    # counting the brackets of nested branches within the cut segment
+    if '%' not in lstring:
+        return lstring
+    kept = []
+    pos = 0
+    while True:
+        cut_start = lstring.find('%', pos)
+        if cut_start < 0:
+            kept.append(lstring[pos:])
+            break
+        kept.append(lstring[pos:cut_start])
+        bracket_balance = 0
+        pos = len(lstring) # no closing bracket found, thus cut until end of string
+        for match in BRACKET_PATTERN.finditer(lstring, cut_start):
+            if match.group() == '[':
+                bracket_balance += 1
+            elif bracket_balance == 0:
+                pos = match.start() # closing bracket of the branch is kept
+                break
+            else:
+                bracket_balance -= 1
+    return "".join(kept)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zlib
+
+# cache entries are stored as files in this directory, one per key
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "lindenmaker_derivation_cache")
+CACHE_FILE_EXTENSION = ".lcache"
+
+# .lpy files accessing the blender scene, e.g. via environment queries: import statements of bpy
+# or lindenmaker.environment (import bpy, from bpy import ..., from lindenmaker import environment, ...)
+SCENE_ACCESS_PATTERN = re.compile(rb"^[ \t]*(?:"
+                                  rb"import[ \t]+[\w., \t]*\b(?:bpy|lindenmaker\.environment)\b"
+                                  rb"|from[ \t]+(?:bpy|lindenmaker\.environment)\b"
+                                  rb"|from[ \t]+lindenmaker[ \t]+import[ \t]+[\w., \t(]*\benvironment\b)",
+                                  re.MULTILINE)
+
+def reads_scene(lpyfile_path):
+    """
+    Return whether the .lpy file imports bpy or lindenmaker.environment to access the blender scene.
+    Its derivation then depends on scene objects not covered by the cache key, thus it is not cached.
+    Mentions of the modules in comments or strings do not count, unless written as an import statement on its own line.
+    """
+    with open(lpyfile_path, 'rb') as f:
+        return SCENE_ACCESS_PATTERN.search(f.read()) is not None
+
+def cache_key(lpyfile_path, settings, steps):
+    """
+    Return key for the derivation of the given .lpy file with the given number of steps from the axiom.
+    The key is a hash of the file contents, the settings (sequence of values affecting the result,
+    e.g. turtle step size and rotation angle used by queries) and the step count.
+    """
+    h = hashlib.sha1()
+    with open(lpyfile_path, 'rb') as f:
+        h.update(f.read())
+    h.update(repr((tuple(settings), steps)).encode())
+    return h.hexdigest()
+
+class DerivationCache:
+    """
+    On-disk cache of derived L-strings for production and interpretation,
+    stored zlib compressed. Least recently used entries are removed if the total size exceeds max_size bytes.
+    The access time of an entry is kept as modification time of its file.
+    """
+
+    def __init__(self, max_size, directory=CACHE_DIR):
+        self.max_size = max_size
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key + CACHE_FILE_EXTENSION)
+
+    def load(self, key):
+        """Return tuple (L-string for production, L-string for interpretation) for key, or None if not cached"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(zlib.decompress(f.read()).decode())
+        except (OSError, ValueError, zlib.error):
+            return None
+        os.utime(path) # mark as recently used
+        return data["production"], data["interpretation"]
+
+    def store(self, key, lstring_for_production, lstring_for_interpretation):
+        """Store L-strings for key, then evict least recently used entries if over size limit"""
+        os.makedirs(self.directory, exist_ok=True)
+        data = json.dumps({"production": lstring_for_production,
+                           "interpretation": lstring_for_interpretation})
+        # write to temporary file first so that readers never see a partial entry
+        path = self.path(key)
+        with open(path + ".tmp", 'wb') as f:
+            f.write(zlib.compress(data.encode()))
+        os.replace(path + ".tmp", path)
+        self.evict()
+
+    def entries(self):
+        """Return list of (access time, size, path) of all cache entries"""
+        result = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_FILE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((stat.st_mtime, stat.st_size, path))
+        return result
+
+    def evict(self):
+        """Remove least recently used entries until the total size is within the limit"""
+        entries = sorted(self.entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """Remove all cache entries"""
+        if not os.path.isdir(self.directory):
+            return
+        for _, _, path in self.entries():
+            os.remove(path)
@@ -0,0 +1,173 @@
+import bpy
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+
+# Environment queries for .lpy files, e.g. to let a growing structure react to obstacles or light.
+# Usage within an .lpy file:
+#
+#     from lindenmaker import environment
+#     ...
+#     ?(vector,x,y,z):
+#         if vector == "P" and environment.is_nearby("Obstacle", (x, y, z), 1.0):
+#             produce %
+#
+# Queries refer to scene objects by name and use world coordinates. Each object is indexed once
+# via a BVHTree, which is only rebuilt if the object changed (checked once per operator call
+# and after each dryrun interpretation for turtle state queries).
+# Queries for the positions of all turtle state queries '?' of a step are evaluated in one batch
+# on first use and cached for the rest of the step.
+
+# BVHTree index per object name
+indices = {}
+# positions of the position queries ?("P",x,y,z) of the current step, in order and as set
+step_query_positions = []
+step_query_position_set = set()
+# cached batch results of the current step by (query type, object name, position)
+step_results = {}
+# object names whose index was validated in the current step
+validated = set()
+
+class ObjectIndex:
+    """BVHTree of an object in object space, with its world matrix to transform queries"""
+
+    def __init__(self, obj, scene):
+        self.fingerprint = fingerprint(obj)
+        self.tree = BVHTree.FromObject(obj, scene) # modifiers applied
+        self.matrix = obj.matrix_world.copy()
+        self.matrix_inverse = self.matrix.inverted()
+        self.normal_matrix = self.matrix_inverse.transposed().to_3x3()
+
+    def nearest(self, point):
+        """Return (location, normal, distance) of closest surface point in world space, or None"""
+        location, normal, index, _ = self.tree.find_nearest(self.matrix_inverse * Vector(point))
+        if location is None:
+            return None
+        location = self.matrix * location
+        normal = (self.normal_matrix * normal).normalized()
+        return location, normal, (location - Vector(point)).length
+
+    def ray_cast(self, origin, direction, distance):
+        """Return (location, normal, distance) of first hit in world space, or None"""
+        origin = Vector(origin)
+        local_origin = self.matrix_inverse * origin
+        local_direction = self.matrix_inverse.to_3x3() * Vector(direction)
+        location, normal, index, _ = self.tree.ray_cast(local_origin, local_direction)
+        if location is None:
+            return None
+        location = self.matrix * location
+        hit_distance = (location - origin).length
+        if hit_distance > distance:
+            return None
+        return location, (self.normal_matrix * normal).normalized(), hit_distance
+
+def fingerprint(obj):
+    """Return value that changes if the object geometry or transformation changes (cheap, no vertex access)"""
+    data = obj.data
+    return (tuple(tuple(row) for row in obj.matrix_world),
+            data.name if data is not None else None,
+            len(data.vertices) if hasattr(data, "vertices") else 0,
+            len(obj.modifiers))
+
+def get_index(objname):
+    """Return ObjectIndex of the named object, building it if not built yet or if the object changed"""
+    index = indices.get(objname)
+    if index is not None and objname in validated:
+        return index
+    obj = bpy.data.objects.get(objname)
+    if obj is None:
+        raise KeyError("Environment query: No object named '{}'".format(objname))
+    if index is None or index.fingerprint != fingerprint(obj):
+        index = indices[objname] = ObjectIndex(obj, bpy.context.scene)
+    validated.add(objname)
+    return index
+
+def reset():
+    """Drop all indices, e.g. before production from the axiom"""
+    indices.clear()
+    begin_step()
+
+def begin_step(query_results=()):
+    """
+    Start a new production step with the given turtle state query results (vector type, x, y, z) of the last dryrun.
+    Objects are checked for changes again and cached query results are dropped.
+    """
+    validated.clear()
+    step_results.clear()
+    step_query_positions[:] = [tuple(result[1:]) for result in query_results if result[0] == "P"]
+    step_query_position_set.clear()
+    step_query_position_set.update(step_query_positions)
+
+def cached_step_query(kind, objname, point, batch_function):
+    """
+    Return result of query for point. If the point is one of the query positions of the current step,
+    the query is evaluated for all query positions of the step in one batch and cached.
+    """
+    point = tuple(point)
+    key = (kind, objname, point)
+    if key in step_results:
+        return step_results[key]
+    if point in step_query_position_set:
+        for position, result in zip(step_query_positions, batch_function(objname, step_query_positions)):
+            step_results[(kind, objname, position)] = result
+        return step_results[key]
+    return batch_function(objname, [point])[0]
+
+##### QUERIES #####
+
+def nearest(objname, point):
+    """Return (location, normal, distance) of the closest point on the surface of the named object, or None"""
+    return cached_step_query("nearest", objname, point, nearest_batch)
+
+def is_nearby(objname, point, distance):
+    """Return whether the surface of the named object is closer to point than distance"""
+    result = nearest(objname, point)
+    return result is not None and result[2] < distance
+
+def is_inside(objname, point):
+    """Return whether point is inside the named object, assuming a closed mesh with outward normals"""
+    return cached_step_query("inside", objname, point, is_inside_batch)
+
+def ray_hit(objname, origin, direction, distance=float("inf")):
+    """Return (location, normal, distance) of the first hit of the ray with the named object, or None"""
+    return get_index(objname).ray_cast(origin, direction, distance)
+
+def light_direction(point, lightname="Sun"):
+    """Return normalized direction from point towards the named light object"""
+    return (bpy.data.objects[lightname].matrix_world.translation - Vector(point)).normalized()
+
+def light_exposure(point, lightname="Sun", occluders=()):
+    """
+    Return 1.0 if the named light object is visible from point, 0.0 if any of the named occluder objects is in between.
+    """
+    return light_exposure_batch([point], lightname, occluders)[0]
+
+##### BATCH QUERIES (one call for many points) #####
+
+def nearest_batch(objname, points):
+    index = get_index(objname)
+    return [index.nearest(point) for point in points]
+
+def is_nearby_batch(objname, points, distance):
+    return [result is not None and result[2] < distance for result in nearest_batch(objname, points)]
+
+def is_inside_batch(objname, points):
+    index = get_index(objname)
+    results = []
+    for point, result in zip(points, (index.nearest(point) for point in points)):
+        results.append(result is not None and (Vector(point) - result[0]).dot(result[1]) < 0)
+    return results
+
+def ray_hit_batch(objname, origins, directions, distance=float("inf")):
+    index = get_index(objname)
+    return [index.ray_cast(origin, direction, distance) for origin, direction in zip(origins, directions)]
+
+def light_exposure_batch(points, lightname="Sun", occluders=()):
+    light_position = bpy.data.objects[lightname].matrix_world.translation
+    occluder_indices = [get_index(name) for name in occluders]
+    results = []
+    for point in points:
+        to_light = light_position - Vector(point)
+        distance = to_light.length
+        occluded = any(index.ray_cast(point, to_light, distance) is not None for index in occluder_indices)
+        results.append(0.0 if occluded else 1.0)
+    return results
@@ -0,0 +1,303 @@
+from array import array
+from math import cos, sin, pi, sqrt
+
+class MeshTemplate:
+    """Flat vertex and polygon data of a mesh, used to emit transformed copies of it into a GeometryBuffer"""
+
+    def __init__(self, coords, loop_vertices, loop_starts, loop_totals,
+                 poly_slots=None, material_keys=None):
+        self.coords = array('f', coords)               # x,y,z per vertex
+        self.loop_vertices = array('i', loop_vertices) # vertex index per loop
+        self.loop_starts = array('i', loop_starts)     # first loop per polygon
+        self.loop_totals = array('i', loop_totals)     # loop count per polygon
+        # per polygon material slot index and material key per slot (if any),
+        # used if no material key is given when emitting the template
+        self.poly_slots = array('i', poly_slots if poly_slots is not None else [0]*len(self.loop_starts))
+        self.material_keys = list(material_keys) if material_keys else []
+
+    @property
+    def vertex_count(self):
+        return len(self.coords) // 3
+
+    @classmethod
+    def from_mesh(cls, mesh, material_keys=None):
+        """Read template data from a blender mesh via foreach_get (no per vertex python objects)"""
+        coords = array('f', [0.0]) * (len(mesh.vertices)*3)
+        mesh.vertices.foreach_get("co", coords)
+        loop_vertices = array('i', [0]) * len(mesh.loops)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        loop_starts = array('i', [0]) * len(mesh.polygons)
+        mesh.polygons.foreach_get("loop_start", loop_starts)
+        loop_totals = array('i', [0]) * len(mesh.polygons)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+        poly_slots = array('i', [0]) * len(mesh.polygons)
+        mesh.polygons.foreach_get("material_index", poly_slots)
+        return cls(coords, loop_vertices, loop_starts, loop_totals, poly_slots, material_keys)
+
+
+# cylinder templates by ring vertex count
+cylinder_templates = {}
+
+def cylinder_template(vertex_count):
+    """
+    Return MeshTemplate of a capped cylinder along x from 0 to 1 with radius 0.5,
+    with the same dimensions as the default internode mesh, e.g. for lower levels of detail
+    """
+    template = cylinder_templates.get(vertex_count)
+    if template is not None:
+        return template
+    n = vertex_count
+    coords = []
+    for x in (0.0, 1.0):
+        for k in range(n):
+            coords.extend((x, 0.5*cos(2*pi*k/n), 0.5*sin(2*pi*k/n)))
+    loop_vertices = []
+    for k in range(n):
+        k1 = (k+1) % n
+        loop_vertices.extend((k, k1, n+k1, n+k))
+    loop_vertices.extend(range(n-1, -1, -1))
+    loop_vertices.extend(range(n, 2*n))
+    loop_starts = [4*k for k in range(n)] + [4*n, 5*n]
+    loop_totals = [4]*n + [n, n]
+    template = cylinder_templates[vertex_count] = MeshTemplate(coords, loop_vertices, loop_starts, loop_totals)
+    return template
+
+
+class TubePath:
+    """
+    Path of a generalized cylinder through consecutive internodes: ring centers and radii,
+    the direction of the first ring vertex (turtle left vector) and the material key.
+    Internodes continue a tube if they start at its end with the same material, see GeometryBuffer.add_tube.
+    """
+
+    def __init__(self, start, radius, reference, material_key=None):
+        self.points = [tuple(start)]
+        self.radii = [radius]
+        self.reference = tuple(reference)
+        self.material_key = material_key
+
+    def continues_at(self, point, material_key):
+        """Return whether an internode starting at point with the given material key continues the tube"""
+        if material_key != self.material_key:
+            return False
+        x, y, z = self.points[-1]
+        dx, dy, dz = point[0]-x, point[1]-y, point[2]-z
+        return dx*dx + dy*dy + dz*dz <= 1e-12 * (1.0 + x*x + y*y + z*z)
+
+    def extend(self, end, radius):
+        """Add internode from the end of the tube to end, the joint ring takes the radius of the new internode"""
+        self.radii[-1] = radius
+        if not self.continues_at(end, self.material_key): # zero length internodes only change the radius
+            self.points.append(tuple(end))
+            self.radii.append(radius)
+
+    def split(self, min_radius):
+        """
+        Split tube at internodes thinner than min_radius.
+        Returns list of TubePaths of the thicker runs and list of (start, end) points of the thin internodes.
+        """
+        if min_radius <= 0.0 or len(self.points) < 2 or min(self.radii[:-1]) >= min_radius:
+            return [self], []
+        paths, lines = [], []
+        path = None
+        for i in range(len(self.points)-1):
+            if self.radii[i] < min_radius: # radius of the internode starting at point i
+                lines.append((self.points[i], self.points[i+1]))
+                path = None
+                continue
+            if path is None:
+                path = TubePath(self.points[i], self.radii[i], self.reference, self.material_key)
+                paths.append(path)
+            path.points.append(self.points[i+1])
+            path.radii.append(self.radii[i+1])
+        return paths, lines
+
+    def key(self, digits=5):
+        """Return hashable key of the rounded tube geometry"""
+        return (self.material_key,
+                tuple(round(value, digits) for point in self.points for value in point),
+                tuple(round(radius, digits) for radius in self.radii),
+                tuple(round(value, digits) for value in self.reference))
+
+
+def normalized(v):
+    length = sqrt(v[0]*v[0] + v[1]*v[1] + v[2]*v[2])
+    if length == 0.0:
+        return None
+    return (v[0]/length, v[1]/length, v[2]/length)
+
+
+class GeometryBuffer:
+    """
+    Collects transformed vertex, polygon and material data of many modules in flat arrays,
+    so that a single mesh can be created at once instead of joining objects one by one.
+    Materials are referenced via hashable keys (e.g. turtle material index or material name)
+    which are resolved to actual materials only when writing the mesh.
+    """
+
+    def __init__(self, smooth=True):
+        self.coords = array('f')
+        self.loop_vertices = array('i')
+        self.loop_starts = array('i')
+        self.loop_totals = array('i')
+        self.poly_slots = array('i')
+        self.edge_vertices = array('i') # loose edges, two vertex indices per edge
+        self.material_keys = [] # material key per material slot
+        self.material_slots = {} # material key -> slot index
+        self.smooth = smooth
+
+    @classmethod
+    def from_arrays(cls, arrays, material_keys, smooth=True):
+        """
+        Return buffer with the given flat arrays by attribute name, e.g. memoryviews of a sidecar file,
+        to write previously collected geometry to a mesh
+        """
+        buffer = cls(smooth)
+        for name, data in arrays.items():
+            setattr(buffer, name, data)
+        for key in material_keys:
+            buffer.material_slot(key)
+        return buffer
+
+    @property
+    def vertex_count(self):
+        return len(self.coords) // 3
+
+    @property
+    def polygon_count(self):
+        return len(self.loop_starts)
+
+    def material_slot(self, key):
+        """Return slot index for material key, adding a new slot if needed"""
+        slot = self.material_slots.get(key)
+        if slot is None:
+            slot = self.material_slots[key] = len(self.material_keys)
+            self.material_keys.append(key)
+        return slot
+
+    def add_instance(self, template, matrix, material_key=None):
+        """
+        Append a copy of the template transformed by the given 4x4 matrix (indexable as matrix[row][col]).
+        If material_key is given all polygons use that material,
+        else the material keys of the template are used.
+        """
+        vertex_offset = self.vertex_count
+        loop_offset = len(self.loop_vertices)
+
+        (m00, m01, m02, m03), (m10, m11, m12, m13), (m20, m21, m22, m23) = \
+            tuple(matrix[0]), tuple(matrix[1]), tuple(matrix[2])
+        src = template.coords
+        coords = [0.0]*len(src)
+        for i in range(0, len(src), 3):
+            x, y, z = src[i], src[i+1], src[i+2]
+            coords[i]   = m00*x + m01*y + m02*z + m03
+            coords[i+1] = m10*x + m11*y + m12*z + m13
+            coords[i+2] = m20*x + m21*y + m22*z + m23
+        self.coords.extend(coords)
+
+        self.loop_vertices.extend([v + vertex_offset for v in template.loop_vertices])
+        self.loop_starts.extend([s + loop_offset for s in template.loop_starts])
+        self.loop_totals.extend(template.loop_totals)
+
+        if material_key is not None:
+            self.poly_slots.extend([self.material_slot(material_key)]*len(template.loop_starts))
+        elif template.material_keys:
+            slotmap = [self.material_slot(key) for key in template.material_keys]
+            self.poly_slots.extend([slotmap[min(s, len(slotmap)-1)] for s in template.poly_slots])
+        else:
+            self.poly_slots.extend([0]*len(template.loop_starts))
+
+    def add_buffer(self, other, matrix):
+        """Append the geometry of another buffer transformed by the given 4x4 matrix, keeping its materials"""
+        vertex_offset = self.vertex_count
+        self.add_instance(other, matrix)
+        self.edge_vertices.extend([v + vertex_offset for v in other.edge_vertices])
+
+    def add_tube(self, tube, vertex_count):
+        """
+        Append a generalized cylinder along the TubePath, with rings of vertex_count vertices shared
+        between consecutive internodes and a cap at both ends. Rings at joints are perpendicular to
+        the mean direction of the adjacent internodes, the first ring vertex direction is carried
+        along the path (projected onto each ring plane) so that the tube does not twist with turtle rolls.
+        """
+        points, radii = tube.points, tube.radii
+        if len(points) < 2:
+            return
+        vertex_offset = self.vertex_count
+        loop_offset = len(self.loop_vertices)
+        n = vertex_count
+
+        directions = [normalized((b[0]-a[0], b[1]-a[1], b[2]-a[2])) for a, b in zip(points, points[1:])]
+        angles = [(cos(2*pi*k/n), sin(2*pi*k/n)) for k in range(n)]
+        u = tube.reference
+        coords = []
+        for i, (p, r) in enumerate(zip(points, radii)):
+            if i == 0:
+                t = directions[0]
+            elif i == len(directions):
+                t = directions[-1]
+            else:
+                a, b = directions[i-1], directions[i]
+                t = normalized((a[0]+b[0], a[1]+b[1], a[2]+b[2])) or b # b if the path reverses
+            d = u[0]*t[0] + u[1]*t[1] + u[2]*t[2]
+            projected = normalized((u[0]-d*t[0], u[1]-d*t[1], u[2]-d*t[2]))
+            if projected is None: # reference parallel to the path, use any perpendicular direction
+                projected = normalized((t[1], -t[0], 0.0)) or (1.0, 0.0, 0.0)
+            u = projected
+            v = (t[1]*u[2]-t[2]*u[1], t[2]*u[0]-t[0]*u[2], t[0]*u[1]-t[1]*u[0]) # t x u
+            for c, s in angles:
+                coords.append(p[0] + r*(c*u[0] + s*v[0]))
+                coords.append(p[1] + r*(c*u[1] + s*v[1]))
+                coords.append(p[2] + r*(c*u[2] + s*v[2]))
+        self.coords.extend(coords)
+
+        # quads between consecutive rings, vertices counterclockwise seen from outside
+        loop_vertices = []
+        for i in range(len(points)-1):
+            ring = vertex_offset + i*n
+            for k in range(n):
+                k1 = (k+1) % n
+                loop_vertices.extend((ring+k, ring+k1, ring+n+k1, ring+n+k))
+        quad_count = (len(points)-1)*n
+        # caps, the start cap facing backwards
+        first, last = vertex_offset, vertex_offset + (len(points)-1)*n
+        loop_vertices.extend(first+k for k in range(n-1, -1, -1))
+        loop_vertices.extend(last+k for k in range(n))
+        self.loop_vertices.extend(loop_vertices)
+        self.loop_starts.extend([loop_offset + 4*q for q in range(quad_count)])
+        self.loop_starts.extend((loop_offset + 4*quad_count, loop_offset + 4*quad_count + n))
+        self.loop_totals.extend([4]*quad_count)
+        self.loop_totals.extend((n, n))
+        slot = self.material_slot(tube.material_key) if tube.material_key is not None else 0
+        self.poly_slots.extend([slot]*(quad_count+2))
+
+    def add_line(self, start, end):
+        """Append a loose edge from start to end, e.g. for internodes too thin to be drawn as geometry"""
+        vertex_offset = self.vertex_count
+        self.coords.extend(start)
+        self.coords.extend(end)
+        self.edge_vertices.extend((vertex_offset, vertex_offset+1))
+
+    def write_to_mesh(self, mesh, resolve_material=None):
+        """
+        Write collected data to an empty blender mesh in a few bulk foreach_set calls.
+        resolve_material maps a material key to the material appended to the mesh material slots.
+        """
+        polygon_count = self.polygon_count
+        mesh.vertices.add(self.vertex_count)
+        mesh.vertices.foreach_set("co", self.coords)
+        if self.edge_vertices:
+            # edges of polygons are added by calc_edges
+            mesh.edges.add(len(self.edge_vertices) // 2)
+            mesh.edges.foreach_set("vertices", self.edge_vertices)
+        mesh.loops.add(len(self.loop_vertices))
+        mesh.loops.foreach_set("vertex_index", self.loop_vertices)
+        mesh.polygons.add(polygon_count)
+        mesh.polygons.foreach_set("loop_start", self.loop_starts)
+        mesh.polygons.foreach_set("loop_total", self.loop_totals)
+        mesh.polygons.foreach_set("material_index", self.poly_slots)
+        mesh.polygons.foreach_set("use_smooth", [self.smooth]*polygon_count)
+        mesh.update(calc_edges=True)
+        if resolve_material is not None:
+            for key in self.material_keys:
+                mesh.materials.append(resolve_material(key))
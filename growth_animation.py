@@ -0,0 +1,230 @@
+import bpy
+import json
+import mmap
+import os
+from array import array
+from bpy.app.handlers import persistent
+from math import radians
+
+from lindenmaker import production
+from lindenmaker import environment
+from lindenmaker import command_stream
+from lindenmaker import batch_production
+from lindenmaker import turtle
+from lindenmaker import turtle_interpretation
+from lindenmaker.geometry_buffer import GeometryBuffer
+
+# Growth animation: the geometry of each derivation step is precomputed once into a GeometrySequence,
+# a frame change handler then swaps the mesh of the growth object to the geometry of the step
+# belonging to the current frame, so that scrubbing and rendering do not run L-Py or the turtle again.
+
+# geometry sequence by scene name, either kept in memory or memory-mapped from a sidecar file
+sequences = {}
+# names of the meshes already written for the steps of the current sequence, by scene name and step.
+# the growth object switches between these meshes, so that each step is only written once.
+step_meshes = {}
+
+# GeometryBuffer arrays stored per step, with their array typecodes
+ARRAYS = (("coords", 'f'),
+          ("loop_vertices", 'i'),
+          ("loop_starts", 'i'),
+          ("loop_totals", 'i'),
+          ("poly_slots", 'i'),
+          ("edge_vertices", 'i'))
+
+class GeometrySequence:
+    """
+    Geometry of consecutive derivation steps as flat vertex/polygon arrays.
+    Without path the arrays are kept in memory, else they are appended to a sidecar file,
+    which is memory-mapped once finished, along with a json index of array offsets per step.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.steps = [] # per step: dict with arrays (name -> array, or (offset, count) in file), material keys and smooth
+        self.file = open(path + ".tmp", 'wb') if path is not None else None
+        self.map = None
+
+    @classmethod
+    def load(cls, path):
+        """Open finished sequence from sidecar file"""
+        sequence = cls()
+        sequence.path = path
+        with open(path + ".json") as f:
+            sequence.steps = json.load(f)
+        sequence.open_map()
+        return sequence
+
+    def __len__(self):
+        return len(self.steps)
+
+    def append(self, buffer):
+        """Add geometry of the next step"""
+        step = {"material_keys": list(buffer.material_keys), "smooth": buffer.smooth}
+        if self.file is None:
+            step["arrays"] = {name: getattr(buffer, name) for name, typecode in ARRAYS}
+        else:
+            step["arrays"] = arrays = {}
+            for name, typecode in ARRAYS:
+                data = array(typecode, getattr(buffer, name))
+                arrays[name] = (self.file.tell(), len(data))
+                data.tofile(self.file)
+        self.steps.append(step)
+
+    def finish(self):
+        """Move finished sidecar file into place and memory-map it"""
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        os.replace(self.path + ".tmp", self.path)
+        with open(self.path + ".json", 'w') as f:
+            json.dump(self.steps, f)
+        self.open_map()
+
+    def open_map(self):
+        with open(self.path, 'rb') as f:
+            # empty files cannot be mapped
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def geometry(self, step):
+        """Return GeometryBuffer of the given step, backed by the sequence arrays without copying"""
+        data = self.steps[step]
+        if self.map is None:
+            arrays = data["arrays"]
+        else:
+            view = memoryview(self.map)
+            arrays = {}
+            for name, typecode in ARRAYS:
+                offset, count = data["arrays"][name]
+                arrays[name] = view[offset:offset + count*4].cast(typecode) # 4 byte items
+        return GeometryBuffer.from_arrays(arrays, data["material_keys"], data["smooth"])
+
+    def discard(self):
+        """Remove unfinished sidecar file (if cancelled)"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.path + ".tmp")
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.map = None
+
+def set_sequence(scene, sequence):
+    """Replace the geometry sequence of the scene, step meshes of the previous sequence not in use are removed"""
+    previous = sequences.pop(scene.name, None)
+    if previous is not None:
+        previous.close()
+    for name in step_meshes.pop(scene.name, {}).values():
+        mesh = bpy.data.meshes.get(name)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    if sequence is not None:
+        sequences[scene.name] = sequence
+
+def release_file(scene, path):
+    """Drop the sequence of the scene if it is memory-mapped from the given file, which is about to be replaced"""
+    previous = sequences.get(scene.name)
+    if previous is not None and previous.path == path:
+        set_sequence(scene, None)
+
+def get_sequence(scene):
+    """Return geometry sequence of the scene, loading the sidecar file if not in memory (e.g. after reopening the .blend file)"""
+    sequence = sequences.get(scene.name)
+    if sequence is None and scene.growth_cache_path and os.path.isfile(scene.growth_cache_path + ".json"):
+        sequence = sequences[scene.name] = GeometrySequence.load(scene.growth_cache_path)
+    return sequence
+
+def build_steps(scene, path=None):
+    """
+    Generator deriving the L-system of the scene .lpy file from the axiom and collecting the geometry
+    of each step (first level of detail, without hierarchy), yielding (progress label, fraction done)
+    after each step and returning the finished GeometrySequence.
+    If closed early (cancelled), the partial sequence is discarded.
+    """
+    session = production.ProductionSession(scene.lpyfile_path)
+    settings = batch_production.settings_from_scene(scene)
+    internode_mesh, node_mesh = turtle.get_module_meshes()
+    internode_template, node_templates = turtle.lod_templates(settings.lod_levels[:1], internode_mesh, node_mesh)
+    templates = {} # custom object name -> MeshTemplate
+
+    def dryrun(stream):
+        query_results = turtle_interpretation.interpret(stream,
+                                                        settings.step_size,
+                                                        settings.line_width,
+                                                        settings.width_growth_factor,
+                                                        settings.rotation_angle,
+                                                        dryrun_nodraw=True)
+        environment.begin_step(query_results)
+        return query_results
+    environment.begin_step()
+
+    def geometry(stream):
+        t = turtle.GeometryTurtle(settings.line_width, 0, internode_template,
+                                  node_templates[0] if node_templates else None,
+                                  settings.internode_length_scale, settings.smooth, settings.tube_vertices,
+                                  settings.lod_levels[:1])
+        interpreter = turtle_interpretation.Interpreter(t, settings.step_size,
+                                                        settings.width_growth_factor,
+                                                        settings.rotation_angle)
+        interpreter.run(stream)
+        t.finish()
+        batch_production.add_custom_objects(t.geometry.buffers, t.custom_objects, templates)
+        return t.geometry.buffers[0]
+
+    sequence = GeometrySequence(path)
+    try:
+        steps = session.derivation_length
+        # step 0 is the axiom
+        sequence.append(geometry(command_stream.compile_lstring(str(session.interpret()))))
+        for step in range(steps):
+            yield "Growth step {}/{}".format(step+1, steps), step / steps
+            # the homomorphism is applied in each step, since each step is drawn
+            lstring_for_interpretation, stream = session.produce_step(dryrun, final=True)
+            if stream is None:
+                stream = command_stream.compile_lstring(lstring_for_interpretation)
+            sequence.append(geometry(stream))
+        sequence.finish()
+    except BaseException:
+        sequence.discard()
+        raise
+    return sequence
+
+def frame_step(scene, step_count):
+    """Return step shown at the current frame, each step is held for the given number of frames"""
+    step = (scene.frame_current - scene.growth_start_frame) // scene.growth_frames_per_step
+    return min(max(step, 0), step_count - 1)
+
+def show_step(scene, obj, sequence, step):
+    """Switch the growth object to the mesh of the given step, which is written on first use"""
+    meshes = step_meshes.setdefault(scene.name, {})
+    mesh = bpy.data.meshes.get(meshes.get(step, ""))
+    if mesh is None:
+        mesh = bpy.data.meshes.new("{} Step {}".format(obj.name, step))
+        mesh.use_auto_smooth = True
+        mesh.auto_smooth_angle = radians(85)
+        sequence.geometry(step).write_to_mesh(mesh, turtle.resolve_material)
+        meshes[step] = mesh.name
+    old_mesh = obj.data
+    obj.data = mesh
+    obj["lindenmaker_growth_step"] = step
+    # meshes of a previous sequence or the initial empty mesh
+    if old_mesh is not None and old_mesh.users == 0 and old_mesh.name not in meshes.values():
+        bpy.data.meshes.remove(old_mesh)
+
+@persistent
+def update_growth(scene):
+    """Frame change handler showing the step of the current frame on the growth object"""
+    if not scene.bool_growth_animation:
+        return
+    obj = bpy.data.objects.get(scene.growth_object_name)
+    if obj is None or obj.type != 'MESH':
+        return
+    sequence = get_sequence(scene)
+    if sequence is None or len(sequence) == 0:
+        return
+    step = frame_step(scene, len(sequence))
+    if obj.get("lindenmaker_growth_step") != step or obj.data.name != step_meshes.get(scene.name, {}).get(step):
+        show_step(scene, obj, sequence, step)
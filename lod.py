@@ -0,0 +1,98 @@
+from collections import namedtuple
+
+from lindenmaker.geometry_buffer import GeometryBuffer, cylinder_template
+
+# Level of detail rules for geometry emission into GeometryBuffers:
+# - internodes thinner than full_detail_width get proportionally fewer ring vertices (at least 3),
+#   if drawn with the default internode cylinder or as tubes
+# - nodes smaller than min_node_width are skipped
+# - internodes thinner than min_internode_width are drawn as loose edges ('LINE') or dropped ('DROP')
+# Several levels can be emitted in the same interpretation pass, see LodGeometry.
+LodLevel = namedtuple("LodLevel",
+    ["ring_vertices", "full_detail_width", "min_node_width", "min_internode_width", "thin_internodes",
+     "node_subdivisions"])
+
+def levels(ring_vertices, node_subdivisions, full_detail_width=0.0, min_node_width=0.0,
+           min_internode_width=0.0, thin_internodes='DROP', count=1):
+    """
+    Return list of count LodLevels. Each further level has half the ring vertices,
+    one node subdivision less and twice the width thresholds of the previous level.
+    """
+    result = []
+    for i in range(count):
+        factor = 2**i
+        result.append(LodLevel(max(ring_vertices // factor, 3),
+                               full_detail_width * factor,
+                               min_node_width * factor,
+                               min_internode_width * factor,
+                               thin_internodes,
+                               max(node_subdivisions - i, 1)))
+    return result
+
+def levels_from_scene(scene):
+    """Return LodLevels of the scene settings, a single level without reductions if level of detail is disabled"""
+    if not scene.bool_lod:
+        return levels(scene.default_internode_cylinder_vertices, scene.default_node_icosphere_subdivisions)
+    return levels(scene.default_internode_cylinder_vertices,
+                  scene.default_node_icosphere_subdivisions,
+                  scene.lod_full_detail_width,
+                  scene.lod_min_node_width,
+                  scene.lod_min_internode_width,
+                  scene.lod_thin_internodes,
+                  scene.lod_level_count)
+
+def ring_vertices(level, width):
+    """Return ring vertex count of an internode with the given width"""
+    if level.full_detail_width <= 0.0 or width >= level.full_detail_width:
+        return level.ring_vertices
+    return max(int(round(level.ring_vertices * width / level.full_detail_width)), 3)
+
+
+class LodGeometry:
+    """
+    Geometry of all levels of detail of one interpretation, collected in one GeometryBuffer per level.
+    Each module is emitted once per level, following the rules of the level.
+    Internodes use the given internode template, or if None a cylinder template with the ring vertex count of the level.
+    Nodes use one template per level.
+    """
+
+    def __init__(self, levels, internode_template=None, node_templates=None, smooth=True):
+        self.levels = levels
+        self.internode_template = internode_template
+        self.node_templates = node_templates
+        self.buffers = [GeometryBuffer(smooth) for level in levels]
+
+    def add_internode(self, matrix, width, material_key=None):
+        """
+        Add internode given as 4x4 matrix of the turtle scaled by internode length and width.
+        Its line runs from the matrix origin along the scaled x axis.
+        """
+        for level, buffer in zip(self.levels, self.buffers):
+            if width < level.min_internode_width:
+                if level.thin_internodes == 'LINE':
+                    start = (matrix[0][3], matrix[1][3], matrix[2][3])
+                    buffer.add_line(start, (start[0]+matrix[0][0], start[1]+matrix[1][0], start[2]+matrix[2][0]))
+                continue
+            template = self.internode_template or cylinder_template(ring_vertices(level, width))
+            buffer.add_instance(template, matrix, material_key)
+
+    def add_node(self, matrix, size, material_key=None):
+        """Add node given as 4x4 matrix of the turtle scaled by the node size"""
+        for level, buffer, template in zip(self.levels, self.buffers, self.node_templates):
+            if size >= level.min_node_width:
+                buffer.add_instance(template, matrix, material_key)
+
+    def add_instance(self, template, matrix, material_key=None):
+        """Add transformed copy of the template to all levels, e.g. for custom objects"""
+        for buffer in self.buffers:
+            buffer.add_instance(template, matrix, material_key)
+
+    def add_tube(self, tube):
+        """Add TubePath to all levels, split into thick and thin internodes and with ring vertices by width"""
+        for level, buffer in zip(self.levels, self.buffers):
+            paths, lines = tube.split(level.min_internode_width / 2)
+            for path in paths:
+                buffer.add_tube(path, ring_vertices(level, 2*max(path.radii)))
+            if level.thin_internodes == 'LINE':
+                for start, end in lines:
+                    buffer.add_line(start, end)
@@ -0,0 +1,133 @@
+import gzip
+import mmap
+import os
+import struct
+
+# L-string stores by scene name
+stores = {}
+
+# names of the L-strings kept per scene
+NAMES = ("lstring_for_production", "lstring_for_interpretation")
+
+def get_store(scene_name, directory, compress=False):
+    """
+    Return L-string store of the scene, creating a new one if directory or compression changed.
+    The L-strings of the previous store are moved to the new one, e.g. when the default directory
+    changes from the temporary directory to the one next to the .blend file on first save.
+    Moves files, so it must not be called while drawing the UI, see preview_store.
+    """
+    store = stores.get(scene_name)
+    if store is None or store.directory != directory or store.compress != compress:
+        previous = store
+        store = stores[scene_name] = LStringStore(directory, scene_name, compress)
+        if previous is not None:
+            store.move_from(previous)
+    return store
+
+def preview_store(scene_name, directory, compress=False):
+    """
+    Return store to read previews from without moving files: the store of the scene if one exists
+    (where the L-strings are until moved by get_store), else an unregistered store for the given settings.
+    """
+    store = stores.get(scene_name)
+    if store is not None:
+        return store
+    return LStringStore(directory, scene_name, compress)
+
+class LStringStore:
+    """
+    Keeps large L-strings in sidecar files instead of blender string properties,
+    so that they are not saved into the .blend file and not drawn in full in the UI.
+    Files are either plain UTF-8 text, which can be memory-mapped for streaming interpretation,
+    or gzip compressed. Previews (start of the L-string and its size) are read lazily and cached.
+    """
+
+    def __init__(self, directory, prefix, compress=False):
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self.previews = {} # name -> ((file modification time, file size), preview, size)
+
+    def path(self, name):
+        extension = ".lstring.gz" if self.compress else ".lstring"
+        return os.path.join(self.directory, "{}_{}{}".format(self.prefix, name, extension))
+
+    def move_from(self, other):
+        """Move the L-strings of another store here (converting compression if needed), replacing stored ones"""
+        for name in NAMES:
+            source = other.path(name)
+            if not os.path.isfile(source) or os.path.abspath(source) == os.path.abspath(self.path(name)):
+                continue
+            self.write(name, other.read(name))
+            os.remove(source)
+
+    def write(self, name, lstring):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        # write to temporary file first so that open memory maps of the old file stay valid
+        if self.compress:
+            with gzip.open(path + ".tmp", 'wt', encoding='utf-8', compresslevel=1) as f:
+                f.write(lstring)
+        else:
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(lstring)
+        os.replace(path + ".tmp", path)
+
+    def read(self, name):
+        """Return whole L-string, empty if not stored yet"""
+        path = self.path(name)
+        if not os.path.isfile(path):
+            return ""
+        if self.compress:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return f.read()
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def open(self, name):
+        """
+        Return L-string as buffer for streaming (see command_stream.iter_chunks),
+        a memory map or a gzip file object which has to be closed by the caller.
+        Returns an empty string if the L-string is empty or not stored yet.
+        """
+        path = self.path(name)
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            return ""
+        if self.compress:
+            return gzip.open(path, 'rb')
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def size(self, name):
+        """Return size of the uncompressed L-string in bytes"""
+        path = self.path(name)
+        if not os.path.isfile(path):
+            return 0
+        if not self.compress:
+            return os.path.getsize(path)
+        if os.path.getsize(path) < 4:
+            return 0
+        with open(path, 'rb') as f:
+            # the gzip trailer ends with the uncompressed size (modulo 2^32)
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', f.read(4))[0]
+
+    def preview(self, name, length=100):
+        """Return tuple (start of the L-string, size in bytes), cached as long as the file is unchanged"""
+        path = self.path(name)
+        if not os.path.isfile(path):
+            return "", 0
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self.previews.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        if self.compress:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                preview = f.read(length)
+        else:
+            with open(path, encoding='utf-8') as f:
+                preview = f.read(length)
+        size = self.size(name)
+        self.previews[name] = (version, preview, size)
+        return preview, size
@@ -0,0 +1,146 @@
+import numpy as np
+from math import radians, sin, cos
+from functools import reduce
+
+def rotation_matrix(angle_degrees, axis):
+    """Return 4x4 rotation matrix around local axis 'X', 'Y' or 'Z' (same convention as mathutils.Matrix.Rotation)"""
+    c, s = cos(radians(angle_degrees)), sin(radians(angle_degrees))
+    m = np.identity(4)
+    if axis == 'X':
+        m[1, 1], m[1, 2], m[2, 1], m[2, 2] = c, -s, s, c
+    elif axis == 'Y':
+        m[0, 0], m[0, 2], m[2, 0], m[2, 2] = c, s, -s, c
+    else:
+        m[0, 0], m[0, 1], m[1, 0], m[1, 1] = c, -s, s, c
+    return m
+
+def translation_matrix(stepsize):
+    """Return 4x4 matrix moving along local x axis (turtle heading)"""
+    m = np.identity(4)
+    m[0, 3] = stepsize
+    return m
+
+class NumpyTurtle:
+    """
+    Alternative to the Turtle base class for dry-run interpretation, storing the turtle state in NumPy arrays.
+    Rotation matrices are cached per angle, the stack is a preallocated array of frames,
+    and consecutive rotate and move commands are only queued and multiplied onto the
+    turtle matrix in one batch when the state is actually needed (push, query, look at).
+    Runs of commands before a pop are discarded without being computed at all.
+    """
+
+    def __init__(self, _linewidth, _materialindex, stack_capacity=64):
+        self.linewidth = _linewidth
+        self.materialindex = _materialindex
+        # rotate such that heading is in +Z (we want to grow upwards in blender)
+        # we thus have heading = +Z, left = -Y, up = +X
+        self._mat = rotation_matrix(270, 'Y')
+        self.pending = [] # queued local transformation matrices not yet applied to _mat
+        self.rotation_cache = {} # (axis, angle) -> rotation matrix
+        # stack to save and restore turtle state
+        self.stack_size = 0
+        self.stack_mats = np.empty((stack_capacity, 4, 4))
+        self.stack_linewidths = np.empty(stack_capacity)
+        self.stack_materialindices = np.empty(stack_capacity, dtype=int)
+
+    @property
+    def mat(self):
+        """Current turtle matrix (heading, up, left, position as columns)"""
+        self.flush()
+        return self._mat
+
+    def flush(self):
+        """Apply all queued rotate and move commands as one batch"""
+        pending = self.pending
+        if not pending:
+            return
+        if len(pending) == 1:
+            self._mat = self._mat.dot(pending[0])
+        else:
+            self._mat = self._mat.dot(reduce(np.dot, pending))
+        self.pending = []
+
+    def push(self):
+        """Push turtle state to stack"""
+        if self.stack_size == len(self.stack_mats):
+            # grow preallocated stack
+            capacity = 2*len(self.stack_mats)
+            self.stack_mats = np.resize(self.stack_mats, (capacity, 4, 4))
+            self.stack_linewidths = np.resize(self.stack_linewidths, capacity)
+            self.stack_materialindices = np.resize(self.stack_materialindices, capacity)
+        i = self.stack_size
+        self.stack_mats[i] = self.mat
+        self.stack_linewidths[i] = self.linewidth
+        self.stack_materialindices[i] = self.materialindex
+        self.stack_size += 1
+
+    def pop(self):
+        """Pop last turtle state from stack and use as current"""
+        if self.stack_size == 0:
+            # same error as the list based stack of the base Turtle on unbalanced ']'
+            raise IndexError("pop from empty list")
+        self.stack_size -= 1
+        i = self.stack_size
+        self.pending = [] # commands since last state access have no effect anymore
+        self._mat = self.stack_mats[i].copy()
+        self.linewidth = float(self.stack_linewidths[i])
+        self.materialindex = int(self.stack_materialindices[i])
+
+    def move(self, stepsize):
+        """Move turtle in its heading direction."""
+        self.pending.append(translation_matrix(stepsize))
+
+    def rotation(self, angle_degrees, axis):
+        key = (axis, angle_degrees)
+        m = self.rotation_cache.get(key)
+        if m is None:
+            m = self.rotation_cache[key] = rotation_matrix(angle_degrees, axis)
+        return m
+
+    def turn(self, angle_degrees):
+        self.pending.append(self.rotation(angle_degrees, 'Z'))
+    def pitch(self, angle_degrees):
+        self.pending.append(self.rotation(angle_degrees, 'Y'))
+    def roll(self, angle_degrees):
+        self.pending.append(self.rotation(angle_degrees, 'X'))
+
+    def look_at(self, target):
+        """
+        Let turtle look at a given 3D target vector point,
+        keeping the relative orientation (handedness) of heading, up and left vectors.
+        """
+        mat = self.mat
+        turtle_to_target = np.asarray(tuple(target), dtype=float) - mat[:3, 3]
+        turtle_to_target /= np.linalg.norm(turtle_to_target)
+        old_up = mat[:3, 1] / np.linalg.norm(mat[:3, 1])
+        left = np.cross(old_up, turtle_to_target)
+        left /= np.linalg.norm(left)
+        up = np.cross(left, turtle_to_target)
+        up /= np.linalg.norm(up)
+        result_mat = np.identity(4)
+        result_mat[:3, 0] = turtle_to_target
+        result_mat[:3, 1] = up
+        result_mat[:3, 2] = left
+        result_mat[:, 3] = mat[:, 3]
+        self._mat = result_mat
+
+    def query_vector(self, col):
+        """Return column of turtle matrix (orientation vectors 0-2, position 3) as x, y, z tuple"""
+        mat = self.mat
+        return (float(mat[0, col]), float(mat[1, col]), float(mat[2, col]))
+
+    def query_frame(self):
+        """Return heading, left, up and position vector (same order as for queries) as array of 12 floats"""
+        return self.mat[:3, :4].T.ravel()
+
+    def draw_internode_module(self, length=None, width=None):
+        """DELIBERATRELY NOT IMPLEMENTED"""
+        pass
+
+    def draw_module_from_custom_object(self, objname=None, objscale=None):
+        """DELIBERATRELY NOT IMPLEMENTED"""
+        pass
+
+    def finish(self):
+        """Called once after the last command has been interpreted"""
+        pass
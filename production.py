@@ -0,0 +1,207 @@
+import lpy
+import os.path
+import re
+from collections import OrderedDict
+
+from lindenmaker import command_stream
+from lindenmaker import profiling
+
+# production sessions by scene name, kept between operator calls
+sessions = {}
+
+def get_session(scene_name, lpyfile_path, snapshot_limit=5000000):
+    """Return production session of the scene, creating a new one if the .lpy file changed"""
+    session = sessions.get(scene_name)
+    if session is None or not session.is_valid_for(lpyfile_path):
+        session = sessions[scene_name] = ProductionSession(lpyfile_path, snapshot_limit)
+    elif session.snapshot_limit != snapshot_limit:
+        session.snapshot_limit = snapshot_limit
+        session.trim_snapshots()
+    return session
+
+def quote_string_args(lstring):
+    """
+    Substitute occurrences of e.g. ~(Object,4) with ~("Object",4) or ?(P,0,0,0) with ?("P",0,0,0).
+    L-Py strips the quotes when converting to string, but without them the string cannot be parsed again.
+    """
+    return re.sub(r'(?<=[~\?]\()(\w*)(?=[,\)])', r'"\1"', lstring)
+
+class ProductionSession:
+    """
+    Keeps the compiled L-Py Lsystem and the current L-string for production as AxialTree in memory,
+    so that stepwise production does not have to reload the .lpy file or parse the L-string again.
+    The string form of the L-string is only created on request, e.g. to show it in the UI.
+    """
+
+    def __init__(self, lpyfile_path, snapshot_limit=5000000):
+        self.lpyfile_path = lpyfile_path
+        self.lpyfile_mtime = os.path.getmtime(lpyfile_path)
+        self.lsys = lpy.Lsystem(lpyfile_path)
+        self.axialtree = None # current L-string for production, None if no step done yet
+        self.lstring = "" # string form of axialtree, valid as long as lstring_is_current
+        self.lstring_is_current = True
+        # per-step snapshots by step in ascending order: (copy of AxialTree for production, L-string for interpretation, size).
+        # the size is the module count of the tree plus the length of the L-string for interpretation,
+        # the oldest snapshots are dropped while the total size exceeds snapshot_limit.
+        # the string form of the production L-string is only created when seeking to the step
+        self.snapshots = OrderedDict()
+        self.snapshot_size = 0
+        self.snapshot_limit = snapshot_limit
+
+    def is_valid_for(self, lpyfile_path):
+        return (lpyfile_path == self.lpyfile_path
+                and os.path.isfile(lpyfile_path)
+                and os.path.getmtime(lpyfile_path) == self.lpyfile_mtime)
+
+    @property
+    def derivation_length(self):
+        return self.lsys.derivationLength
+
+    def reset(self):
+        """Start over from the axiom"""
+        self.axialtree = None
+        self.lstring = ""
+        self.lstring_is_current = True
+
+    def sync(self, lstring):
+        """
+        Make sure the session continues from the given L-string for production,
+        which may have been edited in the UI (or restored via undo) in the meantime.
+        The string is only parsed if it differs from the one last materialized.
+        """
+        if lstring == "":
+            self.reset()
+        elif not self.lstring_is_current or lstring != self.lstring:
+            self.axialtree = lpy.AxialTree(lstring)
+            self.lstring = lstring
+            self.lstring_is_current = True
+
+    def derive_step(self):
+        """Apply one production step to the current L-string (or axiom) and return resulting AxialTree"""
+        if self.axialtree is None:
+            self.axialtree = self.lsys.derive(self.lsys.axiom, 1)
+        else:
+            self.axialtree = self.lsys.derive(self.axialtree, 1)
+        self.lstring_is_current = False
+        return self.axialtree
+
+    def interpret(self):
+        """
+        Apply homomorphism substitution rules to the current L-string and return resulting AxialTree.
+        This is an L-Py feature intended as a postproduction step
+        to replace abstract module names by actual interpretation commands.
+        """
+        if self.axialtree is None:
+            return self.lsys.interpret(self.lsys.axiom)
+        return self.lsys.interpret(self.axialtree)
+
+    def has_queries(self):
+        """Return whether the current L-string for production contains turtle state query modules '?'"""
+        return self.axialtree is not None and self.axialtree.count('?') > 0
+
+    def produce_step(self, dryrun, final=True):
+        """
+        Apply one production step and the homomorphism, then perform the turtle state queries
+        via dryrun(stream), a function doing a dryrun interpretation of the given CommandStream
+        and returning its query results.
+        Returns the L-string for interpretation and its compiled CommandStream,
+        which is None if the L-string contains no queries (compiling and dryrun are skipped).
+        If final is False (further steps follow) and there are no queries to resolve,
+        the homomorphism is skipped as well and (None, None) is returned.
+        """
+        with profiling.phase("derive") as p:
+            p.set(size=len(self.derive_step()))
+        if not final and not self.has_queries():
+            return None, None
+        with profiling.phase("homomorphism") as p:
+            interpretation_tree = self.interpret()
+            p.set(size=len(interpretation_tree))
+        with profiling.phase("to string") as p:
+            lstring_for_interpretation = str(interpretation_tree)
+            p.set(size=len(lstring_for_interpretation))
+        # fast scan for query commands, most L-systems do not use them
+        if '?' not in lstring_for_interpretation:
+            return lstring_for_interpretation, None
+        with profiling.phase("compile", size=len(lstring_for_interpretation)):
+            stream = command_stream.compile_lstring(lstring_for_interpretation)
+        query_results = dryrun(stream)
+        with profiling.phase("query write-back", size=len(query_results)):
+            self.apply_query_results(query_results)
+        return lstring_for_interpretation, stream
+
+    def apply_query_results(self, query_results):
+        """
+        Replace the arguments of the n-th turtle state query module '?' of the current L-string
+        by the n-th query result (vector type, x, y, z), directly in the AxialTree.
+        """
+        if self.axialtree is None or not query_results:
+            return
+        results = iter(query_results)
+        result = next(results)
+        for i, module in enumerate(self.axialtree):
+            if module.name != '?':
+                continue
+            self.axialtree[i] = lpy.ParamModule('?', *result)
+            result = next(results, None)
+            if result is None:
+                break
+        self.lstring_is_current = False
+
+    def store_snapshot(self, step, lstring_for_interpretation):
+        """
+        Keep snapshot of the current L-string for production (with query results) and the given
+        L-string for interpretation as result of the given step. Only the most recent steps are kept,
+        up to a total size of snapshot_limit.
+        The L-string for interpretation may be None if the homomorphism was skipped, it is then applied on seek.
+        If the step is not after the last snapshot, production branched off from an earlier step
+        and the snapshots of the later steps are discarded.
+        """
+        if self.snapshot_limit <= 0:
+            return
+        while self.snapshots and next(reversed(self.snapshots)) >= step:
+            self.snapshot_size -= self.snapshots.popitem()[1][2]
+        # the tree is copied, since query results are written into the current tree
+        axialtree = lpy.AxialTree(self.axialtree) if self.axialtree is not None else None
+        size = (len(axialtree) if axialtree is not None else 0) + len(lstring_for_interpretation or "")
+        self.snapshots[step] = (axialtree, lstring_for_interpretation, size)
+        self.snapshot_size += size
+        self.trim_snapshots()
+
+    def trim_snapshots(self):
+        """Drop the oldest snapshots while their total size exceeds the limit"""
+        while self.snapshots and self.snapshot_size > self.snapshot_limit:
+            self.snapshot_size -= self.snapshots.popitem(last=False)[1][2]
+
+    def has_snapshot(self, step):
+        return step == 0 or step in self.snapshots
+
+    def seek(self, step):
+        """
+        Continue from the snapshot of the given step (0 is the axiom).
+        Returns tuple (L-string for production, L-string for interpretation) of that step, or None if not kept.
+        """
+        if not self.has_snapshot(step):
+            return None
+        if step == 0:
+            self.reset()
+            return "", ""
+        axialtree, lstring_for_interpretation, _ = self.snapshots[step]
+        if axialtree is None:
+            self.reset()
+        else:
+            # copied again, so that the snapshot is kept unchanged by further steps
+            self.axialtree = lpy.AxialTree(axialtree)
+            self.lstring_is_current = False
+        if lstring_for_interpretation is None:
+            lstring_for_interpretation = str(self.interpret())
+        return self.production_lstring(), lstring_for_interpretation
+
+    def production_lstring(self):
+        """Return string form of the current L-string for production (materialized on demand)"""
+        if not self.lstring_is_current:
+            with profiling.phase("to string"):
+                lstring = str(self.axialtree)
+            with profiling.phase("quote string args", size=len(lstring)):
+                self.lstring = quote_string_args(lstring)
+            self.lstring_is_current = True
+        return self.lstring
@@ -0,0 +1,100 @@
+import json
+import time
+
+# profiler of the current operator call, None if profiling is disabled.
+# instrumented code records phases via profiling.phase(name), which does nothing if no profiler is active.
+active = None
+
+class Phase:
+    """Timed phase of a Profiler, used as context manager. Additional values (e.g. L-string size) can be added via set()."""
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+class NoPhase:
+    """Stand-in for Phase if profiling is disabled"""
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NO_PHASE = NoPhase()
+
+def phase(name, **args):
+    """Return context manager timing the named phase if profiling is active"""
+    if active is None:
+        return NO_PHASE
+    return Phase(active, name, args)
+
+class Profiler:
+    """
+    Records wall time of named phases (e.g. derive, homomorphism, dryrun) with optional values like step number
+    and L-string size. Phases can be nested. Provides a per-phase summary and a Chrome trace
+    (viewable via chrome://tracing or https://ui.perfetto.dev).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.events = [] # (name, start, duration, args)
+        self.totals = {} # name -> [total duration, calls, total size]
+
+    def phase(self, name, **args):
+        return Phase(self, name, args)
+
+    def record(self, name, start, duration, args):
+        self.events.append((name, start, duration, args))
+        total = self.totals.get(name)
+        if total is None:
+            total = self.totals[name] = [0.0, 0, 0]
+        total[0] += duration
+        total[1] += 1
+        total[2] += args.get("size", 0)
+
+    def summary(self):
+        """Return list of (phase name, total seconds, calls, average size) sorted by total time, largest first"""
+        return sorted(((name, duration, calls, size // calls)
+                       for name, (duration, calls, size) in self.totals.items()),
+                      key=lambda item: -item[1])
+
+    def summary_lines(self):
+        lines = []
+        for name, duration, calls, size in self.summary():
+            line = "{}: {:.1f} ms, {}x".format(name, duration*1000, calls)
+            if size:
+                line += ", size {}".format(size)
+            lines.append(line)
+        return lines
+
+    def trace(self):
+        """Return Chrome trace event format dict (complete events, microseconds relative to profiler start)"""
+        return {"traceEvents": [{"name": name,
+                                 "ph": "X",
+                                 "ts": (start - self.start) * 1e6,
+                                 "dur": duration * 1e6,
+                                 "pid": 0,
+                                 "tid": 0,
+                                 "args": args}
+                                for name, start, duration, args in self.events],
+                "displayTimeUnit": "ms"}
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
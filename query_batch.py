@@ -0,0 +1,63 @@
+import numpy as np
+
+# query batch of the last dryrun interpretation, None if batch queries are disabled.
+# .lpy files can use it to evaluate environment logic for all turtle state queries of a step at once, e.g.
+#
+#     from lindenmaker import query_batch
+#     def StartEach():
+#         global sunExposure
+#         batch = query_batch.current
+#         if batch is not None:
+#             toSun = sunPos - batch.P
+#             sunExposure = toSun[:, 2] / np.linalg.norm(toSun, axis=1)
+#     ...
+#     ?(vector,x,y,z):
+#         i = query_batch.current.index(vector, x, y, z)
+#         if sunExposure[i] < 0.2:
+#             produce %
+current = None
+
+class QueryBatch:
+    """
+    Turtle frames at all turtle state queries '?' of a dryrun interpretation, in order of the queries.
+    The heading, left, up and position vectors are NumPy arrays H, L, U, P of shape (number of queries, 3).
+    """
+
+    def __init__(self, query_results, frames):
+        self.types = [result[0] for result in query_results]
+        frames = np.asarray(frames, dtype=float).reshape(-1, 4, 3)
+        self.H = frames[:, 0]
+        self.L = frames[:, 1]
+        self.U = frames[:, 2]
+        self.P = frames[:, 3]
+        # query indices by query result (vector type, x, y, z) as written back to the L-string.
+        # several queries can have the same result (e.g. same heading), they are told apart by order
+        self.indices = {}
+        for i, result in enumerate(query_results):
+            self.indices.setdefault(tuple(result), []).append(i)
+        self.occurrences = {} # query result -> number of index calls so far
+
+    def __len__(self):
+        return len(self.types)
+
+    def index(self, vector, x, y, z):
+        """
+        Return index of the query with the given result, e.g. from the parameters of a '?' module in a production.
+        Queries with the same result are returned in L-string order on consecutive calls,
+        as L-Py applies the production to the query modules one after another.
+        """
+        key = (vector, x, y, z)
+        indices = self.indices[key]
+        occurrence = self.occurrences.get(key, 0)
+        self.occurrences[key] = occurrence + 1
+        return indices[occurrence % len(indices)]
+
+def publish(query_results, frames):
+    """Make the query batch of a dryrun available as query_batch.current"""
+    global current
+    current = QueryBatch(query_results, frames)
+    return current
+
+def clear():
+    global current
+    current = None
@@ -0,0 +1,92 @@
+"""
+Minimal stand-in for the L-Py module lpy, used by the tests of production.py outside of blender.
+An Lsystem is configured directly with an axiom and functions replacing single modules,
+instead of being loaded from an .lpy file. Module names are single characters.
+"""
+import ast
+import re
+import sys
+import types
+
+MODULE_PATTERN = re.compile(r"(\S)(?:\(([^()]*)\))?")
+
+def parse_arg(arg):
+    """Return number or string argument, names without quotes are strings as well"""
+    try:
+        return ast.literal_eval(arg)
+    except (ValueError, SyntaxError):
+        return arg.strip()
+
+class ParamModule:
+
+    def __init__(self, name, *args):
+        self.name = name
+        self.args = args
+
+    def __str__(self):
+        # like L-Py, string arguments lose their quotes
+        return self.name + ("({})".format(",".join(str(arg) for arg in self.args)) if self.args else "")
+
+class AxialTree(list):
+    """List of modules, created from a string or copied from another AxialTree"""
+
+    def __init__(self, value=()):
+        if isinstance(value, str):
+            value = [ParamModule(name, *(parse_arg(arg) for arg in args.split(",") if args))
+                     for name, args in MODULE_PATTERN.findall(value)]
+        super().__init__(value)
+
+    def count(self, name):
+        return sum(1 for module in self if module.name == name)
+
+    def __str__(self):
+        return "".join(str(module) for module in self)
+
+class Lsystem:
+    """
+    L-system with the given axiom, applying production(module) in each derivation step
+    and homomorphism(module) on interpretation. Both return the replacement as string, or None to keep the module.
+    Counts the calls of derive and interpret.
+    """
+
+    def __init__(self, axiom, derivation_length=1, production=None, homomorphism=None):
+        self.axiom = AxialTree(axiom)
+        self.derivationLength = derivation_length
+        self.production = production or (lambda module: None)
+        self.homomorphism = homomorphism or (lambda module: None)
+        self.derive_calls = 0
+        self.interpret_calls = 0
+
+    @staticmethod
+    def apply(tree, rule):
+        result = AxialTree()
+        for module in tree:
+            replacement = rule(module)
+            if replacement is None:
+                result.append(module)
+            else:
+                result.extend(AxialTree(replacement))
+        return result
+
+    def derive(self, tree, steps):
+        self.derive_calls += 1
+        for i in range(steps):
+            tree = self.apply(tree, self.production)
+        return tree
+
+    def interpret(self, tree):
+        self.interpret_calls += 1
+        return self.apply(tree, self.homomorphism)
+
+def module(create_lsystem):
+    """Return lpy stand-in module creating Lsystems via create_lsystem(path), to replace production.lpy"""
+    return types.SimpleNamespace(AxialTree=AxialTree, ParamModule=ParamModule, Lsystem=create_lsystem)
+
+def install():
+    """Register the stand-in as module lpy if L-Py is not installed, return the lpy module"""
+    if "lpy" not in sys.modules:
+        try:
+            import lpy
+        except ImportError:
+            sys.modules["lpy"] = sys.modules[__name__]
+    return sys.modules["lpy"]
@@ -0,0 +1,64 @@
+"""
+Tests of batch production (batch_production.py), run outside of blender with the L-Py stand-in:
+
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+import lpy_stand_in
+lpy_stand_in.install()
+
+from lindenmaker import batch_production
+from lindenmaker import environment
+from lindenmaker import lod
+from lindenmaker import production
+from lindenmaker.geometry_buffer import cylinder_template
+
+def random_growth(module):
+    """Apex A grows an internode of random length and a side branch, with a position query"""
+    if module.name == 'A':
+        return "F({:.4f})[+({:.1f})?(P,0,0,0)A]A".format(random.uniform(0.5, 2.0), random.uniform(10, 60))
+    return None
+
+class ProduceInstanceTest(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch.object(production, "lpy",
+                                  lpy_stand_in.module(lambda path: lpy_stand_in.Lsystem("A", 4, random_growth)))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.settings = batch_production.InterpretationSettings(2.0, 0.5, 1.05, 45.0, 1.0, True, 0,
+                                                                lod.levels(4, 1))
+
+    def produce(self, seed):
+        buffers, custom_objects = batch_production.produce_instance(__file__, seed, self.settings,
+                                                                    cylinder_template(4))
+        return buffers[0].coords
+
+    def test_same_seed_gives_same_instance(self):
+        first = self.produce(3)
+        random.seed(100) # state left by other code must not matter
+        self.assertEqual(self.produce(3), first)
+        self.assertNotEqual(self.produce(4), first)
+
+    def test_environment_step_is_reset(self):
+        # state left over from a previous production must not be used
+        environment.validated.add("Obstacle")
+        environment.step_results[("nearest", "Obstacle", (0.0, 0.0, 0.0))] = None
+        with mock.patch.object(environment, "begin_step", wraps=environment.begin_step) as begin_step:
+            self.produce(3)
+        self.assertFalse(environment.validated)
+        self.assertFalse(environment.step_results)
+        # once before production, then after each dryrun with its query results
+        self.assertEqual(begin_step.call_args_list[0], mock.call())
+        self.assertTrue(any(call[0] for call in begin_step.call_args_list[1:]))
+
+if __name__ == "__main__":
+    unittest.main()
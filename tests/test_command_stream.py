@@ -0,0 +1,162 @@
+"""
+Tests of L-string compilation (command_stream.py) against the original string based implementation
+of cuts and argument extraction. Run outside of blender with the stand-ins from benchmarks/stand_ins.py:
+
+    python -m unittest discover tests
+"""
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import command_stream
+
+def baseline_applyCuts(lstring):
+    """Original applyCuts, marking all segments to cut first and removing them afterwards"""
+    segments_to_cut = []
+    searching_end_of_branch = False
+    bracketBalance = 0
+    cut_start = cut_end = None
+    for i, c in enumerate(lstring):
+        if searching_end_of_branch:
+            if c == '[':
+                bracketBalance += 1
+            elif c == ']':
+                bracketBalance -= 1
+            if bracketBalance < 0:
+                searching_end_of_branch = False
+                bracketBalance = 0
+                cut_end = i
+                segments_to_cut.append((cut_start, cut_end))
+        elif c == '%':
+            searching_end_of_branch = True
+            cut_start = i
+    if searching_end_of_branch:
+        segments_to_cut.append((cut_start, len(lstring)+1))
+    result = lstring
+    for (start, end) in segments_to_cut:
+        result = result[:start] + '%'*(end-start) + result[end:]
+    return result.replace('%', '')
+
+def baseline_extractArgs(command):
+    """Original extractArgs"""
+    argstring_list = re.findall(r"\((.+)\)", command)
+    if len(argstring_list) == 0:
+        return []
+    result = []
+    for arg in re.split(',', argstring_list[0]):
+        try:
+            result.append(float(arg))
+        except ValueError:
+            result.append(arg)
+    return result
+
+def baseline_commands(lstring):
+    """Supported commands (symbol, arguments) as found by the original interpretation loop"""
+    lstring = baseline_applyCuts("".join(lstring.split()))
+    commands = re.findall(r"[^()](?:\([^()]*\))?", lstring)
+    return [(cmd[0], baseline_extractArgs(cmd)) for cmd in commands if cmd[0] in command_stream.COMMAND_SYMBOLS]
+
+def compiled_commands(source):
+    stream = command_stream.compile_lstring(source)
+    return [(chr(stream.opcodes[i]), stream.get_args(i)) for i in range(len(stream))]
+
+CUT_CASES = [
+    "",
+    "FFF",
+    "F%F",                          # unclosed cut at top level
+    "F[+F%F[-F]F]F",                # nested branch within cut segment
+    "F[+F[-F%F[F[F]]F]F]F",         # cut in nested branch with deeper nesting
+    "F[%F]F[%F]F",                  # multiple cuts
+    "F[F%F%F]F",                    # cut within cut segment
+    "F[F%F[F]F",                    # unclosed cut within branch
+    "F]%F",                         # unmatched closing bracket before cut
+    "%",
+    "F[+F%]F",                      # cut directly before closing bracket
+]
+
+# brackets within argument lists are counted like any other bracket when cutting
+BRACKET_ARGUMENT_CASES = [
+    'F[%~("A[B",1)F]F',
+    'F[%~("A]B",1)F]F',
+    '~("[",1)F%F]F',
+]
+
+COMPILE_CASES = CUT_CASES + [
+    "F(1)[+(30)F(2,0.5)]-(20)F",
+    " F ( 1 ) \n[ + F ]\tF ",         # whitespace everywhere
+    "F()F(1)",                      # empty parentheses
+    'A(1)B~("Leaf",2)X?("P",0,0,0)', # unsupported modules are dropped
+    "F[+F%F(1,2)[-F(3)]F]F(4)!(0.5);(2)",
+]
+
+class ApplyCutsTest(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        for lstring in CUT_CASES + BRACKET_ARGUMENT_CASES:
+            with self.subTest(lstring=lstring):
+                self.assertEqual(command_stream.applyCuts(lstring), baseline_applyCuts(lstring))
+
+class ExtractArgsTest(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        for command in ["F", "F(1)", "F(1,2.5)", "+(-45)", '~("Leaf",0.5,1,2)', "?(P,0,0,0)",
+                        'F("a",b)', "F(1e-3,2E5)", 'F(1,"[",2)']:
+            with self.subTest(command=command):
+                self.assertEqual(command_stream.extractArgs(command), baseline_extractArgs(command))
+
+    def test_empty_parentheses(self):
+        # the original pattern requires at least one character between the parentheses
+        self.assertEqual(command_stream.extractArgs("F()"), [])
+        self.assertEqual(baseline_extractArgs("F()"), [])
+        self.assertEqual(command_stream.parseArgs(""), [])
+        self.assertEqual(command_stream.parseArgs(None), [])
+
+class CompileLStringTest(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        for lstring in COMPILE_CASES:
+            with self.subTest(lstring=lstring):
+                self.assertEqual(compiled_commands(lstring), baseline_commands(lstring))
+
+    def test_bracket_in_argument(self):
+        # a bracket within an argument list does not end the cut segment, the closing bracket of the branch does.
+        # unlike in applyCuts, the original implementation here cut within the argument list (see BRACKET_ARGUMENT_CASES)
+        self.assertEqual(compiled_commands('F[%~("]",1)F]F'), [('F', []), ('[', []), (']', []), ('F', [])])
+        self.assertEqual(compiled_commands('F~("[",1)F'), [('F', []), ('~', ['"["', 1.0]), ('F', [])])
+
+    def test_string_arguments(self):
+        stream = command_stream.compile_lstring('~("Leaf",0.5)?(P,1,2,3)')
+        self.assertEqual(stream.get_args(0), ['"Leaf"', 0.5])
+        self.assertEqual(stream.get_args(1), ['P', 1.0, 2.0, 3.0])
+        self.assertEqual(stream.count('~'), 1)
+        self.assertEqual(stream.last_index('?'), 1)
+
+    def test_streamed_sources(self):
+        lstring = "F(1)[+(30)F(2,0.5)%F[F]F]-(20)F ~(\"Leaf\",2)" * 50
+        expected = baseline_commands(lstring)
+        self.assertEqual(compiled_commands(lstring.encode()), expected)
+        # small chunks end within argument lists and between symbols and their arguments
+        defaults = command_stream.iter_chunks.__defaults__
+        try:
+            for chunk_size in (1, 2, 3, 7):
+                command_stream.iter_chunks.__defaults__ = (chunk_size,)
+                with self.subTest(chunk_size=chunk_size):
+                    self.assertEqual(compiled_commands(lstring), expected)
+                    self.assertEqual(compiled_commands(lstring.encode()), expected)
+        finally:
+            command_stream.iter_chunks.__defaults__ = defaults
+
+class SubstituteQueriesTest(unittest.TestCase):
+
+    def test_substitutes_in_order(self):
+        lstring = 'F?("P",0,0,0)[+?(H,0,0,0)]?("U",0,0,0)'
+        result = command_stream.substitute_queries(lstring, [("P", 1.0, 2.0, 3.0), ("H", 0.0, 1.0, 0.0)])
+        self.assertEqual(result, 'F?("P",1.0,2.0,3.0)[+?("H",0.0,1.0,0.0)]?("U",0,0,0)')
+
+if __name__ == "__main__":
+    unittest.main()
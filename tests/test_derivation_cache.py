@@ -0,0 +1,94 @@
+"""
+Tests of the on-disk derivation cache (derivation_cache.py), run outside of blender:
+
+    python -m unittest discover tests
+"""
+import glob
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import derivation_cache
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TemporaryDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def lpyfile(self, contents, name="model.lpy"):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(contents)
+        return path
+
+class CacheKeyTest(TemporaryDirectoryTest):
+
+    def test_key_depends_on_contents_settings_and_steps(self):
+        path = self.lpyfile("Axiom: A\nproduction:\nA --> FA\n")
+        key = derivation_cache.cache_key(path, (2.0, 45.0), 5)
+        self.assertEqual(derivation_cache.cache_key(path, [2.0, 45.0], 5), key)
+        self.assertNotEqual(derivation_cache.cache_key(path, (2.0, 30.0), 5), key)
+        self.assertNotEqual(derivation_cache.cache_key(path, (2.0, 45.0), 6), key)
+        self.lpyfile("Axiom: A\nproduction:\nA --> FFA\n")
+        self.assertNotEqual(derivation_cache.cache_key(path, (2.0, 45.0), 5), key)
+
+class DerivationCacheTest(TemporaryDirectoryTest):
+
+    def test_store_and_load(self):
+        cache = derivation_cache.DerivationCache(1024*1024, self.directory)
+        self.assertIsNone(cache.load("key"))
+        cache.store("key", "F(1)[+A]A", "F(1)[+X]X")
+        self.assertEqual(cache.load("key"), ("F(1)[+A]A", "F(1)[+X]X"))
+        cache.clear()
+        self.assertIsNone(cache.load("key"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        lstring = "".join("F({})".format(i) for i in range(2000)) # about 2.5 KB compressed
+        cache = derivation_cache.DerivationCache(1024*1024, self.directory)
+        for i, key in enumerate(("a", "b", "c")):
+            cache.store(key, lstring + key, lstring)
+            os.utime(cache.path(key), (1000 + i, 1000 + i))
+        entry_size = os.path.getsize(cache.path("a"))
+        cache.load("a") # used most recently now
+        cache.max_size = 2.5 * entry_size
+        cache.store("d", lstring + "d", lstring)
+        self.assertEqual([key for key in "abcd" if cache.load(key) is not None], ["a", "d"])
+
+class ReadsSceneTest(TemporaryDirectoryTest):
+
+    def test_imports_are_detected(self):
+        for source in ("import bpy\n",
+                       "import os, bpy\n",
+                       "from bpy import data\n",
+                       "from lindenmaker import environment\n",
+                       "from lindenmaker import profiling, environment\n",
+                       "import lindenmaker.environment as env\n",
+                       "def StartEach():\n    import bpy\n"):
+            with self.subTest(source=source):
+                self.assertTrue(derivation_cache.reads_scene(self.lpyfile(source)))
+
+    def test_mentions_in_comments_and_strings_are_ignored(self):
+        for source in ("# reacts to the environment, see bpy docs\nAxiom: A\n",
+                       '"""Grows towards the environment."""\nAxiom: A\n',
+                       "environment_factor = 2\nAxiom: A\n",
+                       "from random import uniform\nAxiom: A\n"):
+            with self.subTest(source=source):
+                self.assertFalse(derivation_cache.reads_scene(self.lpyfile(source)))
+
+    def test_shipped_models(self):
+        scene_models = [os.path.basename(os.path.dirname(path))
+                        for path in sorted(glob.glob(os.path.join(PACKAGE_DIR, "models", "*", "*.lpy")))
+                        if derivation_cache.reads_scene(path)]
+        self.assertEqual([name.split()[0] for name in scene_models], ["model7", "model8", "model9"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests of internode tubes (TubePath and GeometryBuffer.add_tube in geometry_buffer.py), run outside of blender:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from math import sqrt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import command_stream
+from lindenmaker import turtle
+from lindenmaker import turtle_interpretation
+from lindenmaker.geometry_buffer import GeometryBuffer, TubePath
+
+def tubes_of(lstring, width=0.5):
+    """Return the TubePaths of interpreting the L-string with the GeometryTurtle"""
+    t = turtle.GeometryTurtle(width, 0, None, tube_vertices=6)
+    turtle_interpretation.Interpreter(t, 1.0, 1.0, 90.0).run(command_stream.compile_lstring(lstring))
+    return t.tubes
+
+def distance(a, b):
+    return sqrt(sum((x - y)**2 for x, y in zip(a, b)))
+
+class TubePathTest(unittest.TestCase):
+
+    def test_consecutive_internodes_form_one_tube(self):
+        tubes = tubes_of("F(1)F(2)+F(1)^F(1)")
+        self.assertEqual(len(tubes), 1)
+        # turns only bend the tube at a joint
+        self.assertEqual(len(tubes[0].points), 5)
+        self.assertAlmostEqual(distance(tubes[0].points[0], tubes[0].points[2]), 3.0)
+
+    def test_new_tube_at_branch_gap_and_material_change(self):
+        self.assertEqual([len(tube.points) for tube in tubes_of("F(1)[+F(1)F(1)]F(1)")], [3, 3])
+        self.assertEqual(len(tubes_of("F(1)f(1)F(1)")), 2)
+        self.assertEqual([tube.material_key for tube in tubes_of("F(1);F(1)F(1)")], [0, 1])
+
+    def test_continues_at(self):
+        tube = TubePath((0.0, 0.0, 0.0), 0.25, (0.0, 1.0, 0.0), material_key=2)
+        tube.extend((1.0, 0.0, 0.0), 0.25)
+        self.assertTrue(tube.continues_at((1.0, 0.0, 0.0), 2))
+        self.assertFalse(tube.continues_at((1.0, 0.0, 0.0), 3))
+        self.assertFalse(tube.continues_at((1.0, 0.001, 0.0), 2))
+
+    def test_joint_takes_radius_of_next_internode(self):
+        tube = TubePath((0.0, 0.0, 0.0), 0.5, (0.0, 1.0, 0.0))
+        tube.extend((1.0, 0.0, 0.0), 0.5)
+        tube.extend((2.0, 0.0, 0.0), 0.3)
+        self.assertEqual(tube.radii, [0.5, 0.3, 0.3])
+
+class AddTubeTest(unittest.TestCase):
+
+    def bent_tube(self):
+        tube = TubePath((0.0, 0.0, 0.0), 0.5, (0.0, 1.0, 0.0), material_key=1)
+        tube.extend((1.0, 0.0, 0.0), 0.5)
+        tube.extend((1.0, 1.0, 0.0), 0.25)
+        tube.extend((1.0, 2.0, 0.0), 0.2)
+        return tube
+
+    def test_vertex_and_face_counts(self):
+        geometry = GeometryBuffer()
+        geometry.add_tube(self.bent_tube(), 8)
+        # one ring per point, quads between rings and two caps
+        self.assertEqual(geometry.vertex_count, 4*8)
+        self.assertEqual(geometry.polygon_count, 3*8 + 2)
+        self.assertEqual(list(geometry.loop_totals), [4]*24 + [8, 8])
+        self.assertEqual(len(geometry.loop_vertices), 4*24 + 2*8)
+        self.assertEqual(max(geometry.loop_vertices), 4*8 - 1)
+        self.assertEqual(geometry.material_keys, [1])
+
+    def test_ring_radii(self):
+        tube = self.bent_tube()
+        geometry = GeometryBuffer()
+        geometry.add_tube(tube, 8)
+        coords = geometry.coords
+        for i, (point, radius) in enumerate(zip(tube.points, tube.radii)):
+            ring = [coords[3*v:3*v+3] for v in range(8*i, 8*i + 8)]
+            for vertex in ring:
+                self.assertAlmostEqual(distance(vertex, point), radius)
+        # the joint ring of the right angle bend lies in the plane halfway between both directions
+        for v in range(8, 16):
+            x, y, z = coords[3*v:3*v+3]
+            self.assertAlmostEqual((x - 1.0) + y, 0.0)
+
+    def test_single_point_adds_nothing(self):
+        geometry = GeometryBuffer()
+        geometry.add_tube(TubePath((0.0, 0.0, 0.0), 0.5, (0.0, 1.0, 0.0)), 8)
+        self.assertEqual(geometry.vertex_count, 0)
+
+if __name__ == "__main__":
+    unittest.main()
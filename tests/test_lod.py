@@ -0,0 +1,92 @@
+"""
+Tests of the level of detail rules (lod.py), run outside of blender:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import lod
+from lindenmaker.geometry_buffer import TubePath, cylinder_template
+
+IDENTITY = ((1.0, 0.0, 0.0, 0.0), (0.0, 1.0, 0.0, 0.0), (0.0, 0.0, 1.0, 0.0), (0.0, 0.0, 0.0, 1.0))
+
+def scaled(width, length=1.0, x=0.0):
+    """Return matrix of an internode at x along the x axis, scaled by length and width"""
+    return ((length, 0.0, 0.0, x), (0.0, width, 0.0, 0.0), (0.0, 0.0, width, 0.0), (0.0, 0.0, 0.0, 1.0))
+
+class LevelsTest(unittest.TestCase):
+
+    def test_each_level_halves_detail(self):
+        levels = lod.levels(16, 3, full_detail_width=0.5, min_node_width=0.1, min_internode_width=0.05,
+                            thin_internodes='LINE', count=3)
+        self.assertEqual([level.ring_vertices for level in levels], [16, 8, 4])
+        self.assertEqual([level.node_subdivisions for level in levels], [3, 2, 1])
+        self.assertEqual([level.min_node_width for level in levels], [0.1, 0.2, 0.4])
+        self.assertEqual([level.min_internode_width for level in levels], [0.05, 0.1, 0.2])
+        self.assertEqual(lod.levels(4, 1, count=3)[2].ring_vertices, 3)
+
+    def test_ring_vertices_by_width(self):
+        level = lod.levels(16, 1, full_detail_width=1.0)[0]
+        self.assertEqual(lod.ring_vertices(level, 2.0), 16)
+        self.assertEqual(lod.ring_vertices(level, 0.5), 8)
+        self.assertEqual(lod.ring_vertices(level, 0.01), 3)
+        self.assertEqual(lod.ring_vertices(lod.levels(16, 1)[0], 0.01), 16)
+
+class LodGeometryTest(unittest.TestCase):
+
+    def geometry(self, thin_internodes, count=2):
+        levels = lod.levels(8, 2, full_detail_width=1.0, min_node_width=0.2, min_internode_width=0.1,
+                            thin_internodes=thin_internodes, count=count)
+        return lod.LodGeometry(levels, node_templates=[cylinder_template(4)]*count)
+
+    def test_one_buffer_per_level(self):
+        geometry = self.geometry('DROP', count=3)
+        geometry.add_internode(scaled(4.0), 4.0)
+        self.assertEqual(len(geometry.buffers), 3)
+        # internodes wider than the full detail width of all levels use the ring vertex count of each level (two rings)
+        self.assertEqual([buffer.vertex_count for buffer in geometry.buffers], [16, 8, 6])
+
+    def test_thin_internodes_are_dropped_or_lines(self):
+        dropped = self.geometry('DROP')
+        lines = self.geometry('LINE')
+        for geometry in (dropped, lines):
+            geometry.add_internode(scaled(0.15, length=2.0, x=1.0), 0.15) # thin only in the second level
+        for geometry in (dropped, lines):
+            self.assertEqual(geometry.buffers[0].polygon_count, 3 + 2)
+            self.assertEqual(geometry.buffers[1].polygon_count, 0)
+        self.assertEqual(dropped.buffers[1].vertex_count, 0)
+        self.assertEqual(list(lines.buffers[1].coords), [1.0, 0.0, 0.0, 3.0, 0.0, 0.0])
+        self.assertEqual(list(lines.buffers[1].edge_vertices), [0, 1])
+
+    def test_small_nodes_are_skipped(self):
+        geometry = self.geometry('DROP')
+        geometry.add_node(IDENTITY, 0.3) # skipped in the second level (min node width 0.4)
+        geometry.add_node(IDENTITY, 0.1) # skipped in both levels
+        self.assertEqual([buffer.vertex_count for buffer in geometry.buffers], [8, 0])
+
+    def test_instances_are_added_to_all_levels(self):
+        geometry = self.geometry('DROP')
+        geometry.add_instance(cylinder_template(4), scaled(0.01), material_key=2)
+        self.assertEqual([buffer.vertex_count for buffer in geometry.buffers], [8, 8])
+        self.assertEqual([buffer.material_keys for buffer in geometry.buffers], [[2], [2]])
+
+    def test_tubes_are_split_per_level(self):
+        tube = TubePath((0.0, 0.0, 0.0), 0.5, (0.0, 1.0, 0.0))
+        tube.extend((1.0, 0.0, 0.0), 0.5)
+        tube.extend((2.0, 0.0, 0.0), 0.075) # width 0.15, thin only in the second level
+        geometry = self.geometry('LINE')
+        geometry.add_tube(tube)
+        first, second = geometry.buffers
+        # ring vertices by the width of the thickest ring, relative to the full detail width of the level
+        self.assertEqual(first.vertex_count, 3*8)
+        self.assertEqual(second.vertex_count, 2*3 + 2)
+        self.assertEqual(list(second.edge_vertices), [6, 7])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests of the external L-string storage (lstring_storage.py), run outside of blender:
+
+    python -m unittest discover tests
+"""
+import gzip
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import lstring_storage
+
+LSTRING = "F(1.5)[+(30)A(\"Leaf\")]" * 200 + "ä"
+
+class LStringStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patch = mock.patch.dict(lstring_storage.stores, clear=True)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def read_buffer(self, buffer):
+        try:
+            return buffer.read() if hasattr(buffer, "read") else buffer[:]
+        finally:
+            buffer.close()
+
+    def test_round_trip(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                store = lstring_storage.LStringStore(self.directory, "Scene", compress)
+                self.assertEqual(store.read("lstring_for_production"), "")
+                self.assertEqual(store.open("lstring_for_production"), "")
+                store.write("lstring_for_production", LSTRING)
+                self.assertEqual(store.read("lstring_for_production"), LSTRING)
+                self.assertEqual(self.read_buffer(store.open("lstring_for_production")).decode("utf-8"), LSTRING)
+                self.assertEqual(store.path("lstring_for_production").endswith(".gz"), compress)
+
+    def test_size_and_preview(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                store = lstring_storage.LStringStore(self.directory, "Scene", compress)
+                store.write("lstring_for_interpretation", LSTRING)
+                size = len(LSTRING.encode("utf-8"))
+                self.assertEqual(store.size("lstring_for_interpretation"), size)
+                self.assertEqual(store.preview("lstring_for_interpretation", 10), (LSTRING[:10], size))
+
+    def test_gzip_size_is_read_from_trailer(self):
+        store = lstring_storage.LStringStore(self.directory, "Scene", compress=True)
+        store.write("lstring_for_production", LSTRING)
+        with mock.patch.object(gzip, "open", side_effect=AssertionError("decompressed")):
+            self.assertEqual(store.size("lstring_for_production"), len(LSTRING.encode("utf-8")))
+
+    def test_move_from_converts_and_removes_source(self):
+        source = lstring_storage.LStringStore(self.directory, "Scene")
+        source.write("lstring_for_production", LSTRING)
+        target = lstring_storage.LStringStore(os.path.join(self.directory, "moved"), "Scene", compress=True)
+        target.move_from(source)
+        self.assertEqual(target.read("lstring_for_production"), LSTRING)
+        self.assertEqual(target.read("lstring_for_interpretation"), "")
+        self.assertFalse(os.path.exists(source.path("lstring_for_production")))
+
+    def test_get_store_moves_on_changed_settings(self):
+        store = lstring_storage.get_store("Scene", self.directory)
+        self.assertIs(lstring_storage.get_store("Scene", self.directory), store)
+        store.write("lstring_for_interpretation", LSTRING)
+        moved = lstring_storage.get_store("Scene", self.directory, compress=True)
+        self.assertEqual(moved.read("lstring_for_interpretation"), LSTRING)
+        self.assertFalse(os.path.exists(store.path("lstring_for_interpretation")))
+
+    def test_preview_store_does_not_move(self):
+        store = lstring_storage.get_store("Scene", self.directory)
+        store.write("lstring_for_production", LSTRING)
+        other = os.path.join(self.directory, "other")
+        self.assertIs(lstring_storage.preview_store("Scene", other, True), store)
+        self.assertFalse(os.path.exists(other))
+        self.assertIs(lstring_storage.stores["Scene"], store)
+        self.assertNotIn("Other", lstring_storage.stores)
+        self.assertEqual(lstring_storage.preview_store("Other", other).preview("lstring_for_production"), ("", 0))
+        self.assertNotIn("Other", lstring_storage.stores)
+
+if __name__ == "__main__":
+    unittest.main()
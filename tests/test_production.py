@@ -0,0 +1,134 @@
+"""
+Tests of the production session (production.py), run outside of blender with the L-Py stand-in:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+import lpy_stand_in
+lpy_stand_in.install()
+
+from lindenmaker import production
+
+def growth(module):
+    """Apex A adds one internode per step"""
+    return "FA" if module.name == 'A' else None
+
+class SessionTest(unittest.TestCase):
+    """Base class creating sessions of an Lsystem stand-in instead of loading an .lpy file"""
+
+    def session(self, lsys, snapshot_limit=5000000):
+        patch = mock.patch.object(production, "lpy", lpy_stand_in.module(lambda path: lsys))
+        patch.start()
+        self.addCleanup(patch.stop)
+        return production.ProductionSession(__file__, snapshot_limit)
+
+    def produce(self, session, steps, first_step=1):
+        for step in range(first_step, first_step + steps):
+            lstring_for_interpretation, stream = session.produce_step(lambda stream: [], final=True)
+            session.store_snapshot(step, lstring_for_interpretation)
+
+class SnapshotTest(SessionTest):
+
+    def test_seek_restores_step(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth))
+        self.produce(session, 3)
+        self.assertEqual(session.seek(2), ("FFA", "FFA"))
+        self.assertEqual(session.seek(0), ("", ""))
+        self.assertEqual(session.production_lstring(), "")
+
+    def test_snapshot_is_not_changed_by_further_steps(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth))
+        self.produce(session, 2)
+        session.seek(1)
+        session.derive_step()
+        self.assertEqual(session.seek(1)[0], "FA")
+
+    def test_homomorphism_is_applied_on_seek_if_skipped(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth,
+                                                    homomorphism=lambda m: "X" if m.name == 'A' else None))
+        session.derive_step()
+        session.store_snapshot(1, None)
+        self.assertEqual(session.seek(1), ("FA", "FX"))
+
+    def test_oldest_snapshots_are_dropped_over_size_limit(self):
+        # step n has n+1 modules in the tree and as many characters in the interpretation L-string
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth), snapshot_limit=26)
+        self.produce(session, 6)
+        self.assertEqual([step for step in range(7) if session.has_snapshot(step)], [0, 5, 6])
+        self.assertEqual(session.snapshot_size, 2*6 + 2*7)
+        self.assertIsNone(session.seek(4))
+        session.snapshot_limit = 14
+        session.trim_snapshots()
+        self.assertEqual(list(session.snapshots), [6])
+
+    def test_snapshots_disabled(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth), snapshot_limit=0)
+        self.produce(session, 2)
+        self.assertTrue(session.has_snapshot(0))
+        self.assertFalse(session.has_snapshot(1))
+
+    def test_later_snapshots_are_discarded_after_branching(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth))
+        self.produce(session, 4)
+        session.seek(2)
+        self.produce(session, 1, first_step=3)
+        self.assertTrue(session.has_snapshot(3))
+        self.assertFalse(session.has_snapshot(4))
+        self.assertEqual(list(session.snapshots), [1, 2, 3])
+        self.assertEqual(session.snapshot_size, sum(2*(step+1) for step in (1, 2, 3)))
+
+def querying_growth(module):
+    """Apex A adds one internode per step and queries the turtle position after it"""
+    return "F?(P,0,0,0)A" if module.name == 'A' else ("" if module.name == '?' else None)
+
+class DryrunTest(SessionTest):
+
+    def test_dryrun_is_skipped_without_queries(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=growth))
+        dryrun = mock.Mock(return_value=[])
+        self.assertEqual(session.produce_step(dryrun), ("FA", None))
+        dryrun.assert_not_called()
+
+    def test_query_results_are_written_back(self):
+        session = self.session(lpy_stand_in.Lsystem("A", production=querying_growth))
+        dryrun = mock.Mock(return_value=[("P", 0.0, 0.0, 2.0)])
+        lstring_for_interpretation, stream = session.produce_step(dryrun)
+        self.assertEqual(lstring_for_interpretation, "F?(P,0,0,0)A")
+        dryrun.assert_called_once_with(stream)
+        self.assertIsNotNone(stream)
+        self.assertEqual(session.production_lstring(), 'F?("P",0.0,0.0,2.0)A')
+
+class HomomorphismTest(SessionTest):
+
+    def lsystem(self, production):
+        return lpy_stand_in.Lsystem("A", production=production,
+                                    homomorphism=lambda m: "X" if m.name == 'A' else None)
+
+    def test_homomorphism_only_on_final_step(self):
+        lsys = self.lsystem(growth)
+        session = self.session(lsys)
+        self.assertEqual(session.produce_step(lambda stream: [], final=False), (None, None))
+        self.assertEqual(session.produce_step(lambda stream: [], final=False), (None, None))
+        self.assertEqual(lsys.interpret_calls, 0)
+        self.assertEqual(session.produce_step(lambda stream: [], final=True), ("FFFX", None))
+        self.assertEqual(lsys.interpret_calls, 1)
+        self.assertEqual(lsys.derive_calls, 3)
+
+    def test_homomorphism_on_intermediate_steps_with_queries(self):
+        lsys = self.lsystem(querying_growth)
+        session = self.session(lsys)
+        dryrun = mock.Mock(return_value=[("P", 0.0, 0.0, 2.0)])
+        lstring_for_interpretation, stream = session.produce_step(dryrun, final=False)
+        self.assertEqual(lstring_for_interpretation, "F?(P,0,0,0)X")
+        self.assertEqual(lsys.interpret_calls, 1)
+        dryrun.assert_called_once_with(stream)
+
+if __name__ == "__main__":
+    unittest.main()
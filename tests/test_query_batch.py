@@ -0,0 +1,42 @@
+"""
+Tests of the query batch lookup (query_batch.py), run outside of blender:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import query_batch
+
+def frame(heading, position):
+    return [heading, (0.0, 1.0, 0.0), (0.0, 0.0, 1.0), position]
+
+class QueryBatchTest(unittest.TestCase):
+
+    def test_duplicate_results_resolve_in_query_order(self):
+        # two apices with the same heading, each queried for heading and position
+        query_results = [("P", 0.0, 0.0, 1.0), ("H", 1.0, 0.0, 0.0),
+                         ("P", 0.0, 0.0, 2.0), ("H", 1.0, 0.0, 0.0)]
+        frames = [frame((1.0, 0.0, 0.0), (0.0, 0.0, 1.0)), frame((1.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+                  frame((1.0, 0.0, 0.0), (0.0, 0.0, 2.0)), frame((1.0, 0.0, 0.0), (0.0, 0.0, 2.0))]
+        batch = query_batch.QueryBatch(query_results, frames)
+        indices = [batch.index(*result) for result in query_results]
+        self.assertEqual(indices, [0, 1, 2, 3])
+        self.assertEqual(batch.P[indices[3]].tolist(), [0.0, 0.0, 2.0])
+
+    def test_frames(self):
+        batch = query_batch.publish([("P", 1.0, 2.0, 3.0)], [frame((0.0, 0.0, 1.0), (1.0, 2.0, 3.0))])
+        self.assertIs(query_batch.current, batch)
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(batch.H.tolist(), [[0.0, 0.0, 1.0]])
+        self.assertEqual(batch.P.tolist(), [[1.0, 2.0, 3.0]])
+        query_batch.clear()
+        self.assertIsNone(query_batch.current)
+
+if __name__ == "__main__":
+    unittest.main()
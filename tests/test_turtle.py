@@ -0,0 +1,129 @@
+"""
+Tests of the turtle backends used for dry-run interpretation, run outside of blender:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stand_ins
+stand_ins.install()
+
+from lindenmaker import turtle
+from lindenmaker import turtle_interpretation
+from lindenmaker.geometry_buffer import MeshTemplate, cylinder_template
+
+class UnbalancedBracketTest(unittest.TestCase):
+
+    def turtles(self):
+        turtles = [turtle.Turtle(1.0, 0)]
+        if turtle_interpretation.numpy_turtle is not None:
+            turtles.append(turtle_interpretation.numpy_turtle.NumpyTurtle(1.0, 0))
+        return turtles
+
+    def test_pop_from_empty_stack_raises(self):
+        for t in self.turtles():
+            with self.subTest(turtle=type(t).__name__):
+                t.push()
+                t.pop()
+                with self.assertRaises(IndexError):
+                    t.pop()
+
+class BranchGeometryReuseTest(unittest.TestCase):
+    """Single object mode with reuse of unchanged branches, compared to the DrawingTurtle"""
+
+    def setUp(self):
+        bpy = sys.modules["bpy"]
+        mesh = lambda name, vertices=0, polygons=0: types.SimpleNamespace(name=name, vertices=[0]*vertices,
+                                                                          polygons=[0]*polygons,
+                                                                          transform=lambda matrix: None)
+        self.buffers = []
+        def write_lod_meshes(scene, root, buffers):
+            self.buffers.append(buffers[0])
+            return [root.data]
+        patches = [mock.patch.object(bpy.data, "meshes", types.SimpleNamespace(new=mesh), create=True),
+                   mock.patch.object(bpy.data, "objects", types.SimpleNamespace(
+                       new=lambda name, data: types.SimpleNamespace(name=name, data=data)), create=True),
+                   mock.patch.object(bpy.context.scene, "objects", types.SimpleNamespace(link=lambda obj: None),
+                                     create=True),
+                   mock.patch.object(bpy.context.scene, "bool_draw_nodes", True),
+                   mock.patch.object(bpy.ops, "object", types.SimpleNamespace(select_all=lambda action: None),
+                                     create=True),
+                   mock.patch.object(turtle, "get_module_meshes",
+                                     lambda: (mesh("Internode", 10, 7), mesh("Node", 12, 20))),
+                   mock.patch.object(turtle, "lod_templates",
+                                     lambda levels, internode_mesh, node_mesh: (None, [cylinder_template(4)])),
+                   mock.patch.object(turtle, "write_lod_meshes", write_lod_meshes),
+                   mock.patch.dict(turtle.branch_geometry_cache, clear=True)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def draw(self, turtle_type, lengths):
+        """Draw a trunk with internodes of the given lengths and a side branch after each, return the geometry"""
+        t = turtle_type(0.5, 0)
+        for i, length in enumerate(lengths):
+            t.draw_internode_module(length)
+            t.move(length)
+            t.push()
+            t.turn(30)
+            t.pitch(20)
+            t.materialindex = i % 2
+            t.draw_internode_module(1.0 + i)
+            t.pop()
+            t.roll(45)
+        t.finish()
+        return self.buffers[-1]
+
+    def test_same_geometry_as_drawing_turtle(self):
+        expected = self.draw(turtle.DrawingTurtle, [1, 2, 3])
+        geometry = self.draw(turtle.BranchGeometryTurtle, [1, 2, 3])
+        self.assertEqual(geometry.polygon_count, expected.polygon_count)
+        self.assertEqual(geometry.material_keys, expected.material_keys)
+        self.assertEqual(sorted(round(value, 4) for value in geometry.coords),
+                         sorted(round(value, 4) for value in expected.coords))
+
+    def test_only_changed_branches_are_built(self):
+        self.draw(turtle.BranchGeometryTurtle, [1, 2, 3])
+        with mock.patch.object(turtle.BranchGeometryTurtle, "branch_geometry", autospec=True,
+                               side_effect=turtle.BranchGeometryTurtle.branch_geometry) as branch_geometry:
+            self.draw(turtle.BranchGeometryTurtle, [1, 2, 3.5])
+        # only the trunk changed, the side branches are unchanged relative to their frames
+        self.assertEqual(branch_geometry.call_count, 1)
+
+class TemplateKeyTest(unittest.TestCase):
+    """Keys of module mesh templates, which must change if the mesh is edited so that cached branches are not reused"""
+
+    def copy(self, template, coords=None, material_keys=None):
+        return MeshTemplate(coords if coords is not None else template.coords, template.loop_vertices,
+                            template.loop_starts, template.loop_totals, template.poly_slots,
+                            material_keys if material_keys is not None else template.material_keys)
+
+    def test_key_changes_with_content(self):
+        template = cylinder_template(4)
+        key = turtle.template_key("Mesh", template)
+        self.assertEqual(turtle.template_key("Mesh", self.copy(template)), key)
+        moved = list(template.coords)
+        moved[0] += 0.1 # same vertex and polygon count
+        self.assertNotEqual(turtle.template_key("Mesh", self.copy(template, coords=moved)), key)
+        self.assertNotEqual(turtle.template_key("Mesh", self.copy(template, material_keys=["Bark"])), key)
+
+    def test_templates_are_kept_per_material_object(self):
+        mesh = types.SimpleNamespace(name="Leaf")
+        def mesh_template(mesh, material_object=None):
+            return self.copy(cylinder_template(4), material_keys=[material_object.name] if material_object else [])
+        templates = {}
+        with mock.patch.object(turtle, "mesh_template", mesh_template):
+            green = turtle.keyed_mesh_template(templates, mesh, types.SimpleNamespace(name="Green"))
+            red = turtle.keyed_mesh_template(templates, mesh, types.SimpleNamespace(name="Red"))
+            self.assertIs(turtle.keyed_mesh_template(templates, mesh, types.SimpleNamespace(name="Green")), green)
+        self.assertEqual(green[0].material_keys, ["Green"])
+        self.assertEqual(red[0].material_keys, ["Red"])
+        self.assertNotEqual(green[1], red[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,17 @@ import bpy
 from math import radians
 from mathutils import Vector, Matrix
 
+from lindenmaker import lod
 from lindenmaker.turtle_interpretation_error import TurtleInterpretationError
+from lindenmaker.geometry_buffer import GeometryBuffer, MeshTemplate, TubePath
+
+# names of branch meshes by branch key, used by the BranchTurtle to reuse unchanged branches.
+# meshes not used by the last interpretation result are removed by the unused mesh cleanup.
+branch_mesh_cache = {}
+
+# branch-local GeometryBuffers (one per level of detail) by branch key, used by the BranchGeometryTurtle
+# to reuse unchanged branches in single object mode. only the branches of the last interpretation are kept.
+branch_geometry_cache = {}
 
 class Turtle:
     """This is the base class of the turtle that does not create any objects, but can be used to perform a dry-run interpretation to query the turtle state at different moments"""
@@ -71,6 +81,15 @@ class Turtle:
     
         self.mat = result_mat
         
+    def query_vector(self, col):
+        """Return column of turtle matrix (orientation vectors 0-2, position 3) as x, y, z tuple"""
+        vec = self.mat.col[col]
+        return (vec.x, vec.y, vec.z)
+        
+    def query_frame(self):
+        """Return heading, left, up and position vector (same order as for queries) as tuple of 12 floats"""
+        return self.query_vector(0) + self.query_vector(1) + self.query_vector(2) + self.query_vector(3)
+        
     def draw_internode_module(self, length=None, width=None):
         """DELIBERATRELY NOT IMPLEMENTED"""
         pass
@@ -78,6 +97,10 @@ class Turtle:
     def draw_module_from_custom_object(self, objname=None, objscale=None):
         """DELIBERATRELY NOT IMPLEMENTED"""
         pass
+        
+    def finish(self):
+        """Called once after the last command has been interpreted"""
+        pass
 
 
 class DrawingTurtle(Turtle):
@@ -88,60 +111,52 @@ class DrawingTurtle(Turtle):
         
         scene = bpy.context.scene
         self.current_parent = None # parent of objects on current branch
+        self.meshes = [] # meshes created for this interpretation result (removed together with it)
+        # internodes as continuous tubes instead of internode mesh copies (only if geometry is merged)
+        self.tube_vertices = (scene.default_internode_cylinder_vertices
+                              if scene.bool_internode_tubes and scene.bool_no_hierarchy else 0)
+        self.tube = None # tube continued by the next internode on the current branch
+        self.tubes = []
         
-        # get mesh used to draw internodes (mesh reuse to save memory)
-        default_internode_mesh_name = bpy.types.Scene.internode_mesh_name[1]['default']
-        if scene.internode_mesh_name not in bpy.data.meshes.keys():
-            # custom mesh not found, revert to default
-            scene.internode_mesh_name = default_internode_mesh_name
-            if default_internode_mesh_name not in bpy.data.meshes.keys():
-                self.create_default_internode_mesh(scene.default_internode_cylinder_vertices)
-        if scene.bool_recreate_default_meshes and default_internode_mesh_name in bpy.data.meshes.keys():
-            # recreate default mesh on user request
-            self.default_internode_mesh = bpy.data.meshes[default_internode_mesh_name]
-            self.default_internode_mesh.user_clear() # also clears fake user
-            self.default_internode_mesh.name = default_internode_mesh_name+".DEPRECATED"
-            self.create_default_internode_mesh(scene.default_internode_cylinder_vertices)
-            scene.internode_mesh_name = default_internode_mesh_name
-        self.internode_mesh = bpy.data.meshes[scene.internode_mesh_name]
-            
-        # get mesh used to draw nodes (mesh reuse to save memory)
-        default_node_mesh_name = bpy.types.Scene.node_mesh_name[1]['default']
-        if scene.node_mesh_name not in bpy.data.meshes.keys():
-            # custom mesh not found, revert to default
-            scene.node_mesh_name = default_node_mesh_name
-            if default_node_mesh_name not in bpy.data.meshes.keys():
-                self.create_default_node_mesh(scene.default_node_icosphere_subdivisions)
-        if scene.bool_recreate_default_meshes and default_node_mesh_name in bpy.data.meshes.keys():
-            # recreate default mesh on user request
-            self.default_node_mesh = bpy.data.meshes[default_node_mesh_name]
-            self.default_node_mesh.user_clear() # also clears fake user
-            self.default_node_mesh.name = default_node_mesh_name+".DEPRECATED"
-            self.create_default_node_mesh(scene.default_node_icosphere_subdivisions)
-            scene.node_mesh_name = default_node_mesh_name
-        self.node_mesh = bpy.data.meshes[scene.node_mesh_name]
+        # get meshes used to draw internodes and nodes (mesh reuse to save memory)
+        self.internode_mesh, self.node_mesh = get_module_meshes()
         
         # init root node
         if bpy.context.scene.bool_no_hierarchy:
-            # create empty mesh with no vertices to join with subsequent objects
-            bpy.ops.mesh.primitive_plane_add()
-            root = bpy.context.object
-            root.data.name = "Root"
-            root.data.use_auto_smooth = True
-            root.data.auto_smooth_angle = radians(85)
-            bpy.ops.object.mode_set(mode = 'EDIT')
-            bpy.ops.mesh.select_all(action = 'SELECT')
-            bpy.ops.mesh.delete()
-            bpy.ops.object.mode_set(mode = 'OBJECT')
+            # create object with empty mesh, geometry of all modules is collected
+            # in a buffer and written to this mesh at once when interpretation is finished
+            rootmesh = bpy.data.meshes.new("Root")
+            rootmesh.use_auto_smooth = True
+            rootmesh.auto_smooth_angle = radians(85)
+            root = bpy.data.objects.new("Root", rootmesh)
+            root.location = scene.cursor_location
+            scene.objects.link(root)
+            self.meshes.append(rootmesh)
+            # geometry of each level of detail (a single level if disabled)
+            levels = lod.levels_from_scene(scene)
+            internode_template, node_templates = lod_templates(levels, self.internode_mesh, self.node_mesh)
+            self.geometry = lod.LodGeometry(levels, internode_template, node_templates,
+                                            smooth=not scene.bool_force_shade_flat)
+            self.mesh_templates = {} # (mesh name, material object name or None) -> MeshTemplate
         else:
             bpy.ops.object.empty_add(type='ARROWS', radius=0)
-        self.root = self.current_parent = bpy.context.object
+            root = bpy.context.object
+            # shading and material slot of modules are prepared once per (mesh, material index)
+            # in an unlinked template object, which is then copied for each module
+            self.object_templates = {} # (mesh name, material index or None) -> object
+            self.shaded_meshes = set() # names of meshes with shading already set
+        self.root = self.current_parent = root
         bpy.ops.object.select_all(action='DESELECT')
         
+    def prepare_materials(self, max_materialindex):
+        """Create materials up to the given index in advance, instead of checking for each module"""
+        resolve_material(max_materialindex)
+        
     def push(self):
         """Push turtle state to stack and place draw node object as parent for subsequent cylinders"""
         # push state to stack
-        self.stack.append((self.mat.copy(), self.linewidth, self.materialindex, self.current_parent))
+        self.stack.append((self.mat.copy(), self.linewidth, self.materialindex, self.current_parent, self.tube))
+        self.tube = None # the new branch starts a new tube
         if not bpy.context.scene.bool_no_hierarchy:
             if bpy.context.scene.bool_draw_nodes:
                 # add node object as new parent for objects on this branch
@@ -150,33 +165,50 @@ class DrawingTurtle(Turtle):
                 self.current_parent = nodeobj
             else:
                 # add empty as new parent for objects on this branch
-                bpy.ops.object.empty_add(type='ARROWS', radius=0)
-                empty = bpy.context.object
-                empty.name = "Node"
-                empty.matrix_world *= self.mat
+                empty = bpy.data.objects.new("Node", None)
+                empty.empty_draw_type = 'ARROWS'
+                empty.empty_draw_size = 0
+                bpy.context.scene.objects.link(empty)
+                empty.matrix_world = Matrix.Translation(bpy.context.scene.cursor_location) * self.mat
                 self.add_child_to_current_branch_parent(empty)
                 self.current_parent = empty
-                bpy.ops.object.select_all(action='DESELECT')
         elif bpy.context.scene.bool_draw_nodes:
             # just draw nodes without hierarchy
             self.draw_node_module(scalefactor=self.linewidth)
         
     def pop(self):
         """Pop last turtle state from stack and use as current"""
-        (self.mat, self.linewidth, self.materialindex, self.current_parent) = self.stack.pop()
+        (self.mat, self.linewidth, self.materialindex, self.current_parent, self.tube) = self.stack.pop()
         
     def draw_internode_module(self, length, width=None):
         """Draw internode object instance in current turtle coordinate system."""
         if width is None:
             width = self.linewidth
+        if self.tube_vertices:
+            self.draw_internode_tube(length, width)
+            return
         scene = bpy.context.scene
+        if scene.bool_no_hierarchy:
+            # level of detail rules depend on the width
+            scale = (length*scene.internode_length_scale, width, width)
+            self.geometry.add_internode(self.mat * scale_matrix(scale), width, self.materialindex)
+            return
         self.draw_module(self.internode_mesh, 
                          "Internode", 
                          scale=Vector((length*scene.internode_length_scale, width, width)),
                          assign_material_by_index=True)
                          
+    def draw_internode_tube(self, length, width):
+        """Continue the tube of the current branch with an internode, or start a new tube."""
+        self.tube = extend_tube(self.tube, self.tubes, self.mat, length, width, self.materialindex)
+                         
     def draw_node_module(self, scalefactor=1):
         """Draw node object instance in current turtle coordinate system."""
+        if bpy.context.scene.bool_no_hierarchy:
+            # level of detail rules depend on the size
+            scale = (scalefactor, scalefactor, scalefactor)
+            self.geometry.add_node(self.mat * scale_matrix(scale), scalefactor, self.materialindex)
+            return
         return self.draw_module(self.node_mesh, 
                          "Node", 
                          scale=Vector((scalefactor, scalefactor, scalefactor)),
@@ -188,51 +220,85 @@ class DrawingTurtle(Turtle):
         # dont add material, object can be edited itself
         if objname not in bpy.data.objects.keys():
             raise TurtleInterpretationError("Error using '~' draw custom object command: No object named '{}'. Example usage: ~(\"Object\")".format(objname))
-        self.draw_module(bpy.data.objects[objname].data, name=objname, scale=objscale)
+        self.draw_module(bpy.data.objects[objname].data, name=objname, scale=objscale,
+                         material_object=bpy.data.objects[objname])
     
     def draw_module(self, 
                     mesh, 
                     name="Module", 
                     scale=Vector((1, 1, 1)), 
-                    assign_material_by_index=False):
+                    assign_material_by_index=False,
+                    material_object=None):
         """Add object instance from given shared mesh in current turtle coordinate system."""
         scene = bpy.context.scene
-        obj = bpy.data.objects.new(name, mesh) # create new object sharing the given mesh data
+        if scene.bool_no_hierarchy:
+            # collect transformed geometry instead of creating and joining an object
+            self.add_module_geometry(mesh, scale, assign_material_by_index, material_object)
+            return
+        # copy of template object sharing the given mesh data, with shading and material slot set up
+        template = self.object_template(mesh, name, assign_material_by_index)
+        obj = template.copy()
         scene.objects.link(obj)
-        scene.objects.active = obj
-        obj.select = True
-        # optionally set shading
-        if scene.bool_force_shade_flat:
-            bpy.ops.object.shade_flat()
-        else:
-            bpy.ops.object.shade_smooth()
+        # align object with turtle and set scale
+        obj.matrix_world = self.mat * scale_matrix(scale)
+        # add obj to existing structure
+        self.add_child_to_current_branch_parent(obj)
+        
+        return obj # return a reference to the object in case that is needed
+        
+    def object_template(self, mesh, name, assign_material_by_index):
+        """Return unlinked object using mesh, with shading set and material slot assigned (created once per mesh and material index)"""
+        key = (mesh.name, self.materialindex if assign_material_by_index else None)
+        template = self.object_templates.get(key)
+        if template is not None:
+            return template
+        # set shading on the mesh data once
+        if mesh.name not in self.shaded_meshes:
+            smooth = not bpy.context.scene.bool_force_shade_flat
+            mesh.polygons.foreach_set("use_smooth", [smooth] * len(mesh.polygons))
+            self.shaded_meshes.add(mesh.name)
+        template = bpy.data.objects.new(name, mesh)
         # optionally create material slot and assign material from given materialindex
         # note: the important thing is to create a material slot for the module,
         # other materials can be assigned to it later
         if assign_material_by_index:
-            # if materialindex exceeds length of material list just create new empty materials
-            while self.materialindex >= len(bpy.data.materials): 
-                bpy.ops.material.new()
+            # if materialindex exceeds length of material list new empty materials are created
+            material = resolve_material(self.materialindex)
             # to avoid cluttering the shared mesh, link material to current object
-            # when joining objects (no hierarchy) relevant polygons will have the material assigned
-            obj.active_material = bpy.data.materials[self.materialindex] # also adds slot if none
-            obj.material_slots[0].link = 'OBJECT'
-            obj.material_slots[0].material = bpy.data.materials[self.materialindex]
-        # align object with turtle
-        obj.matrix_world *= self.mat
-        # set scale
-        obj.scale = scale
-        # add obj to existing structure
-        if scene.bool_no_hierarchy:
-            self.root.select = True
-            scene.objects.active = self.root
-            bpy.ops.object.join()
-        else:
-            self.add_child_to_current_branch_parent(obj)
-        bpy.ops.object.select_all(action='DESELECT')
+            template.active_material = material # also adds slot if none
+            template.material_slots[0].link = 'OBJECT'
+            template.material_slots[0].material = material
+        self.object_templates[key] = template
+        return template
         
+    def add_module_geometry(self, mesh, scale, assign_material_by_index, material_object=None):
+        """Add transformed copy of mesh geometry to the geometry buffer of the single root object."""
+        key = (mesh.name, material_object.name if material_object is not None else None)
+        template = self.mesh_templates.get(key)
+        if template is None:
+            template = self.mesh_templates[key] = mesh_template(mesh, material_object)
+        material_key = self.materialindex if assign_material_by_index else None
+        self.geometry.add_instance(template, self.mat * scale_matrix(scale), material_key)
+        
+    def finish(self):
+        """Write collected geometry to the root mesh in case of a single object"""
         if not bpy.context.scene.bool_no_hierarchy:
-            return obj # return a reference to the object in case that is needed
+            self.remove_templates()
+            return
+        for tube in self.tubes:
+            self.geometry.add_tube(tube)
+        meshes = write_lod_meshes(bpy.context.scene, self.root, self.geometry.buffers)
+        self.meshes.extend(meshes[1:])
+        for mesh in meshes:
+            # geometry was collected in world space, root is placed at 3D cursor
+            mesh.transform(Matrix.Translation(-self.root.location))
+        
+    def remove_templates(self):
+        """Remove template objects, which were never linked to the scene (also if interpretation is cancelled)"""
+        if not bpy.context.scene.bool_no_hierarchy:
+            for template in self.object_templates.values():
+                bpy.data.objects.remove(template)
+            self.object_templates.clear()
         
     def add_child_to_current_branch_parent(self, object):
         if self.current_parent is None:
@@ -240,36 +306,477 @@ class DrawingTurtle(Turtle):
         object.parent = self.current_parent
         object.matrix_parent_inverse = self.current_parent.matrix_world.inverted()
         
-    def create_default_internode_mesh(self, vertex_count):
-        """Initialize the default cylinder mesh used to draw internodes"""
-        cylinder_radius = 0.5
-        cylinder_length = 1
-        bpy.ops.mesh.primitive_cylinder_add(vertices=vertex_count, 
-                                            radius=cylinder_radius, 
-                                            depth=cylinder_length)
-        cyl = bpy.context.object
-        # rotate cylinder mesh to point towards x axis and position origin at base
-        bpy.ops.object.mode_set(mode='EDIT', toggle=False)
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.transform.rotate(value=radians(90), axis=(0, 1, 0))
-        bpy.ops.transform.translate(value=(cylinder_length/2,0,0))
-        bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-        cyl.data.name = bpy.types.Scene.internode_mesh_name[1]['default']
-        # smooth cylinder sides, but not cylinder caps
-        cyl.data.use_auto_smooth = True
-        cyl.data.auto_smooth_angle = radians(85)
-        # delete object and make sure mesh will persist via fake user reference
-        cyl.data.use_fake_user = True
-        bpy.ops.object.delete()
-        
-    def create_default_node_mesh(self, _subdivisions=1):
-        """Initialize the default icosphere mesh used to draw nodes"""
-        bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=_subdivisions, size=0.5)
-        icosphere = bpy.context.object
-        icosphere.data.name = bpy.types.Scene.node_mesh_name[1]['default']
-        icosphere.data.use_auto_smooth = True
-        icosphere.data.auto_smooth_angle = radians(85)
-        # delete object and make sure mesh will persist via fake user reference
-        icosphere.data.use_fake_user = True
-        bpy.ops.object.delete()
+
+
+class BranchTurtle(DrawingTurtle):
+    """
+    Subtype of the DrawingTurtle for hierarchies, creating one object per branch instead of one object per module.
+    The geometry of all modules on a branch is merged into one mesh in the branch coordinate system.
+    The branching structure is kept as data: a transform per branch and the index of its parent branch,
+    stored as custom properties on the root object.
+    Optionally branch meshes are reused from previous interpretations if the modules of a branch
+    are unchanged relative to the branch (incremental re-interpretation).
+    """
+    
+    def __init__(self, _linewidth, _materialindex):
+        super().__init__(_linewidth, _materialindex)
+        scene = bpy.context.scene
+        self.smooth = not scene.bool_force_shade_flat
+        self.reuse_branch_meshes = scene.bool_reuse_branch_meshes
+        self.tube_vertices = scene.default_internode_cylinder_vertices if scene.bool_internode_tubes else 0
+        self.mesh_templates = {} # (mesh name, material object name or None) -> (MeshTemplate, template key)
+        self.branches = [] # (frame matrix, parent branch index, list of modules, list of tubes) per branch
+        self.begin_branch(-1)
+        
+    def begin_branch(self, parent):
+        """Start new branch at current turtle coordinate system"""
+        frame = self.mat.copy()
+        self.branches.append((frame, parent, [], []))
+        self.current_branch = len(self.branches)-1
+        self.branch_frame_inverse = frame.inverted()
+        
+    def push(self):
+        """Push turtle state to stack and start a new branch"""
+        self.stack.append((self.mat.copy(), self.linewidth, self.materialindex,
+                           self.current_branch, self.branch_frame_inverse, self.tube))
+        self.tube = None
+        self.begin_branch(self.current_branch)
+        if bpy.context.scene.bool_draw_nodes:
+            self.draw_node_module(scalefactor=self.linewidth)
+        
+    def pop(self):
+        """Pop last turtle state from stack and continue the parent branch"""
+        (self.mat, self.linewidth, self.materialindex,
+         self.current_branch, self.branch_frame_inverse, self.tube) = self.stack.pop()
+         
+    def draw_internode_tube(self, length, width):
+        """Continue the tube of the current branch with an internode relative to the branch, or start a new tube."""
+        self.tube = extend_tube(self.tube, self.branches[self.current_branch][3],
+                                self.branch_frame_inverse * self.mat, length, width, self.materialindex)
+         
+    def draw_module(self, 
+                    mesh, 
+                    name="Module", 
+                    scale=Vector((1, 1, 1)), 
+                    assign_material_by_index=False,
+                    material_object=None):
+        """Record module from given mesh in current turtle coordinate system, relative to the current branch."""
+        template = keyed_mesh_template(self.mesh_templates, mesh, material_object)
+        material_key = self.materialindex if assign_material_by_index else None
+        local_mat = self.branch_frame_inverse * self.mat * scale_matrix(scale)
+        self.branches[self.current_branch][2].append((template, material_key, local_mat))
+        
+    def branch_key(self, modules, tubes):
+        """Return key identifying the geometry of a branch, based on its modules and tubes relative to the branch"""
+        return ((self.smooth, self.tube_vertices) +
+                tuple((template_key, material_key, tuple(round(value, 5) for row in mat for value in row))
+                      for (template, template_key), material_key, mat in modules) +
+                tuple(tube.key() for tube in tubes))
+        
+    def branch_mesh(self, modules, tubes):
+        """Return mesh with merged geometry of the given branch modules, reused from cache if possible"""
+        key = None
+        if self.reuse_branch_meshes:
+            key = self.branch_key(modules, tubes)
+            mesh = bpy.data.meshes.get(branch_mesh_cache.get(key, ""))
+            if mesh is not None:
+                return mesh
+        geometry = GeometryBuffer(self.smooth)
+        for (template, template_key), material_key, mat in modules:
+            geometry.add_instance(template, mat, material_key)
+        for tube in tubes:
+            geometry.add_tube(tube, self.tube_vertices)
+        mesh = bpy.data.meshes.new("Branch")
+        mesh.use_auto_smooth = True
+        mesh.auto_smooth_angle = radians(85)
+        geometry.write_to_mesh(mesh, resolve_material)
+        if key is not None:
+            branch_mesh_cache[key] = mesh.name
+        return mesh
+        
+    def finish(self):
+        """Create one object per branch with geometry and store the branching structure on the root"""
+        scene = bpy.context.scene
+        root_inverse = self.root.matrix_basis.inverted()
+        objects = []
+        # branches without geometry get no object, their children are attached to the nearest ancestor object
+        nearest_object_branch = []
+        parents = []
+        matrices = []
+        for i, (frame, parent, modules, tubes) in enumerate(self.branches):
+            parents.append(parent)
+            matrices.extend(value for row in frame for value in row)
+            parent_object_branch = nearest_object_branch[parent] if parent >= 0 else -1
+            if not modules and not tubes:
+                nearest_object_branch.append(parent_object_branch)
+                objects.append(None)
+                continue
+            mesh = self.branch_mesh(modules, tubes)
+            self.meshes.append(mesh)
+            obj = bpy.data.objects.new("Branch", mesh)
+            scene.objects.link(obj)
+            if parent_object_branch >= 0:
+                obj.parent = objects[parent_object_branch]
+                obj.matrix_basis = self.branches[parent_object_branch][0].inverted() * frame
+            else:
+                obj.parent = self.root
+                obj.matrix_basis = root_inverse * frame
+            nearest_object_branch.append(i)
+            objects.append(obj)
+        self.root["lindenmaker_branch_parents"] = parents
+        self.root["lindenmaker_branch_matrices"] = matrices
+        
+
+class BranchGeometryTurtle(DrawingTurtle):
+    """
+    Subtype of the DrawingTurtle for a single object, reusing the geometry of unchanged branches
+    from the previous interpretation (incremental re-interpretation).
+    The modules of each branch are recorded relative to the branch, the geometry of a branch
+    is built in the branch coordinate system (or taken from the cache if its modules are unchanged)
+    and appended to the single mesh transformed by the branch frame.
+    """
+    
+    def __init__(self, _linewidth, _materialindex):
+        super().__init__(_linewidth, _materialindex)
+        scene = bpy.context.scene
+        self.smooth = not scene.bool_force_shade_flat
+        self.mesh_templates = {} # (mesh name, material object name or None) -> (MeshTemplate, template key)
+        # settings affecting the geometry of all branches
+        internode_template = self.geometry.internode_template
+        self.settings_key = (self.smooth, self.tube_vertices, tuple(self.geometry.levels),
+                             template_key(self.internode_mesh.name, internode_template) if internode_template else None,
+                             tuple(template_key(self.node_mesh.name, template)
+                                   for template in self.geometry.node_templates))
+        self.branches = [] # (frame matrix, list of modules, list of tubes) per branch
+        self.begin_branch()
         
+    def begin_branch(self):
+        """Start new branch at current turtle coordinate system"""
+        frame = self.mat.copy()
+        self.branches.append((frame, [], []))
+        self.current_branch = len(self.branches)-1
+        self.branch_frame_inverse = frame.inverted()
+        
+    def push(self):
+        """Push turtle state to stack and start a new branch"""
+        self.stack.append((self.mat.copy(), self.linewidth, self.materialindex,
+                           self.current_branch, self.branch_frame_inverse, self.tube))
+        self.tube = None
+        self.begin_branch()
+        if bpy.context.scene.bool_draw_nodes:
+            self.draw_node_module(scalefactor=self.linewidth)
+        
+    def pop(self):
+        """Pop last turtle state from stack and continue the parent branch"""
+        (self.mat, self.linewidth, self.materialindex,
+         self.current_branch, self.branch_frame_inverse, self.tube) = self.stack.pop()
+        
+    def record(self, kind, template, material_key, scale, size=None):
+        """Record module relative to the current branch, kind is the LodGeometry method adding it"""
+        local_mat = self.branch_frame_inverse * self.mat * scale_matrix(scale)
+        self.branches[self.current_branch][1].append((kind, template, material_key, local_mat, size))
+        
+    def draw_internode_module(self, length, width=None):
+        """Record internode relative to the current branch."""
+        if width is None:
+            width = self.linewidth
+        if self.tube_vertices:
+            self.draw_internode_tube(length, width)
+            return
+        # level of detail rules depend on the width
+        self.record('add_internode', None, self.materialindex,
+                    (length*bpy.context.scene.internode_length_scale, width, width), width)
+        
+    def draw_internode_tube(self, length, width):
+        """Continue the tube of the current branch with an internode relative to the branch, or start a new tube."""
+        self.tube = extend_tube(self.tube, self.branches[self.current_branch][2],
+                                self.branch_frame_inverse * self.mat, length, width, self.materialindex)
+        
+    def draw_node_module(self, scalefactor=1):
+        """Record node relative to the current branch."""
+        self.record('add_node', None, self.materialindex, (scalefactor, scalefactor, scalefactor), scalefactor)
+        
+    def add_module_geometry(self, mesh, scale, assign_material_by_index, material_object=None):
+        """Record custom object module relative to the current branch."""
+        template = keyed_mesh_template(self.mesh_templates, mesh, material_object)
+        self.record('add_instance', template, self.materialindex if assign_material_by_index else None, scale)
+        
+    def branch_key(self, modules, tubes):
+        """Return key identifying the geometry of a branch, based on its modules and tubes relative to the branch"""
+        return (self.settings_key +
+                tuple((template[1] if template else kind, material_key, size,
+                       tuple(round(value, 5) for row in mat for value in row))
+                      for kind, template, material_key, mat, size in modules) +
+                tuple(tube.key() for tube in tubes))
+        
+    def branch_geometry(self, modules, tubes):
+        """Return GeometryBuffers (one per level of detail) of the given branch modules in the branch coordinate system"""
+        geometry = lod.LodGeometry(self.geometry.levels, self.geometry.internode_template,
+                                   self.geometry.node_templates, self.smooth)
+        for kind, template, material_key, mat, size in modules:
+            if kind == 'add_instance':
+                geometry.add_instance(template[0], mat, material_key)
+            else:
+                getattr(geometry, kind)(mat, size, material_key)
+        for tube in tubes:
+            geometry.add_tube(tube)
+        return geometry.buffers
+        
+    def finish(self):
+        """Append the geometry of all branches to the single mesh, reusing unchanged branches"""
+        cache = {}
+        for frame, modules, tubes in self.branches:
+            if not modules and not tubes:
+                continue
+            key = self.branch_key(modules, tubes)
+            buffers = cache.get(key) or branch_geometry_cache.get(key)
+            if buffers is None:
+                buffers = self.branch_geometry(modules, tubes)
+            cache[key] = buffers
+            for buffer, branch_buffer in zip(self.geometry.buffers, buffers):
+                buffer.add_buffer(branch_buffer, frame)
+        # keep the branches of this interpretation for the next one
+        branch_geometry_cache.clear()
+        branch_geometry_cache.update(cache)
+        super().finish()
+        
+
+class GeometryTurtle(Turtle):
+    """
+    Subtype of the Turtle base class that collects internode and node geometry in a GeometryBuffer per level of detail
+    without accessing blender data, e.g. for batch production and growth animation steps.
+    Custom objects are only recorded as (object name, matrix) placements to be added later.
+    """
+    
+    def __init__(self, _linewidth, _materialindex, internode_template, node_template=None,
+                 internode_length_scale=1.0, smooth=True, tube_vertices=0,
+                 lod_levels=None, lod_node_templates=()):
+        super().__init__(_linewidth, _materialindex)
+        self.node_template = node_template # nodes are only drawn if given
+        self.internode_length_scale = internode_length_scale
+        # geometry of each level of detail, internode_template None for cylinders by level of detail.
+        # the node template is used for the first level, lod_node_templates for further levels
+        if lod_levels is None:
+            lod_levels = lod.levels(tube_vertices or 3, 1)
+        self.geometry = lod.LodGeometry(lod_levels, internode_template,
+                                        [node_template] + list(lod_node_templates), smooth)
+        self.custom_objects = [] # (object name, matrix as tuple of rows)
+        # internodes as continuous tubes with rings of the level ring vertex count, if tube_vertices is not 0
+        self.tube_vertices = tube_vertices
+        self.tube = None
+        self.tubes = []
+        
+    def push(self):
+        """Push turtle state to stack and draw node"""
+        self.stack.append((self.mat.copy(), self.linewidth, self.materialindex, self.tube))
+        self.tube = None
+        if self.node_template is not None:
+            self.draw_node_module(scalefactor=self.linewidth)
+            
+    def pop(self):
+        """Pop last turtle state from stack and use as current"""
+        (self.mat, self.linewidth, self.materialindex, self.tube) = self.stack.pop()
+            
+    def draw_internode_module(self, length, width=None):
+        """Add internode geometry in current turtle coordinate system."""
+        if width is None:
+            width = self.linewidth
+        if self.tube_vertices:
+            self.tube = extend_tube(self.tube, self.tubes, self.mat, length, width, self.materialindex)
+            return
+        scale = (length*self.internode_length_scale, width, width)
+        self.geometry.add_internode(self.mat * scale_matrix(scale), width, self.materialindex)
+        
+    def draw_node_module(self, scalefactor=1):
+        """Add node geometry in current turtle coordinate system."""
+        scale = (scalefactor, scalefactor, scalefactor)
+        self.geometry.add_node(self.mat * scale_matrix(scale), scalefactor, self.materialindex)
+        
+    def draw_module_from_custom_object(self, objname, objscale=Vector((1, 1, 1))):
+        """Record placement of custom object instance in current turtle coordinate system."""
+        matrix = self.mat * scale_matrix(objscale)
+        self.custom_objects.append((objname, tuple(tuple(row) for row in matrix)))
+        
+    def finish(self):
+        """Add collected tubes to the geometry"""
+        for tube in self.tubes:
+            self.geometry.add_tube(tube)
+        
+        
+def extend_tube(tube, tubes, mat, length, width, material_key):
+    """
+    Continue tube with an internode of the given length and width in the turtle coordinate system mat.
+    If the internode does not continue the tube, a new tube is started and appended to tubes.
+    Returns the continued tube. The tube radius is half the width, as for the default internode cylinder.
+    """
+    start = mat.col[3].xyz
+    if tube is None or not tube.continues_at(start, material_key):
+        tube = TubePath(start, width/2, mat.col[1].xyz, material_key)
+        tubes.append(tube)
+    tube.extend(start + mat.col[0].xyz*length, width/2)
+    return tube
+
+def template_key(name, template):
+    """
+    Return key of the MeshTemplate of a module mesh, which changes if the mesh is modified:
+    a hash of its vertex coordinates, polygons and material slots, and its material names
+    """
+    return (name,
+            hash((template.coords.tobytes(), template.loop_vertices.tobytes(), template.loop_starts.tobytes(),
+                  template.loop_totals.tobytes(), template.poly_slots.tobytes())),
+            tuple(template.material_keys))
+
+def keyed_mesh_template(mesh_templates, mesh, material_object=None):
+    """
+    Return (MeshTemplate, template key) of mesh with the materials of material_object,
+    created once per interpretation and kept in mesh_templates by (mesh name, material object name).
+    """
+    key = (mesh.name, material_object.name if material_object is not None else None)
+    template = mesh_templates.get(key)
+    if template is None:
+        template = mesh_template(mesh, material_object)
+        # template key changes if the mesh is modified, so that branch geometry is not reused
+        template = mesh_templates[key] = (template, template_key(mesh.name, template))
+    return template
+
+def scale_matrix(scale):
+    """Return 4x4 matrix scaling by x, y, z factors"""
+    mat = Matrix.Identity(4)
+    mat[0][0], mat[1][1], mat[2][2] = scale
+    return mat
+    
+def mesh_template(mesh, material_object=None):
+    """Return MeshTemplate of mesh. Materials are taken from the material slots of material_object if given."""
+    material_keys = None
+    if material_object is not None:
+        material_keys = [slot.material.name if slot.material else None
+                         for slot in material_object.material_slots]
+    return MeshTemplate.from_mesh(mesh, material_keys)
+    
+def lod_templates(levels, internode_mesh, node_mesh):
+    """
+    Return internode template and list of node templates per level of detail.
+    The internode template is None if cylinders are generated by level of detail (default internode mesh only),
+    lower levels use default node meshes with fewer subdivisions (default node mesh only).
+    """
+    scene = bpy.context.scene
+    if scene.bool_lod and scene.internode_mesh_name == bpy.types.Scene.internode_mesh_name[1]['default']:
+        internode_template = None
+    else:
+        internode_template = mesh_template(internode_mesh)
+    if not scene.bool_draw_nodes:
+        return internode_template, []
+    node_templates = [mesh_template(node_mesh)]
+    for level in levels[1:]:
+        if scene.node_mesh_name == bpy.types.Scene.node_mesh_name[1]['default']:
+            node_templates.append(mesh_template(get_lod_node_mesh(level.node_subdivisions)))
+        else:
+            node_templates.append(node_templates[0])
+    return internode_template, node_templates
+
+def write_lod_meshes(scene, root, buffers):
+    """
+    Write the geometry buffers of all levels of detail to the root mesh (first level)
+    and to the meshes of hidden child objects of the root (further levels). Returns all meshes.
+    """
+    meshes = [root.data]
+    for i in range(1, len(buffers)):
+        mesh = bpy.data.meshes.new("{} LOD{}".format(root.name, i))
+        mesh.use_auto_smooth = True
+        mesh.auto_smooth_angle = radians(85)
+        obj = bpy.data.objects.new(mesh.name, mesh)
+        scene.objects.link(obj)
+        obj.parent = root
+        obj.hide = obj.hide_render = True
+        meshes.append(mesh)
+    for buffer, mesh in zip(buffers, meshes):
+        buffer.write_to_mesh(mesh, resolve_material)
+    return meshes
+
+def resolve_material(key):
+    """Return material for a geometry buffer material key (turtle material index or material name)"""
+    if key is None:
+        return None
+    if isinstance(key, int):
+        # if materialindex exceeds length of material list just create new empty materials
+        while key >= len(bpy.data.materials):
+            bpy.data.materials.new("Material")
+        return bpy.data.materials[key]
+    return bpy.data.materials.get(key)
+
+def get_module_meshes():
+    """Return internode and node mesh selected in the scene, creating or recreating the default meshes if needed"""
+    scene = bpy.context.scene
+    
+    # get mesh used to draw internodes (mesh reuse to save memory)
+    default_internode_mesh_name = bpy.types.Scene.internode_mesh_name[1]['default']
+    if scene.internode_mesh_name not in bpy.data.meshes.keys():
+        # custom mesh not found, revert to default
+        scene.internode_mesh_name = default_internode_mesh_name
+        if default_internode_mesh_name not in bpy.data.meshes.keys():
+            create_default_internode_mesh(scene.default_internode_cylinder_vertices)
+    if scene.bool_recreate_default_meshes and default_internode_mesh_name in bpy.data.meshes.keys():
+        # recreate default mesh on user request
+        default_internode_mesh = bpy.data.meshes[default_internode_mesh_name]
+        default_internode_mesh.user_clear() # also clears fake user
+        default_internode_mesh.name = default_internode_mesh_name+".DEPRECATED"
+        create_default_internode_mesh(scene.default_internode_cylinder_vertices)
+        scene.internode_mesh_name = default_internode_mesh_name
+    internode_mesh = bpy.data.meshes[scene.internode_mesh_name]
+
+    # get mesh used to draw nodes (mesh reuse to save memory)
+    default_node_mesh_name = bpy.types.Scene.node_mesh_name[1]['default']
+    if scene.node_mesh_name not in bpy.data.meshes.keys():
+        # custom mesh not found, revert to default
+        scene.node_mesh_name = default_node_mesh_name
+        if default_node_mesh_name not in bpy.data.meshes.keys():
+            create_default_node_mesh(scene.default_node_icosphere_subdivisions)
+    if scene.bool_recreate_default_meshes and default_node_mesh_name in bpy.data.meshes.keys():
+        # recreate default mesh on user request
+        default_node_mesh = bpy.data.meshes[default_node_mesh_name]
+        default_node_mesh.user_clear() # also clears fake user
+        default_node_mesh.name = default_node_mesh_name+".DEPRECATED"
+        create_default_node_mesh(scene.default_node_icosphere_subdivisions)
+        scene.node_mesh_name = default_node_mesh_name
+    node_mesh = bpy.data.meshes[scene.node_mesh_name]
+    return internode_mesh, node_mesh
+
+def create_default_internode_mesh(vertex_count):
+    """Initialize the default cylinder mesh used to draw internodes"""
+    cylinder_radius = 0.5
+    cylinder_length = 1
+    bpy.ops.mesh.primitive_cylinder_add(vertices=vertex_count, 
+                                        radius=cylinder_radius, 
+                                        depth=cylinder_length)
+    cyl = bpy.context.object
+    # rotate cylinder mesh to point towards x axis and position origin at base
+    bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+    bpy.ops.mesh.select_all(action='SELECT')
+    bpy.ops.transform.rotate(value=radians(90), axis=(0, 1, 0))
+    bpy.ops.transform.translate(value=(cylinder_length/2,0,0))
+    bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+    cyl.data.name = bpy.types.Scene.internode_mesh_name[1]['default']
+    # smooth cylinder sides, but not cylinder caps
+    cyl.data.use_auto_smooth = True
+    cyl.data.auto_smooth_angle = radians(85)
+    # delete object and make sure mesh will persist via fake user reference
+    cyl.data.use_fake_user = True
+    bpy.ops.object.delete()
+
+def get_lod_node_mesh(subdivisions):
+    """Return default node icosphere mesh with the given subdivisions for lower levels of detail, created at first use"""
+    name = "{}_{}".format(bpy.types.Scene.node_mesh_name[1]['default'], subdivisions)
+    if name not in bpy.data.meshes.keys():
+        create_default_node_mesh(subdivisions, name)
+    return bpy.data.meshes[name]
+
+def create_default_node_mesh(_subdivisions=1, name=None):
+    """Initialize the default icosphere mesh used to draw nodes"""
+    bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=_subdivisions, size=0.5)
+    icosphere = bpy.context.object
+    icosphere.data.name = name or bpy.types.Scene.node_mesh_name[1]['default']
+    icosphere.data.use_auto_smooth = True
+    icosphere.data.auto_smooth_angle = radians(85)
+    # delete object and make sure mesh will persist via fake user reference
+    icosphere.data.use_fake_user = True
+    bpy.ops.object.delete()
@@ -1,307 +1,429 @@
 import bpy
-import re
+from itertools import islice
 from math import radians
 from mathutils import Vector, Matrix
 
 from lindenmaker import turtle
+from lindenmaker import command_stream
+from lindenmaker import profiling
+from lindenmaker import cleanup
 from lindenmaker.turtle_interpretation_error import TurtleInterpretationError
 import imp
 imp.reload(turtle)
-    
-def interpret(lstring, default_length = 2.0, 
+imp.reload(command_stream)
+imp.reload(cleanup)
+# numpy is used for a faster dryrun turtle if available (bundled with blender)
+try:
+    from lindenmaker import numpy_turtle
+    imp.reload(numpy_turtle)
+    from lindenmaker import query_batch
+    imp.reload(query_batch)
+except ImportError:
+    numpy_turtle = None
+    query_batch = None
+
+# number of commands interpreted between progress reports of interpret_steps
+PROGRESS_CHUNK_SIZE = 10000
+
+def interpret(lstring, default_length = 2.0,
                        default_width = 1.0,
                        default_width_growth_factor=1.05,
                        default_angle = 45.0,
                        default_materialindex = 0,
-                       dryrun_nodraw = False):
-    """Create geometrical representation of L-string via Turtle Interpretation. NOTE: Commands that are not supported will be ignored and not raise an error."""
-    
+                       dryrun_nodraw = False,
+                       collect_query_frames = False):
+    """Create geometrical representation of L-string via Turtle Interpretation. NOTE: Commands that are not supported will be ignored and not raise an error.
+    The L-string is given as CommandStream, string, file object or buffer (e.g. mmap).
+    Returns list of turtle state query results (vector type, x, y, z), one for each '?' command.
+    If collect_query_frames is set, the full turtle frames at all queries are published as query_batch.current (requires NumPy)."""
+    return run_to_end(interpret_steps(lstring, default_length, default_width, default_width_growth_factor,
+                                      default_angle, default_materialindex, dryrun_nodraw, collect_query_frames))
+
+def interpret_steps(lstring, default_length = 2.0,
+                             default_width = 1.0,
+                             default_width_growth_factor=1.05,
+                             default_angle = 45.0,
+                             default_materialindex = 0,
+                             dryrun_nodraw = False,
+                             collect_query_frames = False):
+    """
+    Generator version of interpret, yielding (progress label, fraction done or None if unknown)
+    every PROGRESS_CHUNK_SIZE drawn commands and returning the query results.
+    If the generator is closed before its end (cancelled) or the interpretation fails,
+    all objects and meshes created so far are removed.
+    """
+
     # the option dryrun_nodraw is set, the turtle moves but does not draw any objects.
     # this is useful to do state queries at different moments via the '?' command
     # without the overhead of the drawing functions
     if dryrun_nodraw:
-        t = turtle.Turtle(default_width, default_materialindex) # turtle base class that doesnt draw
+        if numpy_turtle is not None:
+            t = numpy_turtle.NumpyTurtle(default_width, default_materialindex)
+        else:
+            t = turtle.Turtle(default_width, default_materialindex) # turtle base class that doesnt draw
         #print("TURTLE INTERPRETATION DRYRUN")
+    elif not bpy.context.scene.bool_no_hierarchy and bpy.context.scene.bool_merge_branches:
+        t = turtle.BranchTurtle(default_width, default_materialindex)
+    elif bpy.context.scene.bool_no_hierarchy and bpy.context.scene.bool_reuse_branch_meshes:
+        t = turtle.BranchGeometryTurtle(default_width, default_materialindex)
     else:
         t = turtle.DrawingTurtle(default_width, default_materialindex)
-    
-    # remove all whitespace
-    lstring = "".join(lstring.split())
-    # apply cut branch commands
-    lstring = applyCuts(lstring)
-    # split into command symbols with optional parameters
-    # e.g. "F(230,24)F[+(45)F]F" will yield ['F(230,24)', 'F', '[', '+(45)', 'F', ']', 'F']
-    commands = re.findall(r"[^()](?:\([^()]*\))?", lstring)
-    
-    turtle_query_command_count = 0
-    
-    for cmd in commands:
-        
-        args = extractArgs(cmd)
-        
-        if cmd[0] == 'F':
-            # move turtle and draw internode between old and new position
-            if len(args) == 2:
-                t.draw_internode_module(length=args[0], width=args[1])
-                t.move(stepsize=args[0])
-            elif len(args) == 1:
-                t.draw_internode_module(length=args[0])
-                t.move(stepsize=args[0])
-            elif len(args) == 0:
-                t.draw_internode_module(default_length)
-                t.move(default_length)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command 'F' (move turtle and draw).\n"
-                      "Usage: 'F' or 'F(step_size)' or 'F(step_size, width)'")
-        elif cmd[0] == 'f':
-            # move turtle
-            if len(args) == 1:
-                t.move(stepsize=args[0])
-            elif len(args) == 0:
-                t.move(default_length)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command 'f' (move turtle).\n"
-                      "Usage: 'f' or 'f(step_size)'")
-        
-        elif cmd[0] == '[':
-            # push current turtle state to stack
-            if len(args) == 0:
-                t.push()
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '['"
-                      " (push current turtle state to stack).\n"
-                      "This command does not take any arguments.\n"
-                      "Usage: '['")
-        elif cmd[0] == ']':
-            # restore turtle state from stack
-            if len(args) == 0:
-                t.pop()
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command ']'"
-                      " (restore turtle state from stack).\n"
-                      "This command does not take any arguments.\n"
-                      "Usage: ']'")
-        
-        # rotate commands (turn, pitch, roll)
-        elif cmd[0] == '+':
-            if len(args) == 1:
-                t.turn(-args[0])
-            elif len(args) == 0:
-                t.turn(-default_angle)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '+' (turn left).\n"
-                      "Usage: '+' or '+(angle_degree)'")
-        elif cmd[0] == '-':
-            if len(args) == 1:
-                t.turn(args[0])
-            elif len(args) == 0:
-                t.turn(default_angle)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '-' (turn right).\n"
-                      "Usage: '-' or '-(angle_degree)'")
-        elif cmd[0] == '&':
-            if len(args) == 1:
-                t.pitch(-args[0])
-            elif len(args) == 0:
-                t.pitch(-default_angle)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '&' (pitch down).\n"
-                      "Usage: '&' or '&(angle_degree)'")
-        elif cmd[0] == '^':
-            if len(args) == 1:
-                t.pitch(args[0])
-            elif len(args) == 0:
-                t.pitch(default_angle)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '^' (pitch up).\n"
-                      "Usage: '^' or '^(angle_degree)'")
-        elif cmd[0] == '\\':
-            if len(args) == 1:
-                t.roll(-args[0])
-            elif len(args) == 0:
-                t.roll(-default_angle)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '\\' (roll right).\n"
-                      "Usage: '\\' or '\\(angle_degree)'")
-        elif cmd[0] == '/':
-            if len(args) == 1:
-                t.roll(args[0])
-            elif len(args) == 0:
-                t.roll(default_angle)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '/' (roll left).\n"
-                      "Usage: '/' or '/(angle_degree)'")
-        elif cmd[0] == '|':
-            if len(args) == 0:
-                t.turn(180)
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '|' (turn halfway around).\n"
-                      "This command does not take any arguments.\n"
-                      "Usage: '|'")
-        
-        # drawing attributes
-        elif cmd[0] == '_':
-            # increase linewidth or set to value
-            if len(args) == 1:
-                t.linewidth = args[0]
-            elif len(args) == 0:
-                t.linewidth *= default_width_growth_factor
-            else: 
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '_' (increase or set linewidth).\n"
-                      "Usage: '_' or '_(width)'")
-        elif cmd[0] == '!':
-            # decrease linewidth or set to value
-            if len(args) == 1:
-                t.linewidth = args[0]
-            elif len(args) == 0:
-                t.linewidth *= 1-(default_width_growth_factor-1)
-            else:
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '!' (decrease or set linewidth).\n"
-                      "Usage: '!' or '!(width)'")
-            t.linewidth = max(t.linewidth, 0.0001)
-        elif cmd[0] == ';':
-            # increase materialindex or set to value
-            if len(args) == 1:
-                t.materialindex = max(int(args[0]), 0)
-            elif len(args) == 0:
-                t.materialindex += 1 # if exceeds mat count, turtle adds new mats
-            else:
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command ';'"
-                      " (increase or set material index).\n"
-                      "Usage: ';' or ';(materialindex)'")
-        elif cmd[0] == ',':
-            # decrease materialindex or set to value
+
+    finished = False
+    try:
+        if not dryrun_nodraw and isinstance(lstring, command_stream.CommandStream):
+            t.prepare_materials(max_materialindex(lstring, default_materialindex))
+
+        interpreter = Interpreter(t, default_length, default_width_growth_factor, default_angle)
+        if collect_query_frames:
+            interpreter.query_frames = []
+        # the L-string can be given precompiled, so that dry runs and drawing runs
+        # on the same L-string share the parsing work. otherwise it is tokenized,
+        # cut and interpreted as a stream without creating further copies of it.
+        if dryrun_nodraw and isinstance(lstring, command_stream.CommandStream):
+            # a dryrun is only needed for the queries, thus it stops after the last query
+            end = lstring.last_index('?') + 1
+            with profiling.phase("dryrun", size=end):
+                interpreter.run(lstring, end=end)
+        elif dryrun_nodraw and isinstance(lstring, str) and '?' not in lstring:
+            pass # no queries, nothing to do for the dryrun
+        elif dryrun_nodraw:
+            with profiling.phase("dryrun"):
+                interpreter.run_commands(command_stream.iter_commands(lstring))
+        elif isinstance(lstring, command_stream.CommandStream):
+            with profiling.phase("turtle", size=len(lstring)):
+                for start in range(0, len(lstring), PROGRESS_CHUNK_SIZE):
+                    end = min(start + PROGRESS_CHUNK_SIZE, len(lstring))
+                    interpreter.run(lstring, start, end)
+                    yield "Interpretation", end / len(lstring)
+        else:
+            with profiling.phase("turtle (streamed)"):
+                commands = command_stream.iter_commands(lstring)
+                while True:
+                    chunk = list(islice(commands, PROGRESS_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    interpreter.run_commands(chunk)
+                    yield "Interpretation", None
+
+        with profiling.phase("dryrun finish" if dryrun_nodraw else "mesh build"):
+            t.finish()
+        finished = True
+    finally:
+        if not finished and not dryrun_nodraw:
+            # cancelled or failed, leave no partial result behind
+            meshes = [mesh.name for mesh in t.meshes]
+            t.remove_templates()
+            cleanup.remove_result(t.root)
+            cleanup.remove_unused_meshes(meshes)
+    if collect_query_frames:
+        query_batch.publish(interpreter.query_results, interpreter.query_frames)
+    if not dryrun_nodraw:
+        t.root.name = "Root" # changed to "Root.xxx" on name collision
+        cleanup.store_result_meshes(t.root, t.meshes)
+        bpy.context.scene.last_interpretation_result_objname = t.root.name
+
+    return interpreter.query_results
+
+def run_to_end(steps):
+    """Run a generator such as interpret_steps without interruption and return its return value"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def max_materialindex(stream, materialindex=0):
+    """Return highest material index set via ';' and ',' commands of the CommandStream (same rules as the Interpreter)"""
+    increase, decrease = ord(';'), ord(',')
+    if increase not in stream.opcodes and decrease not in stream.opcodes:
+        return materialindex
+    highest = materialindex
+    stack = []
+    for i, opcode in enumerate(stream.opcodes):
+        if opcode == command_stream.PUSH:
+            stack.append(materialindex)
+        elif opcode == command_stream.POP:
+            if stack:
+                materialindex = stack.pop()
+        elif opcode == increase or opcode == decrease:
+            args = stream.get_args(i)
             if len(args) == 1:
-                t.materialindex = int(args[0])
-            elif len(args) == 0:
-                t.materialindex -= 1
+                materialindex = max(int(args[0]), 0)
+            elif opcode == increase:
+                materialindex += 1
             else:
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command ','"
-                      " (decrease or set material index).\n"
-                      "Usage: ',' or ',(materialindex)'")
-            t.materialindex = max(t.materialindex, 0)
-        
+                materialindex = max(materialindex - 1, 0)
+            highest = max(highest, materialindex)
+    return highest
+
+class Interpreter:
+    """Executes a CommandStream on a turtle by looking up a handler for each opcode in a dispatch table"""
+
+    def __init__(self, turtle, default_length, default_width_growth_factor, default_angle):
+        self.t = turtle
+        self.default_length = default_length
+        self.default_width_growth_factor = default_width_growth_factor
+        self.default_angle = default_angle
+        self.query_results = [] # (vector type, x, y, z) for each '?' command
+        self.query_frames = None # turtle frame (H, L, U, P) for each '?' command if collected
+        self.dispatch = {
+            ord('F'): self.move_and_draw,
+            ord('f'): self.move,
+            ord('['): self.push,
+            ord(']'): self.pop,
+            ord('+'): self.turn_left,
+            ord('-'): self.turn_right,
+            ord('&'): self.pitch_down,
+            ord('^'): self.pitch_up,
+            ord('\\'): self.roll_right,
+            ord('/'): self.roll_left,
+            ord('|'): self.turn_around,
+            ord('_'): self.increase_width,
+            ord('!'): self.decrease_width,
+            ord(';'): self.increase_materialindex,
+            ord(','): self.decrease_materialindex,
+            ord('~'): self.draw_custom_object,
+            ord('@'): self.look_at,
+            ord('?'): self.query,
+        }
+
+    def run(self, stream, start=0, end=None):
+        """Execute commands of the CommandStream, only from the command with index start up to the command with index end if given"""
+        dispatch = self.dispatch
+        get_args = stream.get_args
+        opcodes = stream.opcodes if start == 0 and end is None else memoryview(stream.opcodes)[start:end]
+        for i, opcode in enumerate(opcodes, start):
+            dispatch[opcode](get_args(i))
+
+    def run_commands(self, commands):
+        """Execute commands given as iterable of (opcode, argument string), e.g. from command_stream.iter_commands"""
+        dispatch = self.dispatch
+        parse_args = command_stream.parseArgs
+        for opcode, argstring in commands:
+            dispatch[opcode](parse_args(argstring))
+
+    def move_and_draw(self, args):
+        # move turtle and draw internode between old and new position
+        t = self.t
+        if len(args) == 2:
+            t.draw_internode_module(length=args[0], width=args[1])
+            t.move(stepsize=args[0])
+        elif len(args) == 1:
+            t.draw_internode_module(length=args[0])
+            t.move(stepsize=args[0])
+        elif len(args) == 0:
+            t.draw_internode_module(self.default_length)
+            t.move(self.default_length)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command 'F' (move turtle and draw).\n"
+                  "Usage: 'F' or 'F(step_size)' or 'F(step_size, width)'")
+
+    def move(self, args):
+        # move turtle
+        if len(args) == 1:
+            self.t.move(stepsize=args[0])
+        elif len(args) == 0:
+            self.t.move(self.default_length)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command 'f' (move turtle).\n"
+                  "Usage: 'f' or 'f(step_size)'")
+
+    def push(self, args):
+        # push current turtle state to stack
+        if len(args) == 0:
+            self.t.push()
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '['"
+                  " (push current turtle state to stack).\n"
+                  "This command does not take any arguments.\n"
+                  "Usage: '['")
+
+    def pop(self, args):
+        # restore turtle state from stack
+        if len(args) == 0:
+            self.t.pop()
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command ']'"
+                  " (restore turtle state from stack).\n"
+                  "This command does not take any arguments.\n"
+                  "Usage: ']'")
+
+    # rotate commands (turn, pitch, roll)
+
+    def turn_left(self, args):
+        if len(args) == 1:
+            self.t.turn(-args[0])
+        elif len(args) == 0:
+            self.t.turn(-self.default_angle)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '+' (turn left).\n"
+                  "Usage: '+' or '+(angle_degree)'")
+
+    def turn_right(self, args):
+        if len(args) == 1:
+            self.t.turn(args[0])
+        elif len(args) == 0:
+            self.t.turn(self.default_angle)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '-' (turn right).\n"
+                  "Usage: '-' or '-(angle_degree)'")
+
+    def pitch_down(self, args):
+        if len(args) == 1:
+            self.t.pitch(-args[0])
+        elif len(args) == 0:
+            self.t.pitch(-self.default_angle)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '&' (pitch down).\n"
+                  "Usage: '&' or '&(angle_degree)'")
+
+    def pitch_up(self, args):
+        if len(args) == 1:
+            self.t.pitch(args[0])
+        elif len(args) == 0:
+            self.t.pitch(self.default_angle)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '^' (pitch up).\n"
+                  "Usage: '^' or '^(angle_degree)'")
+
+    def roll_right(self, args):
+        if len(args) == 1:
+            self.t.roll(-args[0])
+        elif len(args) == 0:
+            self.t.roll(-self.default_angle)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '\\' (roll right).\n"
+                  "Usage: '\\' or '\\(angle_degree)'")
+
+    def roll_left(self, args):
+        if len(args) == 1:
+            self.t.roll(args[0])
+        elif len(args) == 0:
+            self.t.roll(self.default_angle)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '/' (roll left).\n"
+                  "Usage: '/' or '/(angle_degree)'")
+
+    def turn_around(self, args):
+        if len(args) == 0:
+            self.t.turn(180)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '|' (turn halfway around).\n"
+                  "This command does not take any arguments.\n"
+                  "Usage: '|'")
+
+    # drawing attributes
+
+    def increase_width(self, args):
+        # increase linewidth or set to value
+        if len(args) == 1:
+            self.t.linewidth = args[0]
+        elif len(args) == 0:
+            self.t.linewidth *= self.default_width_growth_factor
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '_' (increase or set linewidth).\n"
+                  "Usage: '_' or '_(width)'")
+
+    def decrease_width(self, args):
+        # decrease linewidth or set to value
+        if len(args) == 1:
+            self.t.linewidth = args[0]
+        elif len(args) == 0:
+            self.t.linewidth *= 1-(self.default_width_growth_factor-1)
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '!' (decrease or set linewidth).\n"
+                  "Usage: '!' or '!(width)'")
+        self.t.linewidth = max(self.t.linewidth, 0.0001)
+
+    def increase_materialindex(self, args):
+        # increase materialindex or set to value
+        if len(args) == 1:
+            self.t.materialindex = max(int(args[0]), 0)
+        elif len(args) == 0:
+            self.t.materialindex += 1 # if exceeds mat count, turtle adds new mats
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command ';'"
+                  " (increase or set material index).\n"
+                  "Usage: ';' or ';(materialindex)'")
+
+    def decrease_materialindex(self, args):
+        # decrease materialindex or set to value
+        if len(args) == 1:
+            self.t.materialindex = int(args[0])
+        elif len(args) == 0:
+            self.t.materialindex -= 1
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command ','"
+                  " (decrease or set material index).\n"
+                  "Usage: ',' or ',(materialindex)'")
+        self.t.materialindex = max(self.t.materialindex, 0)
+
+    def draw_custom_object(self, args):
         # draw custom object
-        elif cmd[0] == '~':
-            if len(args) == 4:
-                t.draw_module_from_custom_object(objname=args[0],
-                                                 objscale=Vector((args[1], args[2], args[3])))
-            elif len(args) == 2:
-                t.draw_module_from_custom_object(objname=args[0], 
-                                                 objscale=Vector((args[1], args[1], args[1])))
-            elif len(args) == 1:
-                t.draw_module_from_custom_object(objname=args[0])
-            else:
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '~' (draw custom object).\n"
-                      "Usage: '~(\"Object\")' or '~(\"Object\", scale)'"
-                      " or '~(\"Object\", scale_x, scale_y, scale_z)'")
-                      
+        if len(args) == 4:
+            self.t.draw_module_from_custom_object(objname=args[0],
+                                                  objscale=Vector((args[1], args[2], args[3])))
+        elif len(args) == 2:
+            self.t.draw_module_from_custom_object(objname=args[0],
+                                                  objscale=Vector((args[1], args[1], args[1])))
+        elif len(args) == 1:
+            self.t.draw_module_from_custom_object(objname=args[0])
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '~' (draw custom object).\n"
+                  "Usage: '~(\"Object\")' or '~(\"Object\", scale)'"
+                  " or '~(\"Object\", scale_x, scale_y, scale_z)'")
+
+    def look_at(self, args):
         # turtle lookAt function
-        elif cmd[0] == '@':
-            if len(args) == 3:
-                t.look_at(Vector((args[0], args[1], args[2])))
-            else:
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '@' (turtle look at).\n"
-                      "Usage: '@(x, y, z)'"
-                      "The heading vector will point toward x, y, z"
-                      " and the heading, left, and up vectors will have the same"
-                      " relative orientation (handedness) as before.")
-                      
+        if len(args) == 3:
+            self.t.look_at(Vector((args[0], args[1], args[2])))
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '@' (turtle look at).\n"
+                  "Usage: '@(x, y, z)'"
+                  "The heading vector will point toward x, y, z"
+                  " and the heading, left, and up vectors will have the same"
+                  " relative orientation (handedness) as before.")
+
+    def query(self, args):
         # query turtle state (heading, left, up or position vector)
-        elif cmd[0] == '?':
-            turtle_query_command_count += 1
-            
-            if len(args) == 4:
-                
+        if len(args) == 4:
+
+            querycol = 0
+
+            if args[0] == 'H':
                 querycol = 0
+            elif args[0] == 'L':
+                querycol = 1
+            elif args[0] == 'U':
+                querycol = 2
+            elif args[0] == 'P':
+                querycol = 3
 
-                if args[0] == 'H':
-                    querycol = 0
-                elif args[0] == 'L':
-                    querycol = 1
-                elif args[0] == 'U':
-                    querycol = 2
-                elif args[0] == 'P':
-                    querycol = 3
-                
-                bpy.context.scene.lstring_for_production = replace_nth(bpy.context.scene.lstring_for_production, r'\?\([^()]*\)', '?("{}",{},{},{})'.format(args[0], t.mat.col[querycol].x, t.mat.col[querycol].y, t.mat.col[querycol].z), turtle_query_command_count-1)
-                
-            else:
-                raise TurtleInterpretationError(
-                      "Invalid number of arguments for command '?'"
-                      " (query turtle state).\n"
-                      "Usage: '?(\"H|L|U|P\",0,0,0)' for heading, left, up or position vector.\n"
-                      "The values 0,0,0 will be replaced by the x,y,z respective vector values.")
-                
-    if not dryrun_nodraw:
-        t.root.name = "Root" # changed to "Root.xxx" on name collision
-        bpy.context.scene.last_interpretation_result_objname = t.root.name
-    
-def applyCuts(lstring):
-    """Remove branch segments following a cut command ('%') until the end of branch (i.e. until next unmatched closing bracket or end of string"""
-    segments_to_cut = []
-    searching_end_of_branch = False
-    bracketBalance = 0
-    cut_start = cut_end = None
-    # find start and end of all segments to cut
-    for i, c in enumerate(lstring):
-        if searching_end_of_branch:
-            # look for unmatched right bracket (end of branch to cut)
-            if c == '[':
-                bracketBalance += 1
-            elif c == ']':
-                bracketBalance -= 1
-            if bracketBalance < 0:
-                searching_end_of_branch = False
-                bracketBalance = 0 
-                cut_end = i
-                segments_to_cut.append((cut_start, cut_end))
-        elif c == '%':
-            # found start of segment to cut
-            searching_end_of_branch = True
-            cut_start = i
-    # no closing bracket found, thus cut until end of string
-    if searching_end_of_branch:
-        segments_to_cut.append((cut_start, len(lstring)+1))
-    # cut segments
-    result = lstring
-    for (start, end) in segments_to_cut:
-        result = result[:start] + '%'*(end-start) + result[end:]
-    return result.replace('%', '')
-
-def extractArgs(command):
-    """Return a list of the arguments of a command statement, e.g. A(arg1, arg2, .., argn) will return [arg1, arg2, .., argn]"""
-    argstring_list = re.findall(r"\((.+)\)", command)
-    if len(argstring_list) == 0:
-        return []
-    result = []
-    for arg in re.split(',', argstring_list[0]):
-        try:
-            result.append(float(arg)) # try to cast to float
-        except ValueError:
-            result.append(arg) # else just add string argument
-    return result
-
-def replace_nth(string, pattern, replacement, n):
-    where = [m.start() for m in re.finditer(pattern, string)][n]
-    before = string[:where]
-    after = string[where:]
-    after = re.sub(pattern, replacement, after, 1)
-    return before + after
+            self.query_results.append((args[0],) + self.t.query_vector(querycol))
+            if self.query_frames is not None:
+                self.query_frames.append(self.t.query_frame())
+
+        else:
+            raise TurtleInterpretationError(
+                  "Invalid number of arguments for command '?'"
+                  " (query turtle state).\n"
+                  "Usage: '?(\"H|L|U|P\",0,0,0)' for heading, left, up or position vector.\n"
+                  "The values 0,0,0 will be replaced by the x,y,z respective vector values.")